@@ -0,0 +1,179 @@
+"""
+A stand-in Elasticsearch HTTP server for load tests.
+
+Usage: uv run bench/fake_es.py [--port 9200] [--latency-ms 5] [--jitter-ms 2]
+Answers the requests the web app makes (ping, _search, _msearch, point-in-time open and
+close) with deterministic synthetic hits derived from the query text, after a simulated
+search latency that is reported as "took". Everything else is acknowledged.
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+WORDS = (
+    "rust python postgres search index latency cache async kernel compiler design "
+    "database network linux startup writing career testing typescript golang vim"
+).split()
+
+
+def _query_text(body: dict) -> str:
+    """Best-effort extraction of the user's words from the bodies SearchEngine builds."""
+    query = body.get("query") or {}
+    must = query.get("bool", {}).get("must") or []
+    for clause in must:
+        if "multi_match" in clause:
+            return clause["multi_match"].get("query", "")
+    knn = body.get("knn") or {}
+    return json.dumps(knn.get("query_vector", [])[:4])
+
+
+def _hit(doc_id: int, score: float, query: str) -> dict:
+    word = WORDS[doc_id % len(WORDS)]
+    return {
+        "_index": "pages",
+        "_id": str(doc_id),
+        "_score": score,
+        "_source": {
+            "title": f"Notes on {word} #{doc_id}",
+            "url": f"https://blog{doc_id % 500}.example.com/posts/{doc_id}",
+            "date": f"20{10 + doc_id % 15}-{1 + doc_id % 12:02d}-{1 + doc_id % 28:02d}",
+        },
+        "highlight": {"text": [f"A paragraph about {query or word} and {word}, from post {doc_id}."]},
+        "sort": [score, doc_id],
+    }
+
+
+def search_response(body: dict, latency_ms: float, jitter_ms: float) -> dict:
+    took = max(0.0, random.gauss(latency_ms, jitter_ms)) if latency_ms else 0.0
+    if took:
+        time.sleep(took / 1000)
+
+    query = _query_text(body)
+    seed = int.from_bytes(hashlib.blake2b(query.encode(), digest_size=4).digest(), "little")
+    total = seed % 20000
+    size = int(body.get("size", 10))
+    search_after = body.get("search_after")
+    start = int(search_after[1]) - seed % 1000 + 1 if search_after else int(body.get("from", 0))
+    count = max(0, min(size, total - start))
+    hits = [_hit(seed % 1000 + start + i, round(20.0 / (1 + start + i), 4), query) for i in range(count)]
+
+    track = body.get("track_total_hits", 10000)
+    if track is False:
+        total_field = None
+    elif track is True or total <= int(track):
+        total_field = {"value": total, "relation": "eq"}
+    else:
+        total_field = {"value": int(track), "relation": "gte"}
+
+    response = {
+        "took": round(took),
+        "timed_out": False,
+        "_shards": {"total": 1, "successful": 1, "skipped": 0, "failed": 0},
+        "hits": {"max_score": hits[0]["_score"] if hits else None, "hits": hits},
+    }
+    if total_field:
+        response["hits"]["total"] = total_field
+    if "pit" in body:
+        response["pit_id"] = body["pit"]["id"]
+    return response
+
+
+class FakeElasticsearchHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # One write per response and no Nagle delay, so the server adds no latency of its own
+    wbufsize = -1
+    disable_nagle_algorithm = True
+    latency_ms = 5.0
+    jitter_ms = 2.0
+
+    def log_message(self, format, *args):
+        pass
+
+    def _body(self) -> bytes:
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def _send(self, payload: dict, status: int = 200):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("X-Elastic-Product", "Elasticsearch")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(data)
+
+    def do_HEAD(self):
+        self._send({})
+
+    def do_GET(self):
+        path = self.path.split("?")[0]
+        if path.endswith("/_search"):
+            self.do_POST()
+            return
+        self._send(
+            {
+                "name": "fake-es",
+                "cluster_name": "bench",
+                "version": {"number": "8.13.0", "build_flavor": "default"},
+                "tagline": "You Know, for Search",
+            }
+        )
+
+    def do_POST(self):
+        path = self.path.split("?")[0]
+        raw = self._body()
+        if path.endswith("/_msearch"):
+            lines = [json.loads(line) for line in raw.splitlines() if line.strip()]
+            responses = [
+                dict(search_response(body, 0, 0), status=200) for body in lines[1::2]
+            ]
+            took = max(0.0, random.gauss(self.latency_ms, self.jitter_ms)) if self.latency_ms else 0.0
+            time.sleep(took / 1000)
+            self._send({"took": round(took), "responses": responses})
+        elif path.endswith("/_search"):
+            body = json.loads(raw) if raw else {}
+            self._send(search_response(body, self.latency_ms, self.jitter_ms))
+        elif path.endswith("/_pit"):
+            self._send({"id": hashlib.blake2b(raw + str(time.time()).encode(), digest_size=8).hexdigest()})
+        else:
+            self._send({"acknowledged": True})
+
+    def do_PUT(self):
+        self._body()
+        self._send({"acknowledged": True})
+
+    def do_DELETE(self):
+        self._body()
+        self._send({"succeeded": True, "num_freed": 1})
+
+
+def serve(port: int, latency_ms: float, jitter_ms: float) -> ThreadingHTTPServer:
+    handler = type(
+        "Handler", (FakeElasticsearchHandler,), {"latency_ms": latency_ms, "jitter_ms": jitter_ms}
+    )
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--port", type=int, default=9200)
+    parser.add_argument("--latency-ms", type=float, default=5.0)
+    parser.add_argument("--jitter-ms", type=float, default=2.0)
+    args = parser.parse_args()
+    server = serve(args.port, args.latency_ms, args.jitter_ms)
+    print(f"Fake Elasticsearch listening on http://127.0.0.1:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
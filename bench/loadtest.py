@@ -0,0 +1,507 @@
+"""
+Replay a search query distribution against the web app and report throughput and latency.
+
+Usage:
+  uv run bench/loadtest.py --url http://127.0.0.1:8000 [--duration 30] [--concurrency 16]
+  uv run bench/loadtest.py --spawn --fake-es --disposable-pg [--workers 1]
+
+Queries come from --queries FILE (one per line, or a CSV dump of query_logs with a
+query column), from --from-db N (the N most frequent queries in query_logs, weighted by
+count), or by default from a synthetic Zipfian generator. --mix sets the route weights.
+
+--spawn starts uvicorn on web/server.py for the run. Alongside it, --fake-es starts
+bench/fake_es.py in-process and --disposable-pg starts a throwaway PostgreSQL container
+(docker) seeded with synthetic pages; without them the app uses the backends in .env.
+Note that /search logs every query, so point real-backend runs at a scratch database.
+
+Writes a JSON report (sorted keys, one route per entry) to --out, or stdout, so runs
+can be diffed between commits; --compare BASE.json prints the per-route change.
+"""
+
+import argparse
+import csv
+import http.client
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+from urllib.parse import quote, urlsplit
+
+from dotenv import load_dotenv
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+DEFAULT_MIX = "/api/search=60,/search=15,/api/suggest=15,/latest=5,/random=5"
+WORDS = (
+    "rust python postgres search index latency cache async kernel compiler design database "
+    "network linux startup writing career testing typescript golang vim emacs llm gpu "
+    "distributed systems react css performance profiling memory garbage collection sqlite "
+    "elasticsearch productivity burnout hiring remote open source security crypto"
+).split()
+
+
+# -----------------------------------------------------------------------------
+# Query sources
+# -----------------------------------------------------------------------------
+
+
+class QuerySampler:
+    """Draws queries with replacement according to their weights."""
+
+    def __init__(self, queries: list[str], weights: list[float], source: str):
+        if not queries:
+            raise SystemExit(f"No queries from {source}")
+        self.queries = queries
+        self.source = source
+        total = 0.0
+        self._cum_weights = []
+        for weight in weights:
+            total += weight
+            self._cum_weights.append(total)
+
+    def sample(self, rng: random.Random) -> str:
+        return rng.choices(self.queries, cum_weights=self._cum_weights)[0]
+
+
+def zipf_sampler(vocabulary: int, s: float, seed: int) -> QuerySampler:
+    """vocabulary distinct 1-3 word queries; the query of rank r has weight 1/r^s."""
+    rng = random.Random(seed)
+    queries, seen = [], set()
+    while len(queries) < vocabulary:
+        query = " ".join(rng.sample(WORDS, rng.choice((1, 1, 2, 2, 3))))
+        if rng.random() < 0.05:
+            query += f" site:blog{rng.randrange(500)}.example.com"
+        if query not in seen:
+            seen.add(query)
+            queries.append(query)
+    weights = [1 / (rank**s) for rank in range(1, vocabulary + 1)]
+    return QuerySampler(queries, weights, f"zipf(n={vocabulary}, s={s})")
+
+
+def file_sampler(path: str) -> QuerySampler:
+    """Every line (or CSV row) is one logged search, so repeats carry the distribution."""
+    with open(path, newline="") as f:
+        if path.endswith(".csv"):
+            queries = [row["query"] for row in csv.DictReader(f) if row.get("query")]
+        else:
+            queries = [line.strip() for line in f if line.strip()]
+    counts = Counter(queries)
+    return QuerySampler(list(counts), list(counts.values()), path)
+
+
+def db_sampler(limit: int) -> QuerySampler:
+    import psycopg2
+
+    conn = psycopg2.connect(
+        host=os.getenv("PGHOST"),
+        dbname=os.getenv("PGDATABASE"),
+        user=os.getenv("PGUSER"),
+        password=os.getenv("PGPASSWORD"),
+        port=os.getenv("PGPORT", 5432),
+        sslmode=os.getenv("PGSSLMODE", "prefer"),
+    )
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                """
+                SELECT query, count(*) FROM query_logs
+                WHERE query <> ''
+                GROUP BY query ORDER BY 2 DESC LIMIT %s
+                """,
+                (limit,),
+            )
+            rows = cursor.fetchall()
+    finally:
+        conn.close()
+    return QuerySampler([r[0] for r in rows], [float(r[1]) for r in rows], f"query_logs(top {limit})")
+
+
+# -----------------------------------------------------------------------------
+# Requests
+# -----------------------------------------------------------------------------
+
+
+def parse_mix(mix: str) -> tuple[list[str], list[float]]:
+    routes, weights = [], []
+    for part in mix.split(","):
+        route, _, weight = part.partition("=")
+        routes.append(route.strip())
+        weights.append(float(weight or 1))
+    return routes, weights
+
+
+def build_request(route: str, sampler: QuerySampler, rng: random.Random) -> tuple[str, str, bytes | None]:
+    """(method, path, body) for one request to route."""
+    if route == "/api/search":
+        page = 1 if rng.random() < 0.8 else rng.randint(2, 4)
+        return "GET", f"/api/search?q={quote(sampler.sample(rng))}&page={page}", None
+    if route == "/search":
+        return "GET", f"/search?q={quote(sampler.sample(rng))}", None
+    if route == "/api/suggest":
+        query = sampler.sample(rng)
+        return "GET", f"/api/suggest?q={quote(query[: rng.randint(1, max(1, len(query)))])}", None
+    if route == "/api/msearch":
+        queries = [{"q": sampler.sample(rng)} for _ in range(rng.randint(2, 8))]
+        return "POST", "/api/msearch", json.dumps({"queries": queries}).encode()
+    if route == "/latest":
+        return "GET", f"/latest?page={rng.randint(1, 5)}", None
+    return "GET", route, None
+
+
+class Worker(threading.Thread):
+    """One keep-alive connection issuing requests back to back until the deadline."""
+
+    def __init__(self, target: str, routes, weights, sampler, warmup_until, deadline, seed):
+        super().__init__(daemon=True)
+        parts = urlsplit(target)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.routes, self.weights, self.sampler = routes, weights, sampler
+        self.warmup_until, self.deadline = warmup_until, deadline
+        self.rng = random.Random(seed)
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.statuses: dict[str, Counter] = defaultdict(Counter)
+        self.conn: http.client.HTTPConnection | None = None
+
+    def _request(self, method: str, path: str, body: bytes | None) -> int:
+        if self.conn is None:
+            self.conn = http.client.HTTPConnection(self.host, self.port, timeout=30)
+        headers = {"User-Agent": "blog-search-loadtest"}
+        if body is not None:
+            headers["Content-Type"] = "application/json"
+        try:
+            self.conn.request(method, path, body=body, headers=headers)
+            response = self.conn.getresponse()
+            response.read()
+            return response.status
+        except (OSError, http.client.HTTPException):
+            self.conn.close()
+            self.conn = None
+            raise
+
+    def run(self):
+        while True:
+            now = time.perf_counter()
+            if now >= self.deadline:
+                break
+            route = self.rng.choices(self.routes, weights=self.weights)[0]
+            method, path, body = build_request(route, self.sampler, self.rng)
+            start = time.perf_counter()
+            try:
+                status = str(self._request(method, path, body))
+            except (OSError, http.client.HTTPException):
+                status = "error"
+            elapsed = time.perf_counter() - start
+            if start >= self.warmup_until:
+                self.latencies[route].append(elapsed)
+                self.statuses[route][status] += 1
+        if self.conn:
+            self.conn.close()
+
+
+def percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def summarize(latencies: list[float], statuses: Counter, seconds: float) -> dict:
+    errors = sum(n for status, n in statuses.items() if status == "error" or int(status) >= 500)
+    if not latencies:
+        return {"requests": 0, "errors": errors, "rps": 0.0, "statuses": dict(statuses)}
+    ms = [v * 1000 for v in latencies]
+    return {
+        "requests": len(ms),
+        "errors": errors,
+        "rps": round(len(ms) / seconds, 1),
+        "mean_ms": round(sum(ms) / len(ms), 2),
+        "p50_ms": round(percentile(ms, 50), 2),
+        "p95_ms": round(percentile(ms, 95), 2),
+        "p99_ms": round(percentile(ms, 99), 2),
+        "max_ms": round(max(ms), 2),
+        "statuses": dict(sorted(statuses.items())),
+    }
+
+
+def run_load(target, routes, weights, sampler, concurrency, duration, warmup, seed) -> dict:
+    start = time.perf_counter()
+    warmup_until = start + warmup
+    deadline = warmup_until + duration
+    workers = [
+        Worker(target, routes, weights, sampler, warmup_until, deadline, seed + i) for i in range(concurrency)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    by_route: dict[str, list[float]] = defaultdict(list)
+    statuses: dict[str, Counter] = defaultdict(Counter)
+    for worker in workers:
+        for route, values in worker.latencies.items():
+            by_route[route].extend(values)
+            statuses[route].update(worker.statuses[route])
+    everything = [v for values in by_route.values() for v in values]
+    return {
+        "routes": {route: summarize(by_route[route], statuses[route], duration) for route in sorted(by_route)},
+        "total": summarize(everything, sum(statuses.values(), Counter()), duration),
+    }
+
+
+# -----------------------------------------------------------------------------
+# Local stand-ins
+# -----------------------------------------------------------------------------
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class DisposablePostgres:
+    """A throwaway postgres container on a random local port, seeded with synthetic pages."""
+
+    IMAGE = "postgres:16-alpine"
+    PASSWORD = "bench"
+
+    def __init__(self, pages: int):
+        self.pages = pages
+        self.port = free_port()
+        self.container: str | None = None
+
+    def env(self) -> dict[str, str]:
+        return {
+            "PGHOST": "127.0.0.1",
+            "PGPORT": str(self.port),
+            "PGUSER": "postgres",
+            "PGPASSWORD": self.PASSWORD,
+            "PGDATABASE": "postgres",
+            "PGSSLMODE": "disable",
+            "PGCHANNELBINDING": "disable",
+        }
+
+    def __enter__(self):
+        self.container = subprocess.check_output(
+            [
+                "docker", "run", "--rm", "-d",
+                "-e", f"POSTGRES_PASSWORD={self.PASSWORD}",
+                "-p", f"127.0.0.1:{self.port}:5432",
+                self.IMAGE,
+            ],
+            text=True,
+        ).strip()
+        conn = self._connect()
+        try:
+            self._seed(conn)
+        finally:
+            conn.close()
+        return self
+
+    def _connect(self, timeout: float = 60.0):
+        import psycopg2
+
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                return psycopg2.connect(
+                    host="127.0.0.1", port=self.port, user="postgres",
+                    password=self.PASSWORD, dbname="postgres", connect_timeout=2,
+                )
+            except psycopg2.OperationalError:
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(0.5)
+
+    def _seed(self, conn):
+        with open(os.path.join(ROOT, "db", "schema.sql")) as f:
+            schema = f.read()
+        rng = random.Random(0)
+        with conn.cursor() as cursor:
+            cursor.execute(schema)
+            for start in range(0, self.pages, 1000):
+                rows = []
+                for n in range(start, min(start + 1000, self.pages)):
+                    words = rng.sample(WORDS, 4)
+                    text = " ".join(rng.choice(WORDS) for _ in range(400))
+                    rows.append(
+                        (
+                            f"Notes on {' '.join(words[:2])} #{n}",
+                            f"https://blog{n % 500}.example.com/posts/{n}",
+                            f"bench-{n}",
+                            f"20{10 + n % 15}-{1 + n % 12:02d}-{1 + n % 28:02d}",
+                            text,
+                        )
+                    )
+                cursor.executemany(
+                    "INSERT INTO pages (title, url, fingerprint, date, text) VALUES (%s, %s, %s, %s, %s)",
+                    rows,
+                )
+            cursor.execute("UPDATE corpus_stats SET page_count = (SELECT count(*) FROM pages)")
+        conn.commit()
+
+    def __exit__(self, *exc):
+        if self.container:
+            subprocess.run(["docker", "stop", self.container], capture_output=True)
+
+
+def spawn_app(port: int, workers: int, env: dict[str, str]) -> tuple[subprocess.Popen, float]:
+    """Start the app and wait for /readyz; returns the process and its seconds to ready."""
+    started = time.monotonic()
+    if workers > 1:
+        # What server.py's own launcher sets up for its workers
+        env = {
+            "WEB_CONCURRENCY": str(workers),
+            "CURSOR_SECRET": os.urandom(16).hex(),
+            "PROMETHEUS_MULTIPROC_DIR": tempfile.mkdtemp(prefix="blogsearch-metrics-"),
+            **env,
+        }
+    process = subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "server:app",
+            "--host", "127.0.0.1", "--port", str(port),
+            "--workers", str(workers), "--log-level", "warning",
+        ],
+        cwd=os.path.join(ROOT, "web"),
+        env={**os.environ, **env},
+    )
+    deadline = time.monotonic() + 120
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"App exited during startup with code {process.returncode}")
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=2)
+            conn.request("GET", "/readyz")
+            if conn.getresponse().status == 200:
+                return process, time.monotonic() - started
+        except OSError:
+            pass
+        time.sleep(0.1)
+    process.terminate()
+    raise SystemExit("App did not become ready within 120s")
+
+
+# -----------------------------------------------------------------------------
+# Reporting
+# -----------------------------------------------------------------------------
+
+
+def git_commit() -> dict:
+    def git(*args):
+        return subprocess.run(["git", *args], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+
+    return {"commit": git("rev-parse", "--short", "HEAD"), "dirty": bool(git("status", "--porcelain"))}
+
+
+def compare(base: dict, current: dict) -> str:
+    lines = [f"{'route':<16}  {'rps':<24}  {'p50 ms':<24}  {'p99 ms':<24}"]
+    for route in sorted(set(base["routes"]) | set(current["routes"])):
+        old, new = base["routes"].get(route, {}), current["routes"].get(route, {})
+        cells = []
+        for key in ("rps", "p50_ms", "p99_ms"):
+            a, b = old.get(key), new.get(key)
+            delta = f" ({(b - a) / a:+.0%})" if a and b is not None else ""
+            cells.append(f"{a} -> {b}{delta}")
+        lines.append(f"{route:<16}  {cells[0]:<24}  {cells[1]:<24}  {cells[2]:<24}")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", help="an already running app, e.g. http://127.0.0.1:8000")
+    parser.add_argument("--spawn", action="store_true", help="start uvicorn on web/server.py for the run")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers with --spawn")
+    parser.add_argument("--fake-es", action="store_true", help="serve Elasticsearch from bench/fake_es.py")
+    parser.add_argument("--es-latency-ms", type=float, default=5.0)
+    parser.add_argument("--disposable-pg", action="store_true", help="run PostgreSQL in a throwaway container")
+    parser.add_argument("--seed-pages", type=int, default=5000)
+    parser.add_argument("--queries", help="file of logged queries (one per line, or CSV with a query column)")
+    parser.add_argument("--from-db", type=int, metavar="N", help="sample the top N queries in query_logs")
+    parser.add_argument("--zipf-s", type=float, default=1.1)
+    parser.add_argument("--vocabulary", type=int, default=2000)
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="route=weight pairs")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--warmup", type=float, default=5.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", help="write the JSON report here instead of stdout")
+    parser.add_argument("--compare", metavar="BASE", help="print the change against an earlier report")
+    args = parser.parse_args()
+    if not args.url and not args.spawn:
+        parser.error("pass --url or --spawn")
+
+    load_dotenv(os.path.join(ROOT, ".env"))
+    if args.queries:
+        sampler = file_sampler(args.queries)
+    elif args.from_db:
+        sampler = db_sampler(args.from_db)
+    else:
+        sampler = zipf_sampler(args.vocabulary, args.zipf_s, args.seed)
+    routes, weights = parse_mix(args.mix)
+
+    fake_es = app = pg = None
+    env: dict[str, str] = {}
+    try:
+        if args.fake_es:
+            from fake_es import serve
+
+            fake_es = serve(0, args.es_latency_ms, args.es_latency_ms / 4)
+            threading.Thread(target=fake_es.serve_forever, daemon=True).start()
+            env["ELASTICSEARCH_URL"] = f"http://127.0.0.1:{fake_es.server_address[1]}"
+        if args.disposable_pg:
+            pg = DisposablePostgres(args.seed_pages).__enter__()
+            env.update(pg.env())
+        target = args.url
+        if args.spawn:
+            # All load comes from one client address; don't let per-client limits cap it
+            if "SEARCH_RATE_PER_SECOND" not in os.environ:
+                env["SEARCH_RATE_PER_SECOND"] = "1000000"
+            port = free_port()
+            app, ready_seconds = spawn_app(port, args.workers, env)
+            target = f"http://127.0.0.1:{port}"
+
+        results = run_load(
+            target, routes, weights, sampler, args.concurrency, args.duration, args.warmup, args.seed
+        )
+    finally:
+        if app:
+            app.terminate()
+            app.wait(30)
+        if pg:
+            pg.__exit__(None, None, None)
+        if fake_es:
+            fake_es.shutdown()
+
+    report = {
+        "meta": {
+            **git_commit(),
+            "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "target": "spawned" if args.spawn else args.url,
+            "elasticsearch": "fake" if args.fake_es else "env",
+            "postgres": "disposable" if args.disposable_pg else "env",
+            "workers": args.workers if args.spawn else None,
+            "ready_s": round(ready_seconds, 2) if args.spawn else None,
+            "concurrency": args.concurrency,
+            "duration_s": args.duration,
+            "queries": sampler.source,
+            "mix": args.mix,
+        },
+        **results,
+    }
+    output = json.dumps(report, indent=2, sort_keys=True)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+    if args.compare:
+        with open(args.compare) as f:
+            print(compare(json.load(f), report), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""
+Micro-benchmark of the /api/search response path: decode the ES body, format the hits,
+build the payload and encode it.
+
+Usage: uv run bench/serialize_bench.py [--hits 6] [--iterations 20000]
+
+"dicts + json" re-implements the previous path (stdlib json decode, one dict per hit,
+a re-wrapped payload dict, Starlette's JSONResponse encoding); "slots + orjson" runs
+the current SearchEngine formatting, SearchResponse and fast_json (stdlib json when
+orjson is not installed). Reports CPU time and peak allocation per request, and the
+memory each formatted result keeps alive while it is cached.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.append(os.path.join(ROOT, "web"))
+
+from fake_es import search_response  # noqa: E402
+
+import fast_json  # noqa: E402
+from results import SearchResponse, SearchResult  # noqa: E402
+from search_engine import SearchEngine  # noqa: E402
+
+
+def legacy_hit_to_row(hit: dict) -> dict:
+    src = hit.get("_source", {})
+    fragments = hit.get("highlight", {}).get("text")
+    return {
+        "title": src.get("title", ""),
+        "url": (src.get("url") or "").rstrip("/"),
+        "date": src.get("date"),
+        "text": " ... ".join(f.strip() for f in fragments),
+    }
+
+
+def legacy_render(engine: SearchEngine, raw: dict, per_page: int) -> bytes:
+    hits = raw["hits"]["hits"]
+    total = engine._es_total_hits(raw)
+    response = {
+        "results": [legacy_hit_to_row(h) for h in hits],
+        "results_size": total,
+        "results_size_relation": engine._es_total_relation(raw),
+        "search_time": raw.get("took", 0),
+        "page": 1,
+        "per_page": per_page,
+        "total_pages": (total + per_page - 1) // per_page,
+        "backend": "elasticsearch",
+    }
+    payload = {
+        "results": response["results"],
+        "total": response["results_size"],
+        "total_relation": response["results_size_relation"],
+        "page": response["page"],
+        "total_pages": response["total_pages"],
+        "backend": response["backend"],
+    }
+    # starlette.responses.JSONResponse.render
+    return json.dumps(payload, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode()
+
+
+def current_render(engine: SearchEngine, raw: dict, per_page: int) -> bytes:
+    response = engine._format_es_response(raw, 1, per_page)
+    payload = SearchResponse(
+        results=response["results"],
+        total=response["results_size"],
+        total_relation=response["results_size_relation"],
+        page=response["page"],
+        total_pages=response["total_pages"],
+        backend=response["backend"],
+    )
+    return fast_json.dumps(payload)
+
+
+PATHS = {
+    "dicts + json": (json.loads, legacy_render),
+    "slots + orjson": (fast_json.orjson.loads if fast_json.orjson else json.loads, current_render),
+}
+
+
+def peak_bytes(fn, *args) -> int:
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    fn(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def measure(decode, render, engine, body: bytes, per_page: int, iterations: int) -> dict:
+    def request():
+        return render(engine, decode(body), per_page)
+
+    for _ in range(min(iterations, 1000)):
+        request()
+    start = time.process_time()
+    for _ in range(iterations):
+        request()
+    cpu_us = (time.process_time() - start) / iterations * 1e6
+
+    raw = decode(body)
+    return {
+        "cpu_us": round(cpu_us, 1),
+        # Transient: orjson parses into a scratch buffer a few times the body size
+        "decode_peak": peak_bytes(decode, body),
+        "render_peak": peak_bytes(render, engine, raw, per_page),
+        "response_bytes": len(request()),
+    }
+
+
+def retained(engine: SearchEngine, body: bytes, per_page: int) -> dict:
+    """Bytes per result row object; the strings are shared, so only the container counts."""
+    raw = json.loads(body)
+    rows = {
+        "dicts + json": [legacy_hit_to_row(h) for h in raw["hits"]["hits"]],
+        "slots + orjson": engine._format_es_response(raw, 1, per_page)["results"],
+    }
+    copy = {
+        "dicts + json": lambda r: dict(r),
+        "slots + orjson": lambda r: SearchResult(r.title, r.url, r.date, r.text),
+    }
+    sizes = {}
+    for name, results in rows.items():
+        tracemalloc.start()
+        copies = [copy[name](r) for r in results]
+        size, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        sizes[name] = size // max(1, len(copies))
+    return sizes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--hits", type=int, default=SearchEngine.DEFAULT_PER_PAGE)
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+
+    engine = SearchEngine(use_elasticsearch=False)
+    try:
+        query = {"bool": {"must": [{"multi_match": {"query": "rust async runtime"}}]}}
+        body = json.dumps(search_response({"query": query, "size": args.hits}, 0, 0)).encode()
+
+        rows = {
+            name: measure(decode, render, engine, body, args.hits, args.iterations)
+            for name, (decode, render) in PATHS.items()
+        }
+        per_row = retained(engine, body, args.hits)
+    finally:
+        engine.query_log.close()
+
+    print(f"{args.hits} hits, {len(body)} byte ES body, orjson {'on' if fast_json.orjson else 'off'}")
+    print(
+        f"{'path':<16}  {'cpu us/req':>10}  {'decode peak B':>13}  {'render peak B':>13}  "
+        f"{'row B':>6}  {'out B':>6}"
+    )
+    for name, row in rows.items():
+        print(
+            f"{name:<16}  {row['cpu_us']:>10}  {row['decode_peak']:>13}  {row['render_peak']:>13}  "
+            f"{per_row[name]:>6}  {row['response_bytes']:>6}"
+        )
+    base, new = rows["dicts + json"], rows["slots + orjson"]
+    print(
+        f"CPU {1 - new['cpu_us'] / base['cpu_us']:.0%} saved, "
+        f"render allocation {1 - new['render_peak'] / base['render_peak']:.0%} saved, "
+        f"retained per result {1 - per_row['slots + orjson'] / per_row['dicts + json']:.0%} saved"
+    )
+
+
+if __name__ == "__main__":
+    main()
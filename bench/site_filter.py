@@ -0,0 +1,88 @@
+"""
+Benchmark site:-only queries: legacy leading-wildcard url filter vs the site_domains terms filter.
+
+Usage: uv run bench/site_filter.py [--runs 50] [domain ...]
+Without domains, the most common site_domains values in the index are used.
+Prints a JSON report of ES took and client wall time (ms) per variant.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import time
+
+from dotenv import load_dotenv
+from elasticsearch import Elasticsearch
+
+INDEX = "pages"
+
+
+def legacy_body(domain: str) -> dict:
+    return {
+        "query": {"bool": {"must": [{"match_all": {}}], "filter": [{"wildcard": {"url": f"*{domain}*"}}]}},
+        "size": 6,
+        "track_total_hits": True,
+    }
+
+
+def terms_body(domain: str) -> dict:
+    return {
+        "query": {"bool": {"must": [{"match_all": {}}], "filter": [{"terms": {"site_domains": [domain]}}]}},
+        "size": 6,
+        "track_total_hits": True,
+    }
+
+
+def sample_domains(es: Elasticsearch, count: int) -> list[str]:
+    raw = es.search(
+        index=INDEX,
+        size=0,
+        aggs={"sites": {"terms": {"field": "site_domains", "size": count}}},
+    )
+    return [b["key"] for b in raw["aggregations"]["sites"]["buckets"]]
+
+
+def percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def run(es: Elasticsearch, domains: list[str], build, runs: int) -> dict:
+    took, wall = [], []
+    for _ in range(runs):
+        for domain in domains:
+            start = time.perf_counter()
+            raw = es.search(index=INDEX, body=build(domain), request_cache=False)
+            wall.append((time.perf_counter() - start) * 1000)
+            took.append(raw["took"])
+    return {
+        "queries": len(wall),
+        "took_p50": percentile(took, 50),
+        "took_p95": percentile(took, 95),
+        "wall_p50": round(percentile(wall, 50), 2),
+        "wall_p95": round(percentile(wall, 95), 2),
+        "wall_mean": round(statistics.fmean(wall), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("domains", nargs="*")
+    parser.add_argument("--runs", type=int, default=50)
+    parser.add_argument("--sample", type=int, default=20, help="domains to sample when none are given")
+    args = parser.parse_args()
+
+    load_dotenv()
+    es = Elasticsearch(os.getenv("ELASTICSEARCH_URL", "http://localhost:9200"))
+    domains = args.domains or sample_domains(es, args.sample)
+    report = {
+        "domains": domains,
+        "wildcard": run(es, domains, legacy_body, args.runs),
+        "terms": run(es, domains, terms_body, args.runs),
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Measure the /api/search hit payload: full _source text vs highlighted snippets.
+
+Usage: uv run bench/snippets.py [--runs 20] query [query ...]
+Prints a JSON report of ES response bytes and Python formatting time per request.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+from dotenv import load_dotenv
+from elasticsearch import Elasticsearch
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "web"))
+from search_engine import QueryParser, SearchEngine  # noqa: E402
+
+
+def full_source_body(engine: SearchEngine, query: str) -> dict:
+    """The request shape before snippets: whole _source, no highlighter."""
+    clean_query, site_domains, _ = QueryParser.parse(query)
+    body = engine._es_search_body(clean_query, site_domains, 1, engine.DEFAULT_PER_PAGE)
+    del body["_source"], body["highlight"]
+    return body
+
+
+def snippet_body(engine: SearchEngine, query: str) -> dict:
+    clean_query, site_domains, _ = QueryParser.parse(query)
+    return engine._es_search_body(clean_query, site_domains, 1, engine.DEFAULT_PER_PAGE)
+
+
+def measure(es: Elasticsearch, engine: SearchEngine, queries: list[str], build, runs: int) -> dict:
+    sizes, format_us, took = [], [], []
+    for _ in range(runs):
+        for query in queries:
+            raw = es.search(index="pages", body=build(engine, query))
+            sizes.append(len(json.dumps(raw.body)))
+            took.append(raw["took"])
+            start = time.perf_counter()
+            engine._format_es_response(raw.body, 1, engine.DEFAULT_PER_PAGE)
+            format_us.append((time.perf_counter() - start) * 1e6)
+    return {
+        "requests": len(sizes),
+        "response_bytes_mean": round(statistics.fmean(sizes)),
+        "format_us_mean": round(statistics.fmean(format_us), 1),
+        "format_us_median": round(statistics.median(format_us), 1),
+        "took_ms_mean": round(statistics.fmean(took), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("queries", nargs="+")
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    load_dotenv()
+    es = Elasticsearch(os.getenv("ELASTICSEARCH_URL", "http://localhost:9200"))
+    # Only the request-building and formatting helpers are used; skip DB setup
+    engine = SearchEngine.__new__(SearchEngine)
+    report = {
+        "full_source": measure(es, engine, args.queries, full_source_body, args.runs),
+        "snippets": measure(es, engine, args.queries, snippet_body, args.runs),
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
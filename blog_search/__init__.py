@@ -0,0 +1 @@
+"""Code shared by the web app and the scraper (installed with the project by uv sync)."""
@@ -0,0 +1,174 @@
+"""
+Text embedding providers for hybrid (BM25 + kNN) search.
+Shared by the web app (query vectors) and the scraper (page vectors).
+"""
+
+import hashlib
+import logging
+import math
+import os
+import re
+import threading
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingProvider(ABC):
+    """Turns texts into fixed-size, L2-normalized vectors. Must be safe to call from threads."""
+
+    name = "base"
+    dims: int
+
+    @abstractmethod
+    def embed(self, texts: list[str]) -> list[list[float]]: ...
+
+    def embed_one(self, text: str) -> list[float]:
+        return self.embed([text])[0]
+
+
+class HashingEmbeddingProvider(EmbeddingProvider):
+    """Deterministic stand-in for tests and local development.
+
+    Signed feature hashing of lowercased word unigrams and bigrams. Vectors are stable
+    across processes and machines (blake2b, not Python's salted hash) and need no model.
+    """
+
+    name = "hashing"
+    TOKEN_PATTERN = re.compile(r"\w+")
+
+    def __init__(self, dims: int = 384):
+        self.dims = dims
+
+    def _vector(self, text: str) -> list[float]:
+        vector = [0.0] * self.dims
+        tokens = self.TOKEN_PATTERN.findall(text.lower())
+        features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+        for feature in features:
+            digest = hashlib.blake2b(feature.encode(), digest_size=8).digest()
+            value = int.from_bytes(digest, "little")
+            vector[value % self.dims] += 1.0 if value >> 63 else -1.0
+        norm = math.sqrt(sum(v * v for v in vector))
+        if not norm:
+            # Cosine similarity is undefined for the zero vector; use a fixed unit vector
+            vector[0] = 1.0
+            return vector
+        return [v / norm for v in vector]
+
+    def embed(self, texts: list[str]) -> list[list[float]]:
+        return [self._vector(text) for text in texts]
+
+
+class FastEmbedProvider(EmbeddingProvider):
+    """Local CPU-only ONNX sentence embeddings via fastembed (optional dependency)."""
+
+    name = "fastembed"
+    DEFAULT_MODEL = "BAAI/bge-small-en-v1.5"
+
+    def __init__(self, model_name: str = DEFAULT_MODEL, batch_size: int = 64, threads: int | None = None):
+        from fastembed import TextEmbedding
+
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self._model = TextEmbedding(model_name=model_name, threads=threads)
+        self.dims = len(next(iter(self._model.embed(["dimension probe"]))))
+
+    def embed(self, texts: list[str]) -> list[list[float]]:
+        return [v.tolist() for v in self._model.embed(texts, batch_size=self.batch_size)]
+
+
+def get_embedding_provider(name: str | None = None) -> EmbeddingProvider | None:
+    """Build the provider named by EMBEDDING_PROVIDER (none, hashing, fastembed)."""
+    name = (name or os.getenv("EMBEDDING_PROVIDER", "none")).lower()
+    if name in ("", "none"):
+        return None
+    if name == "hashing":
+        return HashingEmbeddingProvider(dims=int(os.getenv("EMBEDDING_DIMS", 384)))
+    if name == "fastembed":
+        threads = os.getenv("EMBEDDING_THREADS")
+        return FastEmbedProvider(
+            model_name=os.getenv("EMBEDDING_MODEL", FastEmbedProvider.DEFAULT_MODEL),
+            threads=int(threads) if threads else None,
+        )
+    raise ValueError(f"Unknown EMBEDDING_PROVIDER: {name}")
+
+
+class EmbeddingBatcher:
+    """Collects (doc_id, text) pairs from many threads and embeds them in batches.
+
+    One background thread calls provider.embed once per batch_size items (or every
+    flush_interval seconds) and hands the vectors to sink, so callers never wait on
+    the model.
+    """
+
+    def __init__(
+        self,
+        provider: EmbeddingProvider,
+        sink: Callable[[list[tuple[str, list[float]]]], None],
+        batch_size: int = 64,
+        flush_interval: float = 2.0,
+        max_pending: int = 10000,
+    ):
+        self.provider = provider
+        self.sink = sink
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._pending: deque[tuple[str, str]] = deque()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._not_full = threading.Condition(self._lock)
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def _ensure_started(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+            self._thread.start()
+
+    def submit(self, doc_id: str, text: str) -> None:
+        """Queue one document; blocks only if max_pending documents are already waiting."""
+        with self._not_full:
+            self._ensure_started()
+            while len(self._pending) >= self.max_pending:
+                self._not_full.wait()
+            self._pending.append((doc_id, text))
+            pending = len(self._pending)
+        if pending >= self.batch_size:
+            self._wakeup.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+        self.flush()
+
+    def flush(self) -> None:
+        with self._flush_lock:
+            while True:
+                with self._not_full:
+                    batch = [self._pending.popleft() for _ in range(min(self.batch_size, len(self._pending)))]
+                    self._not_full.notify_all()
+                if not batch:
+                    return
+                try:
+                    vectors = self.provider.embed([text for _, text in batch])
+                    self.sink([(doc_id, vector) for (doc_id, _), vector in zip(batch, vectors)])
+                except Exception:
+                    logger.exception("Error embedding %d documents", len(batch))
+
+    def close(self, timeout: float | None = None) -> None:
+        """Embed everything still queued, then stop the background thread."""
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread is None:
+            return
+        self._stop.set()
+        self._wakeup.set()
+        thread.join(timeout)
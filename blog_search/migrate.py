@@ -0,0 +1,94 @@
+"""
+Apply db/schema.sql once per schema version, however many processes start at once.
+
+The web workers and the scraper all call ensure_schema() on startup: when the recorded
+checksum matches schema.sql it costs one SELECT and takes no locks; otherwise the first
+process to get the advisory lock runs the DDL and the rest wait, then see it applied.
+Multi-worker deployments can instead run this once before starting the workers and set
+SCHEMA_AUTO_MIGRATE=false.
+
+Usage: uv run python -m blog_search.migrate [--force]
+"""
+
+import hashlib
+import os
+import sys
+
+SCHEMA_PATH = os.path.join(os.path.dirname(__file__), "..", "db", "schema.sql")
+# pg_advisory_xact_lock key shared by every process that migrates this database
+SCHEMA_LOCK_ID = 7_364_521_980
+
+RECORD_VERSION_SQL = """
+    INSERT INTO schema_version (id, checksum) VALUES (TRUE, %s)
+    ON CONFLICT (id) DO UPDATE SET checksum = EXCLUDED.checksum, applied_at = CURRENT_TIMESTAMP
+"""
+
+
+def read_schema() -> tuple[str, str]:
+    with open(SCHEMA_PATH, "r") as f:
+        schema = f.read()
+    return schema, hashlib.sha256(schema.encode()).hexdigest()
+
+
+def applied_checksum(cursor) -> str | None:
+    cursor.execute("SELECT to_regclass('schema_version') IS NOT NULL")
+    if not cursor.fetchone()[0]:
+        return None
+    cursor.execute("SELECT checksum FROM schema_version")
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def ensure_schema(conn, force: bool = False) -> bool:
+    """Bring the database up to schema.sql; returns True if the DDL ran in this call."""
+    schema, checksum = read_schema()
+    try:
+        with conn.cursor() as cursor:
+            if not force and applied_checksum(cursor) == checksum:
+                conn.commit()
+                return False
+            # Serialize concurrent starters, then re-check: another process may have finished
+            cursor.execute("SELECT pg_advisory_xact_lock(%s)", (SCHEMA_LOCK_ID,))
+            if not force and applied_checksum(cursor) == checksum:
+                conn.commit()
+                return False
+            cursor.execute(schema)
+            cursor.execute(RECORD_VERSION_SQL, (checksum,))
+        conn.commit()
+        return True
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def schema_is_current(conn) -> bool:
+    _, checksum = read_schema()
+    try:
+        with conn.cursor() as cursor:
+            current = applied_checksum(cursor) == checksum
+        conn.commit()
+        return current
+    except Exception:
+        conn.rollback()
+        raise
+
+
+if __name__ == "__main__":
+    import psycopg2
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    conn = psycopg2.connect(
+        host=os.getenv("PGHOST"),
+        database=os.getenv("PGDATABASE"),
+        user=os.getenv("PGUSER"),
+        password=os.getenv("PGPASSWORD"),
+        port=os.getenv("PGPORT", 5432),
+        sslmode=os.getenv("PGSSLMODE", "prefer"),
+        connect_timeout=10,
+    )
+    try:
+        applied = ensure_schema(conn, force="--force" in sys.argv[1:])
+        print("Schema applied" if applied else "Schema already up to date")
+    finally:
+        conn.close()
@@ -0,0 +1,37 @@
+"""
+What a site: filter matches, shared by the scraper (which indexes site_domains into
+Elasticsearch) and the web app's PostgreSQL and SQLite fallbacks.
+
+A page is on site X when X is the page's host or the host's registrable domain, so
+site:example.com covers blog.example.com, but site:b.example.com does not cover
+a.b.example.com.
+"""
+
+from functools import lru_cache
+from urllib.parse import urlsplit
+
+from courlan import extract_domain
+
+
+def normalize_site(domain: str) -> str:
+    """Lowercase, no www., no port, no surrounding dots."""
+    domain = domain.lower().split(":")[0].strip(".")
+    return domain[4:] if domain.startswith("www.") else domain
+
+
+def url_host(url: str | None) -> str:
+    return normalize_site(urlsplit(url or "").hostname or "")
+
+
+@lru_cache(maxsize=65536)
+def host_sites(host: str) -> tuple[str, ...]:
+    """The host, then its registrable domain when that differs (e.g. example.co.uk)."""
+    if not host:
+        return ()
+    parent = normalize_site(extract_domain(f"http://{host}/") or "")
+    return (host, parent) if parent and parent != host else (host,)
+
+
+def site_domains(url: str | None) -> list[str]:
+    """Every site: value that matches the page at url."""
+    return list(host_sites(url_host(url)))
@@ -46,9 +46,42 @@ CREATE INDEX IF NOT EXISTS pages_tsv_idx ON pages USING gin(page_tsv);
 -- Includes id for index-only scans on the subquery
 CREATE INDEX IF NOT EXISTS pages_date_id_idx ON pages (date DESC NULLS LAST, id) WHERE date IS NOT NULL;
 
+-- Index for incremental refreshes of pages scraped since a watermark (/random id sampler)
+CREATE INDEX IF NOT EXISTS pages_scraped_on_date_idx ON pages (scraped_on_date);
+
+-- Index for the recent-queries window read when rebuilding autocomplete suggestions
+CREATE INDEX IF NOT EXISTS query_logs_timestamp_idx ON query_logs (timestamp);
+
 -- Table for storing stripped URLs that should be skipped from future scraping
 CREATE TABLE IF NOT EXISTS skipped_urls (
     stripped_url TEXT PRIMARY KEY,
     reason TEXT,
     created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
 );
+
+-- Single-row counter bumped by the scraper whenever the search index changes.
+-- Web nodes poll it to invalidate their in-process search result caches.
+CREATE TABLE IF NOT EXISTS index_generation (
+    id BOOLEAN PRIMARY KEY DEFAULT true CHECK (id),
+    generation BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+INSERT INTO index_generation (id) VALUES (true) ON CONFLICT DO NOTHING;
+
+-- Single-row page count maintained by the scraper's insert path, so the web tier
+-- never has to COUNT(*) pages. Seeded once from the table when first created.
+CREATE TABLE IF NOT EXISTS corpus_stats (
+    id BOOLEAN PRIMARY KEY DEFAULT true CHECK (id),
+    page_count BIGINT NOT NULL DEFAULT 0
+);
+INSERT INTO corpus_stats (id, page_count)
+SELECT true, (SELECT COUNT(*) FROM pages)
+WHERE NOT EXISTS (SELECT 1 FROM corpus_stats);
+
+-- Single-row record of the schema.sql checksum last applied (see blog_search/migrate.py), so
+-- starting processes can skip re-running this file when nothing has changed.
+CREATE TABLE IF NOT EXISTS schema_version (
+    id BOOLEAN PRIMARY KEY DEFAULT true CHECK (id),
+    checksum TEXT NOT NULL,
+    applied_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
@@ -14,10 +14,13 @@ import requests
 import trafilatura
 from courlan import clean_url, get_base_url, is_valid_url
 from dotenv import load_dotenv
-from elasticsearch import Elasticsearch
+from elasticsearch import BadRequestError, Elasticsearch, helpers
 from lxml import html
 from psycopg2 import Error, pool
 
+from blog_search.embeddings import EmbeddingBatcher, get_embedding_provider
+from blog_search.migrate import ensure_schema
+from blog_search.sites import site_domains
 from sqs_queue import SQSQueue
 
 MAX_WORKERS = 100
@@ -51,6 +54,8 @@ class Scraper:
         self.existing_stripped_urls = None
         self.elasticsearch_client: Elasticsearch | None = None
         self._es_index = "pages"
+        self.embedding_batcher: EmbeddingBatcher | None = None
+        self.init_embeddings()
         self.init_elasticsearch()
 
     def init_pool(self):
@@ -111,19 +116,67 @@ class Scraper:
                 return
             self.elasticsearch_client = client
             logger.info("Connected to Elasticsearch at %s (index %s)", url, self._es_index)
+            self.ensure_elasticsearch_mapping()
         except Exception as e:
             logger.warning("Could not connect to Elasticsearch (will skip indexing): %s", e)
             self.elasticsearch_client = None
 
+    def init_embeddings(self):
+        """Set up batched page embeddings if EMBEDDING_PROVIDER is configured."""
+        try:
+            provider = get_embedding_provider()
+        except Exception as e:
+            logger.warning("Could not load embedding provider (hybrid vectors disabled): %s", e)
+            return
+        if provider is None:
+            return
+        self.embedding_batcher = EmbeddingBatcher(
+            provider,
+            self.store_embeddings,
+            batch_size=int(os.getenv("EMBEDDING_BATCH_SIZE", 64)),
+        )
+        logger.info("Embedding pages with %s (%d dims)", provider.name, provider.dims)
+
+    def ensure_elasticsearch_mapping(self):
+        """Map the site: filter and embedding fields, creating the index if it is missing.
+
+        They must be mapped before the first document is indexed: dynamic mapping would make
+        site_domains text and embedding a float array, and neither can be changed afterwards.
+        """
+        properties = {
+            "domain": {"type": "keyword"},
+            "site_domains": {"type": "keyword"},
+        }
+        if self.embedding_batcher:
+            properties["embedding"] = {
+                "type": "dense_vector",
+                "dims": self.embedding_batcher.provider.dims,
+                "index": True,
+                "similarity": "cosine",
+            }
+        try:
+            if not self.elasticsearch_client.indices.exists(index=self._es_index):
+                try:
+                    self.elasticsearch_client.indices.create(
+                        index=self._es_index, mappings={"properties": properties}
+                    )
+                    logger.info("Created Elasticsearch index %s", self._es_index)
+                    return
+                except BadRequestError as e:
+                    # Another scraper process created it first; fall through to update it
+                    if e.error != "resource_already_exists_exception":
+                        raise
+            self.elasticsearch_client.indices.put_mapping(
+                index=self._es_index, properties=properties
+            )
+        except Exception as e:
+            logger.warning("Failed to update Elasticsearch mapping: %s", e)
+
     def init_db(self):
         try:
-            filepath = os.path.join(os.path.dirname(__file__), "..", "db", "schema.sql")
-            with open(filepath, "r") as f:
-                schema = f.read()
-                with self.db_connection() as conn:
-                    with conn.cursor() as cur:
-                        cur.execute(schema)
-                    conn.commit()
+            with self.db_connection() as conn:
+                if ensure_schema(conn):
+                    logger.info("Applied db/schema.sql")
         except (Exception, Error) as error:
             logger.error("Error while initializing database: %s", error)
             sys.exit(1)
@@ -293,6 +346,8 @@ class Scraper:
 
             executor.shutdown(wait=True)
 
+        if self.embedding_batcher:
+            self.embedding_batcher.close()
         logger.info("Scraping complete - no more messages in queue")
 
     def process_message_from_queue(self):
@@ -505,7 +560,7 @@ class Scraper:
                             date = EXCLUDED.date,
                             text = EXCLUDED.text,
                             scraped_on_date = CURRENT_TIMESTAMP
-                    RETURNING id
+                    RETURNING id, (xmax = 0) AS inserted
                 """,
                     (
                         page["title"],
@@ -519,11 +574,19 @@ class Scraper:
                 result = cursor.fetchone()
                 if result:
                     page_id = result[0]
+                    if result[1]:
+                        # New row (not an ON CONFLICT update): keep the page count exact
+                        cursor.execute(
+                            "UPDATE corpus_stats SET page_count = page_count + 1"
+                        )
                     logger.info("Successfully saved/updated page: %s", page["url"])
+                    # Delivered on commit; web nodes refresh their /latest snapshot
+                    cursor.execute("NOTIFY pages_changed")
                 conn.commit()
 
             if page_id and self.elasticsearch_client:
                 self.index_page_in_elasticsearch(page, page_id)
+                self.bump_index_generation()
 
         except Error as error:
             # Check if it's a fingerprint duplicate error
@@ -615,6 +678,8 @@ class Scraper:
                 "date": page.get("date"),
                 "scraped_on_date": datetime.now(timezone.utc).isoformat(),
                 "original_url": page.get("original_url"),
+                "domain": self.get_domain(page["url"] or "").lower(),
+                "site_domains": site_domains(page["url"]),
             }
             self.elasticsearch_client.index(
                 index=self._es_index,
@@ -626,10 +691,35 @@ class Scraper:
                 page["url"],
                 page_id,
             )
+            if self.embedding_batcher:
+                self.embedding_batcher.submit(str(page_id), self.embedding_text(page))
 
         except Exception as e:
             logger.warning("Failed to index page in Elasticsearch %s: %s", page["url"], e)
 
+    def embedding_text(self, page: dict) -> str:
+        """Title plus the opening chunk; sentence models truncate long inputs anyway"""
+        chunks = self.chunk_text(page["text"] or "", target_size=1600, max_size=2000)
+        return f"{page['title'] or ''}\n{chunks[0] if chunks else ''}"
+
+    def store_embeddings(self, vectors: list[tuple[str, list[float]]]):
+        """Bulk-add a batch of page vectors to their already-indexed documents."""
+        actions = (
+            {
+                "_op_type": "update",
+                "_index": self._es_index,
+                "_id": doc_id,
+                "doc": {"embedding": vector},
+            }
+            for doc_id, vector in vectors
+        )
+        success, errors = helpers.bulk(
+            self.elasticsearch_client, actions, raise_on_error=False, stats_only=False
+        )
+        if errors:
+            logger.warning("Failed to store %d of %d embeddings", len(errors), len(vectors))
+        logger.info("Stored %d page embeddings", success)
+
     def get_domain(self, url: str) -> str:
         """Extract domain from URL"""
         try:
@@ -638,7 +728,6 @@ class Scraper:
         except:
             return ""
 
-
     def reindex_all(self):
         """Re-index all pages from the database into Elasticsearch."""
         if not self.elasticsearch_client:
@@ -689,6 +778,26 @@ class Scraper:
 
         except Exception as e:
             logger.error("Error during re-indexing: %s", e)
+        finally:
+            if self.embedding_batcher:
+                self.embedding_batcher.close()
+            self.bump_index_generation()
+
+    def bump_index_generation(self):
+        """Mark the search index as changed so web nodes drop cached results."""
+        try:
+            with self.db_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    """
+                    UPDATE index_generation
+                    SET generation = generation + 1, updated_at = CURRENT_TIMESTAMP
+                    """
+                )
+                conn.commit()
+                cursor.close()
+        except (Exception, Error) as error:
+            logger.warning("Error bumping index generation: %s", error)
 
     def tmp(self):
         pass
@@ -0,0 +1,139 @@
+import asyncio
+
+import admission
+from admission import ConcurrencyLimiter
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_released_slots_go_to_waiters_in_arrival_order():
+    async def main():
+        limiter = ConcurrencyLimiter("test", limit=1, queue_size=3, queue_timeout=5)
+        assert await limiter.acquire() is None
+        admitted = []
+
+        async def wait(i):
+            assert await limiter.acquire() is None
+            admitted.append(i)
+
+        tasks = [asyncio.create_task(wait(i)) for i in range(3)]
+        await settle()
+        assert limiter.stats()["queued"] == 3
+
+        for expected in ([0], [0, 1], [0, 1, 2]):
+            limiter.release()
+            await settle()
+            assert admitted == expected
+            assert limiter.stats()["in_flight"] == 1
+        await asyncio.gather(*tasks)
+
+        limiter.release()
+        assert limiter.stats()["in_flight"] == 0
+
+    asyncio.run(main())
+
+
+def test_new_arrivals_do_not_overtake_the_queue():
+    async def main():
+        limiter = ConcurrencyLimiter("test", limit=1, queue_size=1, queue_timeout=5)
+        await limiter.acquire()
+        queued = asyncio.create_task(limiter.acquire())
+        await settle()
+        assert await limiter.acquire() == "queue_full"
+        assert limiter.stats()["queue_full"] == 1
+
+        limiter.release()
+        newcomer = asyncio.create_task(limiter.acquire())
+        await settle()
+        assert await queued is None
+        assert not newcomer.done()
+
+        limiter.release()
+        assert await newcomer is None
+
+    asyncio.run(main())
+
+
+def test_waiter_times_out_and_leaves_the_queue():
+    async def main():
+        limiter = ConcurrencyLimiter("test", limit=1, queue_size=1, queue_timeout=0.01)
+        await limiter.acquire()
+        assert await limiter.acquire() == "queue_timeout"
+        assert limiter.stats()["queued"] == 0
+        assert limiter.stats()["queue_timeouts"] == 1
+
+        limiter.release()
+        assert limiter.stats()["in_flight"] == 0
+
+    asyncio.run(main())
+
+
+def test_slot_handed_over_as_the_timeout_fires_is_passed_on(monkeypatch):
+    async def main():
+        limiter = ConcurrencyLimiter("test", limit=1, queue_size=1, queue_timeout=5)
+        await limiter.acquire()
+
+        async def handed_over_then_timed_out(waiter, timeout):
+            limiter.release()
+            assert waiter.done()
+            raise asyncio.TimeoutError
+
+        monkeypatch.setattr(admission.asyncio, "wait_for", handed_over_then_timed_out)
+        assert await limiter.acquire() == "queue_timeout"
+        monkeypatch.undo()
+
+        assert limiter.stats()["in_flight"] == 0
+        assert await limiter.acquire() is None
+
+    asyncio.run(main())
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    async def main():
+        limiter = ConcurrencyLimiter("test", limit=1, queue_size=2, queue_timeout=5)
+        await limiter.acquire()
+        cancelled = asyncio.create_task(limiter.acquire())
+        behind = asyncio.create_task(limiter.acquire())
+        await settle()
+
+        cancelled.cancel()
+        await settle()
+        assert cancelled.cancelled()
+        assert limiter.stats()["queued"] == 1
+
+        limiter.release()
+        assert await behind is None
+        assert limiter.stats()["in_flight"] == 1
+
+    asyncio.run(main())
+
+
+def test_waiter_cancelled_after_the_handoff_does_not_leak_the_slot():
+    async def main():
+        limiter = ConcurrencyLimiter("test", limit=1, queue_size=2, queue_timeout=5)
+        await limiter.acquire()
+        first = asyncio.create_task(limiter.acquire())
+        second = asyncio.create_task(limiter.acquire())
+        await settle()
+
+        limiter.release()
+        first.cancel()
+        await settle()
+
+        # Depending on the Python version wait_for either delivers the slot despite
+        # the cancel or raises; either way exactly one waiter ends up holding it
+        holders = [t for t in (first, second) if t.done() and not t.cancelled()]
+        assert len(holders) == 1
+        assert limiter.stats()["in_flight"] == 1
+        assert limiter.stats()["queued"] == (1 if holders[0] is first else 0)
+
+        limiter.release()
+        if holders[0] is first:
+            assert await second is None
+            limiter.release()
+        assert limiter.stats()["in_flight"] == 0
+
+    asyncio.run(main())
@@ -0,0 +1,81 @@
+import pytest
+
+import circuit_breaker
+from circuit_breaker import CircuitBreaker
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(circuit_breaker.time, "monotonic", lambda: now[0])
+    return now
+
+
+def fail(breaker, times):
+    for _ in range(times):
+        assert breaker.allow_request()
+        breaker.record_failure()
+
+
+def test_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker("es", failure_threshold=3, base_backoff=2.0)
+    fail(breaker, 2)
+    assert breaker.state == CircuitBreaker.CLOSED
+
+    fail(breaker, 1)
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow_request()
+    assert breaker.retry_after() == 2
+    assert breaker.stats()["rejected"] == 1
+
+
+def test_success_resets_the_failure_count(clock):
+    breaker = CircuitBreaker("es", failure_threshold=3)
+    fail(breaker, 2)
+    assert breaker.allow_request()
+    breaker.record_success()
+    fail(breaker, 2)
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_half_open_lets_one_probe_through(clock):
+    breaker = CircuitBreaker("es", failure_threshold=1, base_backoff=2.0)
+    fail(breaker, 1)
+    clock[0] += 2.0
+
+    assert breaker.allow_request()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.allow_request()
+
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.retry_after() == 0
+    assert breaker.allow_request()
+
+
+def test_failed_probe_doubles_the_backoff_up_to_the_cap(clock):
+    breaker = CircuitBreaker("es", failure_threshold=1, base_backoff=2.0, max_backoff=5.0)
+    fail(breaker, 1)
+
+    for backoff in (4.0, 5.0, 5.0):
+        clock[0] += breaker.backoff
+        fail(breaker, 1)
+        assert breaker.state == CircuitBreaker.OPEN
+        assert breaker.backoff == backoff
+        clock[0] += backoff - 0.5
+        assert not breaker.allow_request()
+
+
+def test_reopening_after_recovery_starts_from_the_base_backoff(clock):
+    breaker = CircuitBreaker("es", failure_threshold=1, base_backoff=2.0)
+    fail(breaker, 1)
+    clock[0] += 2.0
+    fail(breaker, 1)
+    assert breaker.backoff == 4.0
+
+    clock[0] += 4.0
+    assert breaker.allow_request()
+    breaker.record_success()
+    fail(breaker, 1)
+    assert breaker.backoff == 2.0
+    assert breaker.stats()["opened"] == 3
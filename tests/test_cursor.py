@@ -0,0 +1,83 @@
+import asyncio
+import json
+
+import pytest
+
+from search_engine import InvalidCursor, PageTooDeep, SearchEngine
+
+STATE = {"pit": "pit-id", "sa": [12.5, 301], "q": "rust async", "pp": SearchEngine.CURSOR_MAX_PER_PAGE}
+
+
+def make_engine(key=b"k" * 32):
+    engine = SearchEngine.__new__(SearchEngine)
+    engine._cursor_key = key
+    return engine
+
+
+def signed(engine, state):
+    return engine._encode_cursor(state)
+
+
+def test_cursor_round_trips():
+    engine = make_engine()
+    assert engine._decode_cursor(signed(engine, STATE)) == STATE
+    assert engine._decode_cursor(signed(engine, {**STATE, "sa": None})) == {**STATE, "sa": None}
+
+
+def test_tampered_payload_is_rejected():
+    engine = make_engine()
+    _, signature = signed(engine, STATE).split(".")
+    forged = SearchEngine._b64encode(json.dumps({**STATE, "pp": 5000}).encode())
+    with pytest.raises(InvalidCursor, match="signature"):
+        engine._decode_cursor(f"{forged}.{signature}")
+
+
+@pytest.mark.parametrize("cursor", ["", "garbage", "abc.def", "abc."])
+def test_unsigned_cursor_is_rejected(cursor):
+    with pytest.raises(InvalidCursor, match="signature"):
+        make_engine()._decode_cursor(cursor)
+
+
+def test_cursor_from_another_key_is_rejected():
+    cursor = signed(make_engine(b"a" * 32), STATE)
+    with pytest.raises(InvalidCursor, match="signature"):
+        make_engine(b"b" * 32)._decode_cursor(cursor)
+
+
+@pytest.mark.parametrize(
+    "state, reason",
+    [
+        ({**STATE, "pp": SearchEngine.CURSOR_MAX_PER_PAGE + 1}, "page size"),
+        ({**STATE, "pp": 0}, "page size"),
+        ({**STATE, "pp": str(SearchEngine.CURSOR_MAX_PER_PAGE)}, "page size"),
+        ({**STATE, "sa": [1]}, "sort position"),
+        ({**STATE, "sa": ["x", 1]}, "sort position"),
+        ({**STATE, "sa": [True, 1]}, "sort position"),
+        ({**STATE, "q": None}, "bad fields"),
+        ({k: v for k, v in STATE.items() if k != "pit"}, "missing fields"),
+    ],
+)
+def test_signed_but_malformed_state_is_rejected(state, reason):
+    engine = make_engine()
+    with pytest.raises(InvalidCursor, match=reason):
+        engine._decode_cursor(signed(engine, state))
+
+
+def test_signed_non_json_payload_is_rejected():
+    engine = make_engine()
+    payload = SearchEngine._b64encode(b"not json")
+    with pytest.raises(InvalidCursor, match="malformed"):
+        engine._decode_cursor(f"{payload}.{engine._cursor_signature(payload)}")
+
+
+def test_cursor_for_a_different_query_is_rejected():
+    engine = make_engine()
+    cursor = signed(engine, STATE)
+    with pytest.raises(InvalidCursor, match="different query"):
+        asyncio.run(engine.search_elasticsearch_cursor_async("rust traits", cursor=cursor))
+
+
+@pytest.mark.parametrize("page, per_page", [(501, 20), (10001, 1)])
+def test_page_past_the_result_window_is_rejected(page, per_page):
+    with pytest.raises(PageTooDeep, match="use a cursor"):
+        asyncio.run(make_engine().search_elasticsearch_async("rust", page=page, per_page=per_page))
@@ -0,0 +1,26 @@
+import psycopg2
+import pytest
+from fastapi.testclient import TestClient
+
+import server
+
+
+async def unreachable(*args, **kwargs):
+    raise psycopg2.OperationalError("connection refused")
+
+
+@pytest.fixture
+def client(monkeypatch):
+    for name in ("get_latest_posts_async", "get_random_post_async", "search_async"):
+        monkeypatch.setattr(server.search_engine, name, unreachable)
+    # Without the lifespan, so no backend is started
+    return TestClient(server.app)
+
+
+@pytest.mark.parametrize("path", ["/latest", "/latest?page=3", "/random", "/search?q=rust&use_postgres=true"])
+def test_pages_only_postgres_serves_degrade_to_a_503(client, path):
+    response = client.get(path)
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == str(server.DATABASE_RETRY_AFTER)
+    assert response.headers["content-type"].startswith("text/html")
+    assert "temporarily unavailable" in response.text
@@ -0,0 +1,128 @@
+import pytest
+from jinja2 import DictLoader, Environment
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from http_cache import HTTPCacheMiddleware, StaticPages, etag_matches, make_etag
+
+
+class Backend:
+    def __init__(self):
+        self.posts_size = 100
+        self.generation = 1
+        self.searches = 0
+
+    async def search(self, request):
+        self.searches += 1
+        if request.query_params.get("q") == "missing":
+            return JSONResponse({"error": "not found"}, status_code=404)
+        headers = {"Cache-Control": "no-store"} if "fallback" in request.query_params else None
+        return JSONResponse({"q": request.query_params.get("q"), "n": self.searches}, headers=headers)
+
+
+@pytest.fixture
+def backend():
+    return Backend()
+
+
+@pytest.fixture
+def client(backend):
+    app = Starlette(routes=[Route("/api/search", backend.search, methods=["GET", "POST"])])
+    env = Environment(loader=DictLoader({"about.html": "{{ posts_size }} posts"}))
+    app.add_middleware(
+        HTTPCacheMiddleware,
+        pages=StaticPages(env, {"/about": "about.html"}),
+        posts_size=lambda: backend.posts_size,
+        generation=lambda: backend.generation,
+        search_max_age=30,
+    )
+    return TestClient(app)
+
+
+def test_static_page_revalidates_until_the_corpus_grows(client, backend):
+    first = client.get("/about")
+    assert first.text == "100 posts"
+    etag = first.headers["etag"]
+    assert not etag.startswith("W/")
+
+    again = client.get("/about", headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.content == b""
+
+    backend.posts_size = 101
+    changed = client.get("/about", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.text == "101 posts"
+    assert changed.headers["etag"] != etag
+
+
+def test_search_revalidation_skips_the_search(client, backend):
+    first = client.get("/api/search", params={"q": "rust"})
+    assert first.headers["etag"].startswith("W/")
+    assert first.headers["cache-control"] == "public, max-age=30"
+
+    again = client.get("/api/search", params={"q": "rust"}, headers={"If-None-Match": first.headers["etag"]})
+    assert again.status_code == 304
+    assert again.headers["etag"] == first.headers["etag"]
+    assert backend.searches == 1
+
+
+def test_search_etag_ignores_parameter_order_but_not_values(client):
+    a = client.get("/api/search?q=rust&page=2").headers["etag"]
+    b = client.get("/api/search?page=2&q=rust").headers["etag"]
+    c = client.get("/api/search?page=3&q=rust").headers["etag"]
+    assert a == b != c
+
+
+def test_generation_bump_makes_the_search_run_again(client, backend):
+    etag = client.get("/api/search", params={"q": "rust"}).headers["etag"]
+    backend.generation = 2
+
+    response = client.get("/api/search", params={"q": "rust"}, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["n"] == 2
+    assert response.headers["etag"] != etag
+
+
+@pytest.mark.parametrize("params", [{"q": "rust", "cursor": "*"}, {"q": "rust", "cursor": "abc.def"}])
+def test_cursor_requests_are_never_cached(client, backend, params):
+    response = client.get("/api/search", params=params, headers={"If-None-Match": "*"})
+    assert response.status_code == 200
+    assert "etag" not in response.headers
+    assert backend.searches == 1
+
+
+def test_nothing_is_cached_before_the_generation_is_known(client, backend):
+    backend.generation = None
+    response = client.get("/api/search", params={"q": "rust"}, headers={"If-None-Match": "*"})
+    assert response.status_code == 200
+    assert "etag" not in response.headers
+
+
+def test_routes_can_opt_out_and_errors_get_no_validator(client):
+    fallback = client.get("/api/search", params={"q": "rust", "fallback": "1"})
+    assert fallback.headers["cache-control"] == "no-store"
+    assert "etag" not in fallback.headers
+
+    missing = client.get("/api/search", params={"q": "missing"})
+    assert missing.status_code == 404
+    assert "etag" not in missing.headers
+
+
+def test_other_methods_pass_through(client, backend):
+    response = client.post("/api/search", params={"q": "rust"}, headers={"If-None-Match": "*"})
+    assert response.status_code == 200
+    assert "etag" not in response.headers
+
+
+def test_etag_matching_is_weak():
+    etag = make_etag("x", weak=True)
+    opaque = etag.removeprefix("W/")
+    assert etag_matches(opaque, etag)
+    assert etag_matches(f'"other", {etag}', etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches('"other"', etag)
+    assert not etag_matches(None, etag)
+    assert make_etag("x") == opaque
@@ -0,0 +1,52 @@
+import os
+import subprocess
+import sys
+
+# prometheus_client picks its multiprocess mode at import, so each mode runs in its own process
+SCRIPT = """
+from types import SimpleNamespace
+
+import metrics
+
+hits = {"value": 3}
+engine = SimpleNamespace(
+    cache=SimpleNamespace(stats=lambda: {"hits": hits["value"], "misses": 1, "hit_ratio": 0.0, "entries": 2}),
+    inflight=SimpleNamespace(stats=lambda: {"coalesced": 1, "timeouts": 0}),
+    es_breaker=SimpleNamespace(stats=lambda: {"state": "open", "opened": 2, "rejected": 4}),
+    query_log=SimpleNamespace(stats=lambda: {"buffered": 7, "dropped": 0}),
+    async_db=None,
+)
+if metrics.MULTIPROCESS:
+    metrics.publish_engine(engine)
+    hits["value"] = 5
+    metrics.publish_engine(engine)
+else:
+    hits["value"] = 5
+    metrics.register_engine(engine)
+print(metrics.exposition()[0].decode())
+"""
+
+WEB = os.path.join(os.path.dirname(__file__), os.pardir, "web")
+
+
+def engine_lines(env_extra):
+    env = {k: v for k, v in os.environ.items() if k != "PROMETHEUS_MULTIPROC_DIR"}
+    env.update(env_extra, PYTHONPATH=WEB)
+    output = subprocess.run(
+        [sys.executable, "-c", SCRIPT], env=env, capture_output=True, text=True, check=True
+    ).stdout
+    names = ("blogsearch_search_cache_hits", "blogsearch_es_breaker", "blogsearch_query_log_buffered")
+    return sorted(
+        line for line in output.splitlines()
+        if any(name in line for name in names) and not line.startswith("# HELP")
+    )
+
+
+def test_engine_metrics_look_the_same_with_several_workers(tmp_path):
+    single = engine_lines({})
+    multi = engine_lines({"PROMETHEUS_MULTIPROC_DIR": str(tmp_path)})
+    assert any(
+        line.startswith("# TYPE blogsearch_search_cache_hits") and line.endswith(" counter") for line in single
+    )
+    assert "blogsearch_search_cache_hits_total 5.0" in single
+    assert multi == single
@@ -0,0 +1,66 @@
+from search_engine import SearchEngine
+
+
+def hits(*ids, leg="bm25"):
+    return [{"_id": i, "_source": {"title": i, "url": f"https://example.com/{i}"}, "leg": leg} for i in ids]
+
+
+def ids(fused):
+    return [hit["_id"] for hit in fused]
+
+
+def raw(hit_list, total=None):
+    return {"took": 3, "hits": {"total": {"value": total or len(hit_list), "relation": "eq"}, "hits": hit_list}}
+
+
+def test_documents_found_by_both_legs_rank_first():
+    fused = SearchEngine._rrf_fuse(hits("a", "b", "c"), hits("b", "d", leg="knn"))
+    # b: 1/61 + 1/62; a: 1/61; d: 1/62; c: 1/63
+    assert ids(fused) == ["b", "a", "d", "c"]
+
+
+def test_agreement_lower_down_beats_a_single_top_rank():
+    fused = SearchEngine._rrf_fuse(hits("a", "b", "c"), hits("x", "y", "c", leg="knn"))
+    assert ids(fused)[0] == "c"
+
+
+def test_ties_keep_the_first_legs_order():
+    fused = SearchEngine._rrf_fuse(hits("a", "b"), hits("x", "y", leg="knn"))
+    assert ids(fused) == ["a", "x", "b", "y"]
+
+
+def test_first_legs_copy_of_a_hit_is_kept():
+    fused = SearchEngine._rrf_fuse(hits("a"), hits("a", leg="knn"))
+    assert [hit["leg"] for hit in fused] == ["bm25"]
+
+
+def test_a_single_leg_keeps_its_own_order():
+    assert ids(SearchEngine._rrf_fuse(hits("c", "a", "b"), [])) == ["c", "a", "b"]
+    assert ids(SearchEngine._rrf_fuse([], hits("c", "a", "b", leg="knn"))) == ["c", "a", "b"]
+
+
+def make_engine():
+    engine = SearchEngine.__new__(SearchEngine)
+    engine.hybrid_latency = {}
+    return engine
+
+
+def test_hybrid_response_pages_through_the_fused_ranking():
+    bm25 = raw(hits("a", "b", "c", "d"), total=40)
+    knn = raw(hits("d", "e", leg="knn"))
+    legs = {"bm25_ms": 1.0, "knn_ms": 1.0}
+
+    first = make_engine()._format_hybrid_response(bm25, knn, 1, 2, dict(legs))
+    second = make_engine()._format_hybrid_response(bm25, knn, 2, 2, dict(legs))
+    assert [r.title for r in first["results"]] == ["d", "a"]
+    assert [r.title for r in second["results"]] == ["b", "e"]
+    assert first["results_size"] == 40
+    assert first["total_pages"] == 20
+
+
+def test_hybrid_response_without_the_keyword_leg():
+    knn = raw(hits("e", "f", leg="knn"))
+    response = make_engine()._format_hybrid_response(None, knn, 1, 6, {"knn_ms": 1.0})
+    assert [r.title for r in response["results"]] == ["e", "f"]
+    assert response["results_size"] == 2
+    assert response["results_size_relation"] == "eq"
@@ -0,0 +1,82 @@
+import pytest
+
+import search_cache
+from search_cache import SearchCache
+from search_engine import QueryParser
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(search_cache.time, "monotonic", lambda: now[0])
+    return now
+
+
+def key_for(query, page=1, per_page=20, kind="keyword"):
+    clean_query, site_domains, _ = QueryParser.parse(query)
+    return SearchCache.key(clean_query, site_domains, page, per_page, kind)
+
+
+def test_equivalent_queries_share_a_key():
+    assert key_for("Rust  Async") == key_for("rust async")
+    assert key_for("rust site:B.com site:a.com") == key_for("site:a.com rust site:b.com site:a.com")
+
+
+def test_key_separates_everything_that_changes_the_response():
+    base = key_for("rust async")
+    assert key_for("rust async", page=2) != base
+    assert key_for("rust async", per_page=10) != base
+    assert key_for("rust async", kind="hybrid") != base
+    assert key_for('"rust async"') != base
+    assert key_for("rust async site:a.com") != base
+
+
+def test_entries_expire_after_the_ttl(clock):
+    cache = SearchCache(ttl_seconds=60)
+    cache.put("k", "v")
+    clock[0] += 59
+    assert cache.get("k") == "v"
+    clock[0] += 1
+    assert cache.get("k") is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = SearchCache(max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_first_generation_is_recorded_without_invalidating():
+    cache = SearchCache()
+    cache.put("k", "v")
+    assert cache.set_generation(7) is False
+    assert cache.get("k") == "v"
+    assert cache.set_generation(7) is False
+    assert cache.stats()["invalidations"] == 0
+
+
+def test_generation_change_drops_every_entry():
+    cache = SearchCache()
+    cache.set_generation(7)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.set_generation(8) is True
+    assert cache.get("a") is None
+    assert cache.get("b") is None
+    assert cache.stats()["generation"] == 8
+    assert cache.stats()["invalidations"] == 1
+
+
+@pytest.mark.parametrize("max_entries, ttl_seconds", [(0, 60), (1024, 0)])
+def test_disabled_cache_stores_nothing(max_entries, ttl_seconds):
+    cache = SearchCache(max_entries=max_entries, ttl_seconds=ttl_seconds)
+    cache.put("k", "v")
+    assert cache.get("k") is None
+    assert cache.stats()["entries"] == 0
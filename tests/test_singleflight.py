@@ -0,0 +1,114 @@
+import asyncio
+
+import pytest
+
+from singleflight import SingleFlight
+
+
+def test_concurrent_callers_share_one_call():
+    async def main():
+        flight = SingleFlight(timeout=5)
+        release = asyncio.Event()
+        calls = 0
+
+        async def search():
+            nonlocal calls
+            calls += 1
+            await release.wait()
+            return ["result"]
+
+        callers = [asyncio.create_task(flight.do("rust", search)) for _ in range(5)]
+        await asyncio.sleep(0)
+        release.set()
+
+        results = await asyncio.gather(*callers)
+        assert results == [["result"]] * 5
+        assert calls == 1
+        assert flight.stats() == {"in_flight": 0, "calls": 1, "coalesced": 4, "timeouts": 0, "errors": 0}
+
+    asyncio.run(main())
+
+
+def test_different_keys_do_not_share():
+    async def main():
+        flight = SingleFlight(timeout=5)
+
+        async def echo(value):
+            await asyncio.sleep(0)
+            return value
+
+        results = await asyncio.gather(flight.do("a", lambda: echo("a")), flight.do("b", lambda: echo("b")))
+        assert results == ["a", "b"]
+        assert flight.stats()["calls"] == 2
+
+    asyncio.run(main())
+
+
+def test_errors_reach_the_waiters_but_are_not_remembered():
+    async def main():
+        flight = SingleFlight(timeout=5)
+        attempts = 0
+
+        async def flaky():
+            nonlocal attempts
+            attempts += 1
+            await asyncio.sleep(0)
+            if attempts == 1:
+                raise ConnectionError("backend down")
+            return "ok"
+
+        first = await asyncio.gather(flight.do("q", flaky), flight.do("q", flaky), return_exceptions=True)
+        assert [type(r) for r in first] == [ConnectionError, ConnectionError]
+        assert flight.stats()["errors"] == 1
+
+        assert await flight.do("q", flaky) == "ok"
+        assert attempts == 2
+
+    asyncio.run(main())
+
+
+def test_timeout_forgets_the_call_so_the_next_caller_starts_fresh():
+    async def main():
+        flight = SingleFlight(timeout=0.01)
+        stuck = asyncio.Event()
+
+        async def hang():
+            await stuck.wait()
+
+        with pytest.raises(asyncio.TimeoutError):
+            await flight.do("q", hang)
+        assert flight.stats()["in_flight"] == 0
+        assert flight.stats()["timeouts"] == 1
+
+        async def quick():
+            return "fresh"
+
+        assert await flight.do("q", quick) == "fresh"
+        assert flight.stats()["calls"] == 2
+        stuck.set()
+
+    asyncio.run(main())
+
+
+def test_cancelled_caller_does_not_cancel_the_shared_call():
+    async def main():
+        flight = SingleFlight(timeout=5)
+        release = asyncio.Event()
+
+        async def search():
+            await release.wait()
+            return "done"
+
+        leaving = asyncio.create_task(flight.do("q", search))
+        staying = asyncio.create_task(flight.do("q", search))
+        await asyncio.sleep(0)
+
+        leaving.cancel()
+        await asyncio.sleep(0)
+        release.set()
+
+        assert await staying == "done"
+        assert leaving.cancelled()
+        assert flight.stats()["calls"] == 1
+
+    asyncio.run(main())
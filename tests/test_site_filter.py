@@ -0,0 +1,85 @@
+import pytest
+
+from blog_search.sites import site_domains
+from search_engine import SearchEngine
+from sqlite_replica import SQLiteReplicaExporter, SQLiteSearchBackend
+
+URLS = [
+    "https://example.com/a",
+    "https://www.blog.example.com/b",
+    "https://a.b.example.com/c",
+    "https://other.co.uk/d",
+    "https://notexample.com/e",
+]
+
+CASES = {
+    "example.com": {"https://example.com/a", "https://www.blog.example.com/b", "https://a.b.example.com/c"},
+    "blog.example.com": {"https://www.blog.example.com/b"},
+    "www.Blog.Example.com": {"https://www.blog.example.com/b"},
+    "a.b.example.com": {"https://a.b.example.com/c"},
+    # Neither the host nor its registrable domain
+    "b.example.com": set(),
+    "co.uk": set(),
+    "com": set(),
+}
+
+
+class FakeCursor:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params):
+        pass
+
+    def fetchmany(self, size):
+        rows, self.rows = self.rows[:size], self.rows[size:]
+        return rows
+
+
+class FakePostgres:
+    def cursor(self, name=None):
+        return FakeCursor([(i, f"Post {i}", url, None, "text", None) for i, url in enumerate(URLS)])
+
+    def commit(self):
+        pass
+
+    def get_connection(self):
+        return self
+
+    def release(self, conn):
+        pass
+
+
+def elasticsearch_urls(site):
+    (terms,) = SearchEngine._es_url_filters([site])
+    wanted = set(terms["terms"]["site_domains"])
+    return {url for url in URLS if wanted & set(site_domains(url))}
+
+
+def postgres_urls(site):
+    engine = SearchEngine.__new__(SearchEngine)
+    engine.RESULTS_LIMIT = len(URLS)
+    rows = [type("Row", (), {"url": url})() for url in URLS]
+    response = engine._format_pg_response(rows, [site], 1, len(URLS), 0.0)
+    return {row.url for row in response["results"]}
+
+
+@pytest.fixture(scope="module")
+def replica(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("replica") / "pages.sqlite3")
+    SQLiteReplicaExporter(FakePostgres(), path).sync()
+    return SQLiteSearchBackend(path)
+
+
+@pytest.mark.parametrize("site", sorted(CASES))
+def test_site_filter_matches_the_same_pages_on_every_backend(site, replica):
+    sqlite = {r.url for r in replica.search("", [site], 1, len(URLS))["results"]}
+    assert elasticsearch_urls(site) == CASES[site]
+    assert postgres_urls(site) == CASES[site]
+    assert sqlite == CASES[site]
@@ -0,0 +1,86 @@
+import random
+
+from suggest import SuggestionIndex
+
+ENTRIES = [
+    ("rust async", 10),
+    ("rust async traits", 4),
+    ("Rust Analyzer", 7),
+    ("rusty", 2),
+    ("rust", 5),
+    ("python", 9),
+]
+
+
+def test_completions_are_ranked_by_weight():
+    index = SuggestionIndex.build(ENTRIES)
+    assert index.lookup("rust") == ["rust async", "Rust Analyzer", "rust", "rust async traits", "rusty"]
+    assert index.lookup("p") == ["python"]
+
+
+def test_prefix_may_end_inside_an_edge():
+    index = SuggestionIndex.build(ENTRIES)
+    assert index.lookup("rust asy") == ["rust async", "rust async traits"]
+    assert index.lookup("rust async t") == ["rust async traits"]
+    assert index.lookup("rust a") == ["rust async", "Rust Analyzer", "rust async traits"]
+
+
+def test_unknown_prefixes_have_no_completions():
+    index = SuggestionIndex.build(ENTRIES)
+    assert index.lookup("rusx") == []
+    assert index.lookup("rust async traitsx") == []
+    assert index.lookup("go") == []
+    assert index.lookup("   ") == []
+
+
+def test_prefix_is_normalized_like_the_keys():
+    index = SuggestionIndex.build(ENTRIES)
+    assert index.lookup("  RUST   asy") == ["rust async", "rust async traits"]
+
+
+def test_trailing_space_finishes_the_word():
+    index = SuggestionIndex.build(ENTRIES)
+    assert index.lookup("rust  ") == ["rust async", "Rust Analyzer", "rust async traits"]
+    assert index.lookup("python ") == []
+
+
+def test_duplicate_keys_add_up_and_keep_the_first_spelling():
+    index = SuggestionIndex.build([("Go  Generics", 1), ("go generics", 1), ("go modules", 1.5)])
+    assert index.lookup("go") == ["Go Generics", "go modules"]
+    assert index.terms == 2
+
+
+def test_equal_weights_are_ordered_alphabetically():
+    index = SuggestionIndex.build([("xb", 1), ("xc", 1), ("xa", 1)])
+    assert index.lookup("x") == ["xa", "xb", "xc"]
+
+
+def test_limits():
+    index = SuggestionIndex.build([(f"term {i:02d}", i) for i in range(30)], limit=5)
+    assert index.lookup("term") == ["term 29", "term 28", "term 27", "term 26", "term 25"]
+    assert index.lookup("term", limit=2) == ["term 29", "term 28"]
+    assert index.lookup("term 1") == ["term 19", "term 18", "term 17", "term 16", "term 15"]
+
+
+def test_long_keys_are_cut_to_max_key_length():
+    index = SuggestionIndex.build([("a" * 200, 1)])
+    assert index.lookup("a") == ["a" * SuggestionIndex.MAX_KEY_LENGTH]
+
+
+def test_matches_a_brute_force_prefix_scan():
+    rng = random.Random(7)
+    words = ["".join(rng.choice("abc ") for _ in range(rng.randint(1, 8))) for _ in range(400)]
+    entries = [(w, rng.randint(1, 20)) for w in words]
+    index = SuggestionIndex.build(entries, limit=8)
+
+    weights: dict[str, list] = {}
+    for text, weight in entries:
+        display = " ".join(text.split())
+        if display:
+            weights.setdefault(display, [0, display])[0] += weight
+    for prefix in {w[:n] for w in weights for n in range(1, len(w) + 1)} | {"ab", "cab", "b c"}:
+        expected = sorted(
+            (entry for key, entry in weights.items() if key.lower().startswith(prefix)),
+            key=lambda e: (-e[0], e[1]),
+        )
+        assert index.lookup(prefix) == [display for _, display in expected[:8]], prefix
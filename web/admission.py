@@ -0,0 +1,159 @@
+"""
+Admission control for the search routes.
+Bounds how many searches run at once and how long the rest may wait, so a burst is
+answered with fast 429/503s instead of every request timing out behind the backends.
+"""
+
+import asyncio
+import math
+from collections import deque
+from contextlib import suppress
+from typing import Callable
+
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+import metrics
+import tracing
+from rate_limit import TokenBucketLimiter
+
+
+class ConcurrencyLimiter:
+    """At most `limit` requests run at once and at most `queue_size` more wait, FIFO.
+
+    A waiter gives up after `queue_timeout` seconds; when the queue is full new
+    arrivals are turned away immediately. A released slot is handed directly to the
+    oldest waiter, so queued requests cannot be overtaken by new ones.
+    """
+
+    def __init__(self, name: str, limit: int, queue_size: int, queue_timeout: float):
+        self.name = name
+        self.limit = limit
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self._active = 0
+        self._waiters: deque[asyncio.Future] = deque()
+        self._in_flight = metrics.ADMISSION_IN_FLIGHT.labels(name)
+        self._queued = metrics.ADMISSION_QUEUED.labels(name)
+        self.admitted = 0
+        self.queue_full = 0
+        self.queue_timeouts = 0
+
+    async def acquire(self) -> str | None:
+        """Wait for a slot; returns None once admitted, else the reason it was refused."""
+        if self._active < self.limit and not self._waiters:
+            self._active += 1
+            self._in_flight.set(self._active)
+            self.admitted += 1
+            return None
+        if len(self._waiters) >= self.queue_size:
+            self.queue_full += 1
+            return "queue_full"
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self._queued.set(len(self._waiters))
+        try:
+            await asyncio.wait_for(waiter, self.queue_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            # A slot handed over just as the wait ended is passed on, not leaked
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            self.queue_timeouts += 1
+            return "queue_timeout"
+        finally:
+            if waiter.cancelled():
+                with suppress(ValueError):
+                    self._waiters.remove(waiter)
+            self._queued.set(len(self._waiters))
+        self.admitted += 1
+        return None
+
+    def release(self) -> None:
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                # The slot passes straight to the waiter; _active is unchanged
+                waiter.set_result(None)
+                self._queued.set(len(self._waiters))
+                return
+        self._active -= 1
+        self._in_flight.set(self._active)
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "limit": self.limit,
+            "in_flight": self._active,
+            "queued": len(self._waiters),
+            "queue_size": self.queue_size,
+            "admitted": self.admitted,
+            "queue_full": self.queue_full,
+            "queue_timeouts": self.queue_timeouts,
+        }
+
+
+class AdmissionMiddleware:
+    """Per-client token buckets, then a ConcurrencyLimiter per route path.
+
+    A client over its rate gets a 429 with the Retry-After its bucket needs; a request
+    that finds its route's queue full, or waits too long in it, gets a 503 with
+    retry_after seconds. Other paths pass straight through.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        limiters: dict[str, ConcurrencyLimiter],
+        client_limiter: TokenBucketLimiter,
+        client_key: Callable[[Request], str],
+        retry_after: int = 1,
+    ):
+        self.app = app
+        self.limiters = limiters
+        self.client_limiter = client_limiter
+        self.client_key = client_key
+        self.retry_after = str(retry_after)
+        self._shed = {
+            (path, reason): metrics.SHED_REQUESTS.labels(path, reason)
+            for path in limiters
+            for reason in ("rate_limited", "queue_full", "queue_timeout")
+        }
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        limiter = self.limiters.get(scope["path"]) if scope["type"] == "http" else None
+        if limiter is None:
+            await self.app(scope, receive, send)
+            return
+
+        path = scope["path"]
+        wait = self.client_limiter.acquire(self.client_key(Request(scope)))
+        if wait:
+            self._shed[path, "rate_limited"].inc()
+            response = JSONResponse(
+                {"detail": "Too many searches; slow down"},
+                status_code=429,
+                headers={"Retry-After": str(math.ceil(wait))},
+            )
+            await response(scope, receive, send)
+            return
+
+        with tracing.span("admission.wait", route=path):
+            refused = await limiter.acquire()
+            if refused:
+                tracing.annotate(refused=refused)
+        if refused:
+            self._shed[path, refused].inc()
+            response = JSONResponse(
+                {"detail": "Search is busy; try again shortly"},
+                status_code=503,
+                headers={"Retry-After": self.retry_after},
+            )
+            await response(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release()
@@ -0,0 +1,96 @@
+"""
+Circuit breaker for calls to a backend that can go away (Elasticsearch).
+"""
+
+import threading
+import time
+from typing import Any
+
+
+class CircuitBreaker:
+    """Closed -> open after consecutive failures; open -> half-open after a backoff.
+
+    While open, allow_request() is False so callers go straight to their fallback
+    instead of paying a connect timeout. Once the backoff expires a single probe
+    request is let through (half-open): success closes the circuit, failure reopens
+    it with the backoff doubled, up to max_backoff.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 3,
+        base_backoff: float = 2.0,
+        max_backoff: float = 60.0,
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.backoff = base_backoff
+        self.open_until = 0.0
+        self.opened_count = 0
+        self.rejected_count = 0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow_request(self) -> bool:
+        """Whether to call the backend now; every True must be followed by record_*()."""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() >= self.open_until:
+                self.state = self.HALF_OPEN
+                self._probe_in_flight = False
+            if self.state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            self.rejected_count += 1
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = self.CLOSED
+            self.consecutive_failures = 0
+            self.backoff = self.base_backoff
+            self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.consecutive_failures += 1
+            if self.state == self.HALF_OPEN:
+                self.backoff = min(self.backoff * 2, self.max_backoff)
+                self._open()
+            elif self.state == self.CLOSED and self.consecutive_failures >= self.failure_threshold:
+                self.backoff = self.base_backoff
+                self._open()
+
+    def _open(self) -> None:
+        self.state = self.OPEN
+        self.open_until = time.monotonic() + self.backoff
+        self.opened_count += 1
+        self._probe_in_flight = False
+
+    def retry_after(self) -> int:
+        """Seconds until the next probe is allowed (0 when closed)."""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return 0
+            return max(1, round(self.open_until - time.monotonic()))
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "name": self.name,
+                "state": self.state,
+                "consecutive_failures": self.consecutive_failures,
+                "backoff_seconds": self.backoff,
+                "opened": self.opened_count,
+                "rejected": self.rejected_count,
+            }
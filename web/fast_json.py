@@ -0,0 +1,48 @@
+"""
+JSON encoding for the API and for the Elasticsearch client.
+Uses orjson when it is installed, which serializes the slotted result dataclasses
+directly; otherwise falls back to the stdlib json module with the same output.
+"""
+
+import dataclasses
+import json
+from datetime import date
+from typing import Any
+
+from starlette.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # optional: everything works, only slower, without it
+    orjson = None
+
+
+def _default(obj: Any) -> Any:
+    if dataclasses.is_dataclass(obj):
+        return {field.name: getattr(obj, field.name) for field in dataclasses.fields(obj)}
+    if isinstance(obj, date):
+        return obj.isoformat()
+    return str(obj)
+
+
+def dumps(obj: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default)
+    return json.dumps(obj, default=_default, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def elasticsearch_options() -> dict[str, Any]:
+    """Client keyword arguments that make the ES client encode and decode with orjson.
+
+    The client reuses the application/json serializer for its compatibility mimetype.
+    """
+    if orjson is None:
+        return {}
+    from elasticsearch.serializer import OrjsonSerializer
+
+    return {"serializers": {OrjsonSerializer.mimetype: OrjsonSerializer()}}
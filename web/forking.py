@@ -0,0 +1,20 @@
+"""
+Fork safety for objects that own threads, locks or connections.
+Under a pre-forking server (or os.fork in tests) a child inherits them mid-state; objects
+register a reset that runs in every child they are still alive in.
+"""
+
+import os
+import weakref
+
+
+def run_in_child(method) -> None:
+    """Call a bound method in every forked child, for as long as its object is alive."""
+    ref = weakref.WeakMethod(method)
+
+    def after_in_child():
+        alive = ref()
+        if alive is not None:
+            alive()
+
+    os.register_at_fork(after_in_child=after_in_child)
@@ -0,0 +1,126 @@
+"""
+HTTP caching for the web app: pre-rendered static pages and conditional GETs.
+Lets browsers and CDNs revalidate with If-None-Match instead of refetching.
+"""
+
+import hashlib
+from typing import Callable
+from urllib.parse import parse_qsl
+
+from jinja2 import Environment
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+def make_etag(*parts: object, weak: bool = False) -> str:
+    digest = hashlib.blake2b(repr(parts).encode(), digest_size=16).hexdigest()
+    return f'W/"{digest}"' if weak else f'"{digest}"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """If-None-Match uses weak comparison: W/ prefixes are ignored on both sides."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque for tag in if_none_match.split(","))
+
+
+class StaticPages:
+    """Templates whose only input is posts_size, rendered once per corpus size."""
+
+    def __init__(self, env: Environment, routes: dict[str, str]):
+        self.env = env
+        self.routes = routes
+        self._rendered: dict[str, tuple[int, bytes, str]] = {}
+
+    def render(self, path: str, posts_size: int) -> tuple[bytes, str]:
+        cached = self._rendered.get(path)
+        if cached and cached[0] == posts_size:
+            return cached[1], cached[2]
+        body = self.env.get_template(self.routes[path]).render(posts_size=posts_size).encode()
+        etag = make_etag(body)
+        self._rendered[path] = (posts_size, body, etag)
+        return body, etag
+
+
+class HTTPCacheMiddleware:
+    """Serves StaticPages from memory and adds validators to search responses.
+
+    Static pages get a strong ETag of their rendered bytes. Responses on search_paths get
+    a weak ETag of the path, query string and index generation, so a client revalidating
+    an unchanged index gets a 304 without the search running. A route opts a response
+    out (e.g. one served by a fallback backend) by setting its own Cache-Control.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        pages: StaticPages,
+        posts_size: Callable[[], int],
+        generation: Callable[[], int | None],
+        search_paths: tuple[str, ...] = ("/api/search",),
+        page_max_age: int = 300,
+        search_max_age: int = 30,
+    ):
+        self.app = app
+        self.pages = pages
+        self.posts_size = posts_size
+        self.generation = generation
+        self.search_paths = search_paths
+        self.page_cache_control = f"public, max-age={page_max_age}"
+        self.search_cache_control = f"public, max-age={search_max_age}"
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] not in ("GET", "HEAD"):
+            await self.app(scope, receive, send)
+            return
+
+        path = scope["path"]
+        if path in self.pages.routes:
+            body, etag = self.pages.render(path, self.posts_size())
+            await self._respond(scope, receive, send, etag, self.page_cache_control, body)
+            return
+
+        if path not in self.search_paths:
+            await self.app(scope, receive, send)
+            return
+        generation = self.generation()
+        params = parse_qsl(scope["query_string"].decode("latin-1"), keep_blank_values=True)
+        # Cursor pages depend on a point-in-time, not only on the index generation
+        if generation is None or any(key == "cursor" for key, _ in params):
+            await self.app(scope, receive, send)
+            return
+
+        etag = make_etag(path, sorted(params), generation, weak=True)
+        if etag_matches(Headers(scope=scope).get("if-none-match"), etag):
+            await self._not_modified(scope, receive, send, etag, self.search_cache_control)
+            return
+
+        async def send_with_etag(message: Message) -> None:
+            if message["type"] == "http.response.start" and message["status"] == 200:
+                headers = MutableHeaders(scope=message)
+                if "cache-control" not in headers:
+                    headers["ETag"] = etag
+                    headers["Cache-Control"] = self.search_cache_control
+            await send(message)
+
+        await self.app(scope, receive, send_with_etag)
+
+    async def _respond(self, scope, receive, send, etag: str, cache_control: str, body: bytes) -> None:
+        if etag_matches(Headers(scope=scope).get("if-none-match"), etag):
+            await self._not_modified(scope, receive, send, etag, cache_control)
+            return
+        response = Response(
+            body,
+            media_type="text/html",
+            headers={"ETag": etag, "Cache-Control": cache_control},
+        )
+        await response(scope, receive, send)
+
+    @staticmethod
+    async def _not_modified(scope, receive, send, etag: str, cache_control: str) -> None:
+        response = Response(status_code=304, headers={"ETag": etag, "Cache-Control": cache_control})
+        await response(scope, receive, send)
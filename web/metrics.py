@@ -0,0 +1,331 @@
+"""
+Prometheus metrics for the web tier, exposed at /metrics.
+Hot-path instruments are histograms and counters with pre-bound label children; state
+that already lives in SearchEngine (cache, breaker, pools) is read only at scrape time.
+
+With several workers (PROMETHEUS_MULTIPROC_DIR set, see server.py) every worker writes
+its instruments to files in that directory and /metrics aggregates all of them; the
+SearchEngine state is then copied into those files periodically by publish_engine().
+"""
+
+import glob
+import os
+import time
+from typing import Iterable
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+FAST_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5)
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "blogsearch_http_request_duration_seconds",
+    "Time from request start to the last response byte, by route template.",
+    ["route", "method", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+ES_TOOK_SECONDS = Histogram(
+    "blogsearch_es_took_seconds",
+    "Elasticsearch-reported query time (took).",
+    ["operation"],
+    buckets=LATENCY_BUCKETS,
+)
+ES_WALL_SECONDS = Histogram(
+    "blogsearch_es_wall_seconds",
+    "Client-side wall time of Elasticsearch requests, including transport and JSON decoding.",
+    ["operation"],
+    buckets=LATENCY_BUCKETS,
+)
+FORMAT_SECONDS = Histogram(
+    "blogsearch_response_format_seconds",
+    "Python time spent turning backend responses into result dicts.",
+    ["kind"],
+    buckets=FAST_BUCKETS,
+)
+TEMPLATE_RENDER_SECONDS = Histogram(
+    "blogsearch_template_render_seconds",
+    "Jinja template render time.",
+    ["template"],
+    buckets=FAST_BUCKETS,
+)
+DB_POOL_WAIT_SECONDS = Histogram(
+    "blogsearch_db_pool_wait_seconds",
+    "Time to check a connection out of a PostgreSQL pool (including any liveness probe).",
+    ["pool"],
+    buckets=FAST_BUCKETS,
+)
+DB_POOL_IN_USE = Gauge(
+    "blogsearch_db_pool_in_use",
+    "psycopg2 connections currently checked out.",
+    ["pool"],
+    multiprocess_mode="livesum",
+)
+STARTUP_SECONDS = Gauge(
+    "blogsearch_startup_seconds",
+    "Duration of each startup phase of this process; cold_start runs from process start to ready.",
+    ["phase"],
+    multiprocess_mode="max",
+)
+SHED_REQUESTS = Counter(
+    "blogsearch_shed_requests_total",
+    "Requests refused by admission control, by route and reason.",
+    ["route", "reason"],
+)
+ADMISSION_IN_FLIGHT = Gauge(
+    "blogsearch_admission_in_flight",
+    "Requests currently admitted, by route.",
+    ["route"],
+    multiprocess_mode="livesum",
+)
+ADMISSION_QUEUED = Gauge(
+    "blogsearch_admission_queued",
+    "Requests waiting for admission, by route.",
+    ["route"],
+    multiprocess_mode="livesum",
+)
+SEARCH_FALLBACKS = Counter(
+    "blogsearch_search_fallbacks_total",
+    "Searches Elasticsearch could not serve, by the backend that served them instead.",
+    ["backend"],
+)
+
+# Label lookups cost more than the observation itself; keep the bound children
+_es_took: dict[str, Histogram] = {}
+_es_wall: dict[str, Histogram] = {}
+_format: dict[str, Histogram] = {}
+_templates: dict[str, Histogram] = {}
+
+
+def observe_es(operation: str, took_ms: float, wall_seconds: float) -> None:
+    took = _es_took.get(operation)
+    if took is None:
+        took = _es_took[operation] = ES_TOOK_SECONDS.labels(operation)
+        _es_wall[operation] = ES_WALL_SECONDS.labels(operation)
+    took.observe((took_ms or 0) / 1000)
+    _es_wall[operation].observe(wall_seconds)
+
+
+def observe_format(kind: str, seconds: float) -> None:
+    child = _format.get(kind)
+    if child is None:
+        child = _format[kind] = FORMAT_SECONDS.labels(kind)
+    child.observe(seconds)
+
+
+def observe_template(template: str, seconds: float) -> None:
+    child = _templates.get(template)
+    if child is None:
+        child = _templates[template] = TEMPLATE_RENDER_SECONDS.labels(template)
+    child.observe(seconds)
+
+
+class MetricsMiddleware:
+    """Records per-route request latency.
+
+    Routes are labelled by their path template (/api/search, not the raw URL) so label
+    cardinality stays bounded; paths served before routing (static pages) are labelled
+    by path when listed in known_paths, and anything else as "other".
+    """
+
+    def __init__(self, app: ASGIApp, known_paths: Iterable[str] = (), known_prefixes: Iterable[str] = ()):
+        self.app = app
+        self.known_paths = frozenset(known_paths)
+        self.known_prefixes = tuple(known_prefixes)
+        self._children: dict[tuple[str, str, int], Histogram] = {}
+
+    def _route(self, scope: Scope) -> str:
+        route = scope.get("route")
+        if route is not None:
+            return route.path
+        path = scope["path"]
+        if path in self.known_paths:
+            return path
+        for prefix in self.known_prefixes:
+            if path.startswith(prefix):
+                return prefix
+        return "other"
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            key = (self._route(scope), scope["method"], status)
+            child = self._children.get(key)
+            if child is None:
+                child = self._children[key] = HTTP_REQUEST_SECONDS.labels(*key)
+            child.observe(time.perf_counter() - start)
+
+
+class SearchEngineCollector:
+    """Reads SearchEngine's own counters at scrape time, adding nothing to the request path."""
+
+    BREAKER_STATES = {"closed": 0, "half_open": 1, "open": 2}
+
+    def __init__(self, engine):
+        self.engine = engine
+
+    def collect(self):
+        engine = self.engine
+        cache = engine.cache.stats()
+        yield CounterMetricFamily(
+            "blogsearch_search_cache_hits", "Search result cache hits.", value=cache["hits"]
+        )
+        yield CounterMetricFamily(
+            "blogsearch_search_cache_misses", "Search result cache misses.", value=cache["misses"]
+        )
+        yield GaugeMetricFamily(
+            "blogsearch_search_cache_hit_ratio",
+            "Search result cache hits / lookups since start.",
+            value=cache["hit_ratio"],
+        )
+        yield GaugeMetricFamily(
+            "blogsearch_search_cache_entries", "Entries in the search result cache.", value=cache["entries"]
+        )
+
+        inflight = engine.inflight.stats()
+        yield CounterMetricFamily(
+            "blogsearch_search_coalesced",
+            "Searches that joined an identical search already in flight instead of running their own.",
+            value=inflight["coalesced"],
+        )
+        yield CounterMetricFamily(
+            "blogsearch_search_coalesce_timeouts",
+            "Callers that gave up waiting on a shared in-flight search.",
+            value=inflight["timeouts"],
+        )
+
+        breaker = engine.es_breaker.stats()
+        yield GaugeMetricFamily(
+            "blogsearch_es_breaker_state",
+            "Elasticsearch circuit breaker state (0 closed, 1 half-open, 2 open).",
+            value=self.BREAKER_STATES[breaker["state"]],
+        )
+        yield CounterMetricFamily(
+            "blogsearch_es_breaker_opened", "Times the Elasticsearch circuit opened.", value=breaker["opened"]
+        )
+        yield CounterMetricFamily(
+            "blogsearch_es_breaker_rejected",
+            "Requests sent straight to a fallback because the circuit was open.",
+            value=breaker["rejected"],
+        )
+
+        query_log = engine.query_log.stats()
+        yield GaugeMetricFamily(
+            "blogsearch_query_log_buffered", "Query log rows waiting to be written.", value=query_log["buffered"]
+        )
+        yield CounterMetricFamily(
+            "blogsearch_query_log_dropped", "Query log rows dropped because the buffer was full.",
+            value=query_log["dropped"],
+        )
+
+        async_pool = engine.async_db.stats() if engine.async_db else None
+        if async_pool:
+            in_use = GaugeMetricFamily(
+                "blogsearch_async_db_pool_in_use", "asyncpg connections checked out.", labels=["pool"]
+            )
+            in_use.add_metric(["asyncpg"], async_pool["in_use"])
+            yield in_use
+            size = GaugeMetricFamily(
+                "blogsearch_async_db_pool_size", "asyncpg connections open.", labels=["pool"]
+            )
+            size.add_metric(["asyncpg"], async_pool["size"])
+            yield size
+
+
+MULTIPROCESS = bool(os.getenv("PROMETHEUS_MULTIPROC_DIR"))
+
+# How SearchEngineCollector's per-worker gauges combine across workers. Gauges of things
+# each worker holds add up; the breaker reports the worst worker. The hit ratio cannot be
+# summed: use hits / (hits + misses) instead.
+_ENGINE_MODES = {"blogsearch_es_breaker_state": "max"}
+_ENGINE_SKIP = {"blogsearch_search_cache_hit_ratio"}
+_engine_metrics: dict[str, Counter | Gauge] = {}
+# Counter values already added to the multiprocess files, by (name, labels)
+_engine_published: dict[tuple, float] = {}
+
+
+def register_engine(engine) -> None:
+    REGISTRY.register(SearchEngineCollector(engine))
+
+
+def publish_engine(engine) -> None:
+    """Write this worker's SearchEngine state to the multiprocess files (multi-worker only).
+
+    Counters stay counters, with the same names as in single-worker mode: each publish
+    adds what the engine counted since the previous one.
+    """
+    for family in SearchEngineCollector(engine).collect():
+        if family.name in _ENGINE_SKIP:
+            continue
+        counter = family.type == "counter"
+        metric = _engine_metrics.get(family.name)
+        if metric is None:
+            labels = list(family.samples[0].labels) if family.samples else []
+            if counter:
+                metric = Counter(family.name, family.documentation, labels, registry=None)
+            else:
+                metric = Gauge(
+                    family.name,
+                    family.documentation,
+                    labels,
+                    registry=None,
+                    multiprocess_mode=_ENGINE_MODES.get(family.name, "livesum"),
+                )
+            _engine_metrics[family.name] = metric
+        for sample in family.samples:
+            child = metric.labels(**sample.labels) if sample.labels else metric
+            if not counter:
+                child.set(sample.value)
+                continue
+            if not sample.name.endswith("_total"):
+                continue
+            key = (family.name, tuple(sorted(sample.labels.items())))
+            delta = sample.value - _engine_published.get(key, 0.0)
+            _engine_published[key] = sample.value
+            if delta > 0:
+                child.inc(delta)
+
+
+def clear_multiprocess_dir(path: str) -> None:
+    """Remove a previous run's files; call before any worker starts."""
+    for name in glob.glob(os.path.join(path, "*.db")):
+        os.remove(name)
+
+
+def process_exited() -> None:
+    """Drop this worker's live gauges from the aggregate."""
+    if MULTIPROCESS:
+        multiprocess.mark_process_dead(os.getpid())
+
+
+def exposition() -> tuple[bytes, str]:
+    """The current metrics in Prometheus text format, and its content type."""
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
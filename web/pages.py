@@ -0,0 +1,24 @@
+"""
+How rows of the pages table are read and shaped, shared by every search backend.
+PostgreSQL, Elasticsearch and the SQLite replica all use these, so snippets cannot drift
+apart between them (site: matching is shared with the scraper, in blog_search.sites).
+"""
+
+from datetime import timedelta
+
+# Incremental readers re-read rows scraped this long before their watermark, so rows whose
+# inserts committed late (scraped_on_date is set before the commit) are not missed.
+WATERMARK_OVERLAP = timedelta(minutes=2)
+
+# Words of page text kept in a result snippet when there is no highlighter to cut it.
+SNIPPET_WORDS = 300
+
+
+def truncate_text(text: str | None, max_words: int = SNIPPET_WORDS) -> str:
+    """Truncate text to max_words while preserving word boundaries."""
+    if not text:
+        return ""
+    words = text.split()
+    if len(words) <= max_words:
+        return text
+    return " ".join(words[:max_words]) + "..."
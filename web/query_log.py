@@ -0,0 +1,143 @@
+"""
+Buffered writer for search query logs.
+Searches enqueue rows in memory; one background thread writes them in bulk.
+"""
+
+import threading
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any
+
+from psycopg2.extras import execute_values
+
+from forking import run_in_child
+
+
+class QueryLogWriter:
+    """Bounded in-memory buffer of query log rows drained by a single writer thread.
+
+    Rows are flushed with a multi-row INSERT once batch_size rows are waiting or
+    flush_interval seconds have passed. When the buffer is full new rows are
+    dropped and counted rather than blocking the request path.
+    """
+
+    INSERT_SQL = "INSERT INTO query_logs (query, ip_address, user_agent, timestamp) VALUES %s"
+
+    def __init__(
+        self,
+        db,
+        max_buffer: int = 10000,
+        batch_size: int = 500,
+        flush_interval: float = 2.0,
+    ):
+        self.db = db
+        self.max_buffer = max_buffer
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._buffer: deque[tuple] = deque()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self.submitted = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.flushes = 0
+        run_in_child(self._after_fork)
+
+    def _after_fork(self):
+        # Only the forking thread survives into the child. Buffered rows are the parent's
+        # to write; the child starts empty, with fresh locks and its own writer thread.
+        running = self._thread is not None
+        self._buffer = deque()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        if running and not self._stop.is_set():
+            self.start()
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="query-log-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, query: str, ip_address: str, user_agent: str) -> bool:
+        """Queue one row; returns False if it was dropped because the buffer is full."""
+        row = (query, ip_address, user_agent, datetime.now(timezone.utc))
+        with self._lock:
+            if len(self._buffer) >= self.max_buffer:
+                self.dropped += 1
+                return False
+            self._buffer.append(row)
+            self.submitted += 1
+            pending = len(self._buffer)
+        if pending >= self.batch_size:
+            self._wakeup.set()
+        return True
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+        self.flush()
+
+    def flush(self) -> int:
+        """Write everything buffered so far; returns the number of rows written."""
+        with self._flush_lock:
+            with self._lock:
+                if not self._buffer:
+                    return 0
+                rows = list(self._buffer)
+                self._buffer.clear()
+
+            written = 0
+            for start in range(0, len(rows), self.batch_size):
+                batch = rows[start : start + self.batch_size]
+                conn = None
+                try:
+                    conn = self.db.get_connection()
+                    with conn.cursor() as cursor:
+                        execute_values(cursor, self.INSERT_SQL, batch, page_size=self.batch_size)
+                    conn.commit()
+                    written += len(batch)
+                except Exception as e:
+                    print(f"Error writing {len(batch)} query logs: {e}")
+                    self.failed += len(batch)
+                    if conn:
+                        conn.rollback()
+                finally:
+                    if conn:
+                        self.db.release(conn)
+
+            self.written += written
+            self.flushes += 1
+            return written
+
+    def close(self, timeout: float = 10.0):
+        """Stop the writer thread after a final flush."""
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+        else:
+            self.flush()
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            buffered = len(self._buffer)
+        return {
+            "buffered": buffered,
+            "max_buffer": self.max_buffer,
+            "submitted": self.submitted,
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "flushes": self.flushes,
+        }
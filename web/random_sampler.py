@@ -0,0 +1,100 @@
+"""
+Uniform random post sampling for /random.
+Keeps every live page id in a compact sorted array plus a few ready-to-render posts.
+"""
+
+import random
+import threading
+from array import array
+from bisect import bisect_left
+from collections import deque
+from datetime import datetime
+from typing import Any, Iterable
+
+from results import SearchResult
+
+
+class RandomPostSampler:
+    """Sorted array('l') of page ids refreshed incrementally by scraped_on_date.
+
+    Picking is uniform over live ids (no bias toward ids that follow gaps) and
+    needs one primary-key lookup. An optional pool of prefetched, formatted posts
+    lets /random skip the database entirely while it is non-empty.
+    """
+
+    def __init__(self, prefetch_size: int = 32):
+        self.ids = array("l")
+        self.watermark: datetime | None = None
+        self.prefetch_size = prefetch_size
+        self._prefetched: deque[SearchResult] = deque()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def loaded(self) -> bool:
+        return self.watermark is not None
+
+    def load(self, ids: Iterable[int], watermark: datetime) -> None:
+        """Replace the id set with a full, id-ordered snapshot."""
+        loaded = array("l", ids)
+        with self._lock:
+            self.ids = loaded
+            self.watermark = watermark
+
+    def merge(self, rows: Iterable[tuple[int, datetime]]) -> int:
+        """Add ids seen since the watermark; returns how many were new."""
+        added = 0
+        with self._lock:
+            ids = self.ids
+            for page_id, scraped_on in rows:
+                pos = bisect_left(ids, page_id)
+                if pos == len(ids) or ids[pos] != page_id:
+                    ids.insert(pos, page_id)
+                    added += 1
+                if self.watermark is None or scraped_on > self.watermark:
+                    self.watermark = scraped_on
+        return added
+
+    def discard(self, page_id: int) -> None:
+        with self._lock:
+            pos = bisect_left(self.ids, page_id)
+            if pos < len(self.ids) and self.ids[pos] == page_id:
+                del self.ids[pos]
+
+    def pick(self) -> int | None:
+        ids = self.ids
+        return ids[random.randrange(len(ids))] if ids else None
+
+    def pick_many(self, count: int) -> list[int]:
+        ids = self.ids
+        return [ids[random.randrange(len(ids))] for _ in range(count)] if ids else []
+
+    def take_prefetched(self) -> SearchResult | None:
+        try:
+            return self._prefetched.popleft()
+        except IndexError:
+            return None
+
+    def add_prefetched(self, posts: Iterable[SearchResult]) -> None:
+        for post in posts:
+            if len(self._prefetched) >= self.prefetch_size:
+                break
+            self._prefetched.append(post)
+
+    def prefetch_wanted(self) -> int:
+        """Posts needed to top the pool back up, once it has drained to half."""
+        if not self.ids or self.prefetch_size <= 0:
+            return 0
+        if len(self._prefetched) > self.prefetch_size // 2:
+            return 0
+        return self.prefetch_size - len(self._prefetched)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "ids": len(self.ids),
+            "bytes": self.ids.itemsize * len(self.ids),
+            "watermark": self.watermark.isoformat() if self.watermark else None,
+            "prefetched": len(self._prefetched),
+        }
@@ -0,0 +1,47 @@
+"""
+Per-client rate limiting for expensive endpoints.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class TokenBucketLimiter:
+    """One token bucket per key: refills at `rate` tokens per second, holds at most `burst`.
+
+    Only the max_keys most recently seen keys are remembered; a forgotten key starts
+    again with a full bucket.
+    """
+
+    def __init__(self, rate: float, burst: float, max_keys: int = 10000):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.allowed = 0
+        self.limited = 0
+
+    def acquire(self, key: str, cost: float = 1.0) -> float:
+        """Take cost tokens; returns 0 on success, else seconds until they would be available."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            if tokens >= cost:
+                tokens -= cost
+                wait = 0.0
+                self.allowed += 1
+            else:
+                wait = (cost - tokens) / self.rate if self.rate > 0 else float("inf")
+                self.limited += 1
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return wait
+
+    def stats(self) -> dict[str, float]:
+        with self._lock:
+            keys = len(self._buckets)
+        return {"keys": keys, "allowed": self.allowed, "limited": self.limited}
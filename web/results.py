@@ -0,0 +1,26 @@
+"""
+Compact result types shared by the search backends and the API.
+Slotted dataclasses: smaller than the equivalent dicts and serialized directly by orjson.
+"""
+
+from dataclasses import dataclass
+
+
+@dataclass(slots=True)
+class SearchResult:
+    title: str
+    url: str
+    date: str | None
+    text: str
+
+
+@dataclass(slots=True)
+class SearchResponse:
+    """The /api/search (and /api/msearch entry) payload."""
+
+    results: list[SearchResult]
+    total: int
+    total_relation: str
+    page: int
+    total_pages: int
+    backend: str | None
@@ -3,32 +3,62 @@ Search engine module for blog search.
 Handles Elasticsearch and PostgreSQL full-text search with proper query parsing.
 """
 
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
 import os
 import random
 import re
-import sys
-from dataclasses import dataclass
-from typing import Any
+import threading
+import time
+from contextlib import asynccontextmanager
+from datetime import timedelta
+from typing import Any, Awaitable, Callable
 
 from dotenv import load_dotenv
-from elasticsearch import Elasticsearch
-from psycopg2 import Error, pool
+from elasticsearch import ApiError, AsyncElasticsearch, Elasticsearch, NotFoundError, TransportError
+from psycopg2 import pool
 
+try:
+    import asyncpg
+except ImportError:  # the async pool is optional; routes fall back to psycopg2 in a thread
+    asyncpg = None
 
-@dataclass
-class SearchResult:
-    title: str
-    url: str
-    date: str | None
-    text: str
-    score: float | None = None
+from blog_search.embeddings import EmbeddingProvider, get_embedding_provider
+from blog_search.migrate import ensure_schema, schema_is_current
+from blog_search.sites import host_sites, normalize_site, url_host
 
+import metrics
+import tracing
+from circuit_breaker import CircuitBreaker
+from fast_json import elasticsearch_options
+from forking import run_in_child
+from pages import WATERMARK_OVERLAP, truncate_text
+from query_log import QueryLogWriter
+from random_sampler import RandomPostSampler
+from results import SearchResult
+from search_cache import SearchCache
+from singleflight import SingleFlight
+from sqlite_replica import SQLiteReplicaExporter, SQLiteSearchBackend
+from suggest import SuggestionIndex
 
-@dataclass
-class SearchResponse:
-    results: list[SearchResult]
-    total_hits: int
-    search_time_ms: int
+
+class InvalidCursor(ValueError):
+    """A pagination cursor that cannot be decoded, belongs to another query, or has expired."""
+
+
+class PageTooDeep(ValueError):
+    """A page past the deepest hit Elasticsearch returns (max_result_window); use a cursor."""
+
+
+class SearchUnavailable(RuntimeError):
+    """Elasticsearch is down (or its circuit is open) and the request has no fallback."""
+
+    def __init__(self, message: str, retry_after: int = 0):
+        super().__init__(message)
+        self.retry_after = retry_after
 
 
 class QueryParser:
@@ -71,18 +101,87 @@ class QueryParser:
         return clean_query, site_domains, quoted_phrases
 
 
-class DatabasePool:
-    """Manages PostgreSQL connection pool."""
+# Pools a forked child inherited from its parent; see DatabasePool._after_fork
+_inherited_pools: list[pool.ThreadedConnectionPool] = []
+
+
+def connection_budget(async_pool: bool) -> tuple[int, int]:
+    """Per-process (psycopg2 maxconn, asyncpg max_size) for this deployment.
+
+    PG_CONNECTION_BUDGET is the total number of connections all WEB_CONCURRENCY
+    workers together may hold. Each worker's share keeps one connection back for its
+    LISTEN subscription and gives a third of the rest to the psycopg2 pool, which only
+    serves background refreshes and the query log once the async pool is open. That
+    pool never gets fewer than DatabasePool.MIN_MAXCONN. Without a budget every process
+    gets the pool defaults.
+    """
+    budget = os.getenv("PG_CONNECTION_BUDGET")
+    if not budget:
+        return DatabasePool.DEFAULT_MAXCONN, AsyncDatabasePool.DEFAULT_MAX_SIZE
+    workers = max(1, int(os.getenv("WEB_CONCURRENCY", 1)))
+    per_worker = int(budget) // workers
+    minimum = DatabasePool.MIN_MAXCONN + (2 if async_pool else 0)
+    if per_worker < minimum:
+        print(
+            f"Warning: PG_CONNECTION_BUDGET={budget} leaves {per_worker} connections per worker "
+            f"for {workers} workers; each needs at least {minimum}, so the budget will be exceeded"
+        )
+    if not async_pool:
+        return max(DatabasePool.MIN_MAXCONN, per_worker), 0
+    usable = per_worker - 1
+    sync = max(DatabasePool.MIN_MAXCONN, usable // 3)
+    return sync, max(1, usable - sync)
 
-    def __init__(self):
+
+class DatabasePool:
+    """Manages PostgreSQL connection pool.
+
+    The pool is opened on first use, not on construction, and a forked child drops the
+    pool it inherited, so every worker process opens its own connections.
+    """
+
+    DEFAULT_MINCONN = 3
+    DEFAULT_MAXCONN = 10
+    # Background users that may each hold a connection at once: the query log writer,
+    # the index/suggestion refreshes and the SQLite replica export.
+    MIN_MAXCONN = 3
+    # ThreadedConnectionPool raises as soon as it is exhausted; callers queue for a
+    # connection up to this long instead.
+    CHECKOUT_TIMEOUT = 30.0
+    # Connections idle longer than this are probed with SELECT 1 before reuse;
+    # recently released ones are handed out without the extra round trip.
+    VALIDATE_IDLE_SECONDS = 30.0
+
+    def __init__(self, minconn: int = DEFAULT_MINCONN, maxconn: int = DEFAULT_MAXCONN):
+        self.minconn = min(minconn, maxconn)
+        self.maxconn = maxconn
         self._pool: pool.ThreadedConnectionPool | None = None
-        self._init_pool()
+        self._pool_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._last_used: dict[int, float] = {}
+        self._wait_seconds = metrics.DB_POOL_WAIT_SECONDS.labels("psycopg2")
+        self._in_use = metrics.DB_POOL_IN_USE.labels("psycopg2")
+        run_in_child(self._after_fork)
+
+    def _after_fork(self):
+        # The parent's sockets are shared with the child: closing them here would end the
+        # parent's sessions, and so would garbage-collecting them. Keep them referenced
+        # and unused, and let the child open a pool of its own on first use.
+        if self._pool is not None:
+            _inherited_pools.append(self._pool)
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.maxconn)
+        self._last_used = {}
+        self._in_use.set(0)
 
     def _init_pool(self):
-        try:
+        with self._pool_lock:
+            if self._pool is not None:
+                return
             self._pool = pool.ThreadedConnectionPool(
-                minconn=3,
-                maxconn=10,
+                minconn=self.minconn,
+                maxconn=self.maxconn,
                 host=os.getenv("PGHOST"),
                 database=os.getenv("PGDATABASE"),
                 user=os.getenv("PGUSER"),
@@ -92,32 +191,156 @@ class DatabasePool:
                 channel_binding=os.getenv("PGCHANNELBINDING", "prefer"),
                 connect_timeout=10,
             )
-        except (Exception, Error) as error:
-            print(f"Error creating connection pool: {error}")
-            sys.exit(1)
 
     def get_connection(self):
+        start = time.perf_counter()
+        with tracing.span("db.pool_wait", pool="psycopg2"):
+            if not self._slots.acquire(timeout=self.CHECKOUT_TIMEOUT):
+                raise pool.PoolError(
+                    f"no connection free after {self.CHECKOUT_TIMEOUT}s ({self.maxconn} in use)"
+                )
+            try:
+                conn = self._checkout()
+            except BaseException:
+                self._slots.release()
+                raise
+        self._wait_seconds.observe(time.perf_counter() - start)
+        self._in_use.inc()
+        return conn
+
+    def _checkout(self):
         if self._pool is None:
             self._init_pool()
         conn = self._pool.getconn()
-        # Test connection is still alive
+        last_used = self._last_used.get(id(conn))
+        if conn.closed:
+            self._discard(conn)
+            return self._pool.getconn()
+        if last_used is not None and time.monotonic() - last_used < self.VALIDATE_IDLE_SECONDS:
+            return conn
+        # Idle for a while (or never used): test connection is still alive
         try:
-            with conn.cursor() as cursor:
+            with tracing.span("db.probe"), conn.cursor() as cursor:
                 cursor.execute("SELECT 1")
                 cursor.fetchone()
         except Exception:
-            self._pool.putconn(conn, close=True)
+            self._discard(conn)
             conn = self._pool.getconn()
         return conn
 
+    def _discard(self, conn):
+        self._last_used.pop(id(conn), None)
+        self._pool.putconn(conn, close=True)
+
     def release(self, conn):
+        self._in_use.dec()
         if self._pool:
+            self._last_used[id(conn)] = time.monotonic()
             self._pool.putconn(conn)
+        self._slots.release()
 
     def close(self):
         if self._pool:
             self._pool.closeall()
             self._pool = None
+            self._last_used.clear()
+
+
+class AsyncDatabasePool:
+    """asyncpg pool for the read queries issued from async routes.
+
+    asyncpg prepares every statement server-side and caches it per connection, so
+    the fixed read SQL is parsed and planned once per connection rather than per
+    request. Connections are not probed on checkout; idle ones are closed once they
+    exceed max_inactive_seconds and broken ones are replaced by the pool on error.
+    """
+
+    DEFAULT_MIN_SIZE = 2
+    DEFAULT_MAX_SIZE = 10
+
+    def __init__(
+        self,
+        min_size: int = DEFAULT_MIN_SIZE,
+        max_size: int = DEFAULT_MAX_SIZE,
+        max_inactive_seconds: float = 300.0,
+    ):
+        self.min_size = min(min_size, max_size)
+        self.max_size = max_size
+        self.max_inactive_seconds = max_inactive_seconds
+        self._pool = None
+        self._sql: dict[str, str] = {}
+        self._wait_seconds = metrics.DB_POOL_WAIT_SECONDS.labels("asyncpg")
+
+    async def open(self):
+        if asyncpg is None:
+            raise RuntimeError("asyncpg is not installed")
+        self._pool = await asyncpg.create_pool(
+            min_size=self.min_size,
+            max_size=self.max_size,
+            max_inactive_connection_lifetime=self.max_inactive_seconds,
+            **self._connect_kwargs(),
+        )
+
+    @staticmethod
+    def _connect_kwargs() -> dict[str, Any]:
+        return {
+            "host": os.getenv("PGHOST"),
+            "database": os.getenv("PGDATABASE"),
+            "user": os.getenv("PGUSER"),
+            "password": os.getenv("PGPASSWORD"),
+            "port": int(os.getenv("PGPORT", 5432)),
+            "ssl": os.getenv("PGSSLMODE", "prefer"),
+            "timeout": 10,
+        }
+
+    async def listen(self, channel: str, callback: Callable[[], None]):
+        """Subscribe a dedicated connection to a NOTIFY channel; returns it for closing."""
+        conn = await asyncpg.connect(**self._connect_kwargs())
+        await conn.add_listener(channel, lambda *_: callback())
+        return conn
+
+    def _numbered(self, sql: str) -> str:
+        """Translate psycopg2 %s placeholders to asyncpg $1..$n (cached per statement)."""
+        converted = self._sql.get(sql)
+        if converted is None:
+            parts = sql.split("%s")
+            converted = parts[0] + "".join(f"${i}{part}" for i, part in enumerate(parts[1:], 1))
+            self._sql[sql] = converted
+        return converted
+
+    @asynccontextmanager
+    async def _acquire(self):
+        start = time.perf_counter()
+        with tracing.span("db.pool_wait", pool="asyncpg"):
+            conn = await self._pool.acquire()
+        self._wait_seconds.observe(time.perf_counter() - start)
+        try:
+            yield conn
+        finally:
+            await self._pool.release(conn)
+
+    async def fetch(self, sql: str, *args) -> list:
+        async with self._acquire() as conn, tracing.span("db.query", db="asyncpg"):
+            return await conn.fetch(self._numbered(sql), *args)
+
+    async def fetchrow(self, sql: str, *args):
+        async with self._acquire() as conn, tracing.span("db.query", db="asyncpg"):
+            return await conn.fetchrow(self._numbered(sql), *args)
+
+    async def fetchval(self, sql: str, *args):
+        async with self._acquire() as conn, tracing.span("db.query", db="asyncpg"):
+            return await conn.fetchval(self._numbered(sql), *args)
+
+    def stats(self) -> dict[str, int]:
+        if not self._pool:
+            return {"size": 0, "in_use": 0}
+        size = self._pool.get_size()
+        return {"size": size, "in_use": size - self._pool.get_idle_size()}
+
+    async def close(self):
+        if self._pool:
+            await self._pool.close()
+            self._pool = None
 
 
 class SearchEngine:
@@ -129,46 +352,263 @@ class SearchEngine:
     # Drop hits below this BM25 _score (not 0–1; tune against your index). None disables.
     ES_MIN_SCORE: float | None = 1.0
 
+    # Keep-alive connections the async client holds open per ES node, and the
+    # per-request timeout so one stuck query cannot pin a connection forever.
+    ES_CONNECTIONS_PER_NODE = 10
+    ES_REQUEST_TIMEOUT = 10
+
+    # Count hits exactly only up to this many ("10000+" beyond) unless exact_total is requested.
+    ES_TOTAL_HITS_CAP = 10000
+    # How long an idle cursor's point-in-time stays open between page requests.
+    ES_CURSOR_KEEP_ALIVE = "2m"
+    # Largest page a cursor may carry; cursors are signed, this also bounds a leaked secret.
+    CURSOR_MAX_PER_PAGE = DEFAULT_PER_PAGE
+    # Largest page size a single query in an _msearch batch may ask for.
+    MSEARCH_MAX_SIZE = 50
+    # Hits fetched per point-in-time page when streaming an export.
+    EXPORT_BATCH_SIZE = 500
+
+    # Hits return metadata from _source and a bounded snippet of text from the highlighter,
+    # never the full text field. Sizes are in characters.
+    ES_SOURCE_FIELDS = ["title", "url", "date"]
+    ES_SNIPPET_FRAGMENT_SIZE = 400
+    ES_SNIPPET_FRAGMENTS = 3
+    ES_SNIPPET_NO_MATCH_SIZE = 1200
+
+    # Hybrid search: hits each leg (BM25, kNN) contributes to reciprocal rank fusion, and RRF's k.
+    HYBRID_WINDOW = 50
+    RRF_K = 60
+
+    # Where searches go when Elasticsearch fails or its circuit is open, tried in order
+    # (SEARCH_FALLBACK, comma-separated: sqlite, postgres).
+    SEARCH_FALLBACKS = ("sqlite", "postgres")
+
+    # Read-path SQL shared by the psycopg2 and asyncpg paths (%s placeholders).
+    PG_SEARCH_SQL = """
+        WITH search_query AS (
+            SELECT websearch_to_tsquery('english', %s) AS q
+        ),
+        ranked AS (
+            SELECT 
+                pages.id,
+                ts_rank_cd(pages.page_tsv, search_query.q) AS score
+            FROM pages, search_query
+            WHERE pages.page_tsv @@ search_query.q
+            ORDER BY score DESC
+            LIMIT 200
+        )
+        SELECT 
+            pages.title,
+            pages.url,
+            pages.date,
+            LEFT(pages.text, 1500) AS text,
+            ranked.score
+        FROM ranked
+        JOIN pages ON pages.id = ranked.id
+        ORDER BY ranked.score DESC
+        LIMIT %s;
+    """
+    PG_LATEST_SQL = """
+        SELECT p.title, p.url, p.date, LEFT(p.text, 1500)
+        FROM (
+            SELECT id FROM pages 
+            WHERE date IS NOT NULL 
+            ORDER BY date DESC 
+            LIMIT %s OFFSET %s
+        ) AS ids
+        JOIN pages p ON p.id = ids.id
+        ORDER BY p.date DESC
+    """
+    PG_MAX_ID_SQL = "SELECT MAX(id) FROM pages"
+    PG_RANDOM_SQL = "SELECT title, url, date, LEFT(text, 1500) FROM pages WHERE id >= %s LIMIT 1"
+    PG_NOW_SQL = "SELECT now()"
+    PG_PAGE_IDS_SQL = "SELECT id FROM pages ORDER BY id"
+    PG_PAGE_IDS_SINCE_SQL = "SELECT id, scraped_on_date FROM pages WHERE scraped_on_date > %s"
+    PG_POST_BY_ID_SQL = "SELECT title, url, date, LEFT(text, 1500) FROM pages WHERE id = %s"
+    PG_POSTS_BY_IDS_SQL = "SELECT title, url, date, LEFT(text, 1500) FROM pages WHERE id = ANY(%s)"
+    # Autocomplete sources: queries searched at least SUGGEST_MIN_QUERY_COUNT times in the window
+    # (weighted by count) and the newest page titles (weight 1).
+    PG_SUGGEST_QUERIES_SQL = """
+        SELECT lower(query), count(*)
+        FROM query_logs
+        WHERE timestamp > now() - %s AND length(query) <= 80
+        GROUP BY 1
+        HAVING count(*) >= %s
+        ORDER BY 2 DESC
+        LIMIT %s
+    """
+    PG_SUGGEST_TITLES_SQL = "SELECT title FROM pages WHERE title <> '' ORDER BY id DESC LIMIT %s"
+    SUGGEST_QUERY_WINDOW = timedelta(days=30)
+    SUGGEST_MIN_QUERY_COUNT = 2
+    SUGGEST_LIMIT = 8
+    LATEST_TOTAL_PAGES = 5
+    # The scraper NOTIFYs this channel from save_page so /latest can refresh early.
+    PAGES_CHANGED_CHANNEL = "pages_changed"
+
     def __init__(self, use_elasticsearch: bool = True):
         load_dotenv()
-        self.db = DatabasePool()
-        self._init_schema()
-        self.size = self._get_db_size()
+        sync_connections, self._async_pool_size = connection_budget(self._async_pool_enabled())
+        self.db = DatabasePool(maxconn=sync_connections)
+        self.use_elasticsearch = use_elasticsearch
+        self.size = 0
         self.elasticsearch: Elasticsearch | None = None
+        self.async_elasticsearch: AsyncElasticsearch | None = None
         self._es_index = "pages"
+        self.cache = SearchCache(
+            max_entries=int(os.getenv("SEARCH_CACHE_SIZE", 1024)),
+            ttl_seconds=float(os.getenv("SEARCH_CACHE_TTL", 60)),
+        )
+        self.async_db: AsyncDatabasePool | None = None
+        self._latest_snapshot: list[SearchResult] | None = None
+        self.embedder: EmbeddingProvider | None = None
+        self.ready = False
+        self.startup_report: dict[str, dict[str, Any]] = {}
+        self.replica: SQLiteSearchBackend | None = None
+        self.replica_exporter: SQLiteReplicaExporter | None = None
+        replica_path = os.getenv("SQLITE_REPLICA_PATH")
+        if replica_path:
+            self.replica = SQLiteSearchBackend(replica_path)
+            self.replica_exporter = SQLiteReplicaExporter(self.db, replica_path)
+        self.search_fallbacks = tuple(
+            b.strip().lower()
+            for b in os.getenv("SEARCH_FALLBACK", ",".join(self.SEARCH_FALLBACKS)).split(",")
+            if b.strip()
+        )
+        self.es_breaker = CircuitBreaker(
+            "elasticsearch",
+            failure_threshold=int(os.getenv("ES_BREAKER_FAILURES", 3)),
+            base_backoff=float(os.getenv("ES_BREAKER_BACKOFF", 2)),
+            max_backoff=float(os.getenv("ES_BREAKER_MAX_BACKOFF", 60)),
+        )
+        self.hybrid_latency: dict[str, dict[str, float]] = {}
+        self.inflight = SingleFlight(timeout=float(os.getenv("SEARCH_COALESCE_TIMEOUT", 5)))
+        # Signs pagination cursors. Without CURSOR_SECRET, cursors only verify in this process
+        self._cursor_key = os.getenv("CURSOR_SECRET", "").encode() or os.urandom(32)
+        self.suggestions = SuggestionIndex(limit=self.SUGGEST_LIMIT)
+        self.random_sampler = RandomPostSampler(
+            prefetch_size=int(os.getenv("RANDOM_PREFETCH_SIZE", 32))
+        )
+        self.query_log = QueryLogWriter(
+            self.db,
+            max_buffer=int(os.getenv("QUERY_LOG_BUFFER", 10000)),
+            batch_size=int(os.getenv("QUERY_LOG_BATCH", 500)),
+            flush_interval=float(os.getenv("QUERY_LOG_FLUSH_SECONDS", 2)),
+        )
+        self.query_log.start()
         if use_elasticsearch:
-            self._init_elasticsearch()
+            self._init_async_elasticsearch()
+
+    async def startup(self) -> dict[str, dict[str, Any]]:
+        """Connect every backend concurrently; construction itself does no I/O.
+
+        A backend that fails is reported and left to the lazy paths (pool on first use,
+        Elasticsearch through the breaker's probes) rather than ending the process.
+        The engine is ready once PostgreSQL is; Elasticsearch being down only means
+        searches are served by the fallbacks. Returns {backend: {ok, seconds[, error]}}.
+        """
+
+        async def postgres():
+            await asyncio.to_thread(self._start_postgres)
+            return True
+
+        async def postgres_async():
+            await self.open_async()
+            return self.async_db is not None or not self._async_pool_enabled()
+
+        async def elasticsearch():
+            await asyncio.to_thread(self._init_elasticsearch)
+            return self.elasticsearch is not None
+
+        async def embeddings():
+            self.embedder = await asyncio.to_thread(self._init_embedder)
+            return True
+
+        backends = {"postgres": postgres(), "postgres_async": postgres_async(), "embeddings": embeddings()}
+        if self.use_elasticsearch:
+            backends["elasticsearch"] = elasticsearch()
+
+        async def timed(name: str, backend) -> None:
+            start = time.perf_counter()
+            report: dict[str, Any] = {}
+            try:
+                report["ok"] = await backend
+            except Exception as e:
+                print(f"Warning: {name} unavailable at startup: {e}")
+                report.update(ok=False, error=str(e))
+            report["seconds"] = round(time.perf_counter() - start, 4)
+            self.startup_report[name] = report
+
+        await asyncio.gather(*(timed(name, backend) for name, backend in backends.items()))
+        self.ready = self.startup_report["postgres"]["ok"]
+        return self.startup_report
+
+    async def retry_startup(self) -> bool:
+        """Try PostgreSQL (and the async pool) again after a failed startup; returns self.ready."""
+        try:
+            await asyncio.to_thread(self._start_postgres)
+        except Exception as e:
+            print(f"Warning: PostgreSQL still unavailable: {e}")
+            return False
+        if self.async_db is None:
+            await self.open_async()
+        self.ready = True
+        return True
+
+    def _start_postgres(self):
+        self._init_schema()
+        self.refresh_index_state()
 
     def _init_schema(self):
-        """Initialize database schema."""
+        """Apply schema.sql if it changed (SCHEMA_AUTO_MIGRATE=false only checks it).
+
+        Safe with many workers starting at once: see migrate.ensure_schema.
+        """
         conn = self.db.get_connection()
         try:
-            schema_path = os.path.join(os.path.dirname(__file__), "..", "db", "schema.sql")
-            with open(schema_path, "r") as f:
-                with conn.cursor() as cur:
-                    cur.execute(f.read())
-                conn.commit()
-        except (Exception, Error) as error:
-            print(f"Error initializing database: {error}")
-            sys.exit(1)
+            if os.getenv("SCHEMA_AUTO_MIGRATE", "true").lower() == "true":
+                if ensure_schema(conn):
+                    print("Applied db/schema.sql")
+            elif not schema_is_current(conn):
+                print("Warning: database schema differs from db/schema.sql; run python -m blog_search.migrate")
         finally:
             self.db.release(conn)
 
-    def _get_db_size(self) -> int:
-        """Get total number of indexed pages."""
+    def refresh_index_state(self) -> None:
+        """Read the scraper-maintained page count and index generation (cheap single-row reads).
+
+        A moved generation invalidates the search cache; the count feeds posts_size.
+        """
         conn = self.db.get_connection()
         try:
             with conn.cursor() as cursor:
-                cursor.execute("SELECT COUNT(*) FROM pages")
-                result = cursor.fetchone()
-                return result[0] if result else 0
+                cursor.execute(
+                    """
+                    SELECT g.generation, s.page_count
+                    FROM index_generation g, corpus_stats s
+                    """
+                )
+                row = cursor.fetchone()
+            conn.commit()
+            if row:
+                self.cache.set_generation(row[0])
+                self.size = row[1]
+        except Exception as e:
+            print(f"Error reading index state: {e}")
+            conn.rollback()
         finally:
             self.db.release(conn)
 
+    def _init_embedder(self) -> EmbeddingProvider | None:
+        try:
+            return get_embedding_provider()
+        except Exception as e:
+            print(f"Warning: could not load embedding provider; hybrid search uses keywords only: {e}")
+            return None
+
     def _init_elasticsearch(self):
         url = os.getenv("ELASTICSEARCH_URL", "http://localhost:9200")
         try:
-            client = Elasticsearch(url)
+            client = Elasticsearch(url, **elasticsearch_options())
             if not client.ping():
                 print("Warning: Elasticsearch ping failed; search may be unavailable")
                 self.elasticsearch = None
@@ -178,10 +618,61 @@ class SearchEngine:
             print(f"Warning: could not connect to Elasticsearch: {e}")
             self.elasticsearch = None
 
+    def _init_async_elasticsearch(self):
+        """Create the pooled async client used by the web routes.
+
+        No sockets are opened here; the transport connects lazily and keeps up to
+        ES_CONNECTIONS_PER_NODE keep-alive connections per node for reuse.
+        """
+        url = os.getenv("ELASTICSEARCH_URL", "http://localhost:9200")
+        try:
+            self.async_elasticsearch = AsyncElasticsearch(
+                url,
+                connections_per_node=self.ES_CONNECTIONS_PER_NODE,
+                request_timeout=self.ES_REQUEST_TIMEOUT,
+                **elasticsearch_options(),
+            )
+        except Exception as e:
+            print(f"Warning: could not create async Elasticsearch client: {e}")
+            self.async_elasticsearch = None
+
     @staticmethod
-    def _es_url_filters(site_domains: list[str]) -> list[dict[str, Any]]:
-        """Restrict to documents whose keyword url contains each listed host."""
-        return [{"wildcard": {"url": f"*{d}*"}} for d in site_domains]
+    def _async_pool_enabled() -> bool:
+        return asyncpg is not None and os.getenv("PG_ASYNC_POOL", "true").lower() == "true"
+
+    async def open_async(self):
+        """Open the asyncpg read pool if available (PG_ASYNC_POOL=false disables it)."""
+        if not self._async_pool_enabled():
+            return
+        async_db = AsyncDatabasePool(max_size=self._async_pool_size)
+        try:
+            await async_db.open()
+            self.async_db = async_db
+        except Exception as e:
+            print(f"Warning: could not open async PostgreSQL pool, using psycopg2: {e}")
+            self.async_db = None
+
+    async def close_async(self):
+        """Close the async Elasticsearch transport and PostgreSQL pool (call from the app's shutdown)."""
+        if self.async_elasticsearch:
+            await self.async_elasticsearch.close()
+            self.async_elasticsearch = None
+        if self.async_db:
+            await self.async_db.close()
+            self.async_db = None
+        await asyncio.to_thread(self.query_log.close)
+
+    @classmethod
+    def _es_url_filters(cls, site_domains: list[str]) -> list[dict[str, Any]]:
+        """Restrict to documents whose host, or registrable parent domain, is a listed site.
+
+        A terms filter on the keyword site_domains field is exact and cacheable by ES,
+        unlike the leading-wildcard url query it replaces.
+        """
+        sites = sorted({normalize_site(d) for d in site_domains} - {""})
+        if not sites:
+            return []
+        return [{"terms": {"site_domains": sites}}]
 
     def _es_keyword_body(self, clean_query: str, site_domains: list[str]) -> dict[str, Any]:
         if clean_query:
@@ -200,63 +691,786 @@ class SearchEngine:
         bool_query: dict[str, Any] = {"must": must}
         if site_domains:
             bool_query["filter"] = self._es_url_filters(site_domains)
-        return {"query": {"bool": bool_query}}
+        return {
+            "query": {"bool": bool_query},
+            "_source": self.ES_SOURCE_FIELDS,
+            "highlight": self._es_snippet_highlight(),
+        }
+
+    def _es_snippet_highlight(self) -> dict[str, Any]:
+        """Plain-text (untagged) query-relevant fragments of text; the opening of the post
+        when nothing in text matched (title-only or site:-only queries)."""
+        return {
+            "pre_tags": [""],
+            "post_tags": [""],
+            "fields": {
+                "text": {
+                    "type": "unified",
+                    "boundary_scanner": "sentence",
+                    "fragment_size": self.ES_SNIPPET_FRAGMENT_SIZE,
+                    "number_of_fragments": self.ES_SNIPPET_FRAGMENTS,
+                    "no_match_size": self.ES_SNIPPET_NO_MATCH_SIZE,
+                    "order": "score",
+                }
+            },
+        }
 
     def __del__(self):
-        self.db.close()
+        # The constructor may have failed before the pool existed
+        if getattr(self, "db", None):
+            self.db.close()
 
     # -------------------------------------------------------------------------
     # Elasticsearch search
     # -------------------------------------------------------------------------
 
+    def _es_search_body(
+        self,
+        clean_query: str,
+        site_domains: list[str],
+        page: int,
+        per_page: int,
+        exact_total: bool = False,
+    ) -> dict[str, Any]:
+        """Build the paginated ES request body for a parsed query."""
+        offset = (page - 1) * per_page
+        body = self._es_keyword_body(clean_query, site_domains)
+        body["from"] = offset
+        body["size"] = per_page
+        body["track_total_hits"] = True if exact_total else self.ES_TOTAL_HITS_CAP
+        if self.ES_MIN_SCORE is not None:
+            body["min_score"] = self.ES_MIN_SCORE
+        return body
+
+    def _check_depth(self, page: int, per_page: int) -> None:
+        """Raise PageTooDeep rather than let ES reject the page and the search fall back."""
+        if page * per_page > self.ES_TOTAL_HITS_CAP:
+            raise PageTooDeep(f"page may not go past result {self.ES_TOTAL_HITS_CAP}; use a cursor")
+
     def search_elasticsearch(
-        self, query: str, page: int = 1, per_page: int | None = None
+        self, query: str, page: int = 1, per_page: int | None = None, exact_total: bool = False
     ) -> dict[str, Any]:
         """Keyword search using Elasticsearch with pagination."""
         per_page = per_page or self.DEFAULT_PER_PAGE
+        self._check_depth(page, per_page)
+
+        clean_query, site_domains, _ = QueryParser.parse(query)
+        if not clean_query and not site_domains:
+            return self._empty_response(page, per_page)
+
+        kind = "keyword-exact" if exact_total else "keyword"
+        cache_key = SearchCache.key(clean_query, site_domains, page, per_page, kind)
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        if not self._acquire_elasticsearch():
+            return self._search_fallback(clean_query, site_domains, page, per_page)
+
+        body = self._es_search_body(clean_query, site_domains, page, per_page, exact_total)
+        start = time.perf_counter()
+        try:
+            raw = self.elasticsearch.search(index=self._es_index, body=body)
+        except Exception as e:
+            print(f"Elasticsearch search error: {e}")
+            self._record_es_error(e)
+            return self._search_fallback(clean_query, site_domains, page, per_page)
+        self.es_breaker.record_success()
+        metrics.observe_es("keyword", raw.get("took"), time.perf_counter() - start)
+
+        response = self._format_es_response(raw, page, per_page)
+        self.cache.put(cache_key, response)
+        return response
+
+    async def search_elasticsearch_async(
+        self, query: str, page: int = 1, per_page: int | None = None, exact_total: bool = False
+    ) -> dict[str, Any]:
+        """Keyword search for async callers; does not block the event loop on ES."""
+        per_page = per_page or self.DEFAULT_PER_PAGE
+        self._check_depth(page, per_page)
+
+        with tracing.span("search.parse"):
+            clean_query, site_domains, _ = QueryParser.parse(query)
+        if not clean_query and not site_domains:
+            return self._empty_response(page, per_page)
+
+        kind = "keyword-exact" if exact_total else "keyword"
+        cache_key = SearchCache.key(clean_query, site_domains, page, per_page, kind)
+        cached = self.cache.get(cache_key)
+        tracing.annotate(**{"search.cache_hit": cached is not None})
+        if cached is not None:
+            return cached
+
+        return await self._coalesced(
+            cache_key,
+            lambda: self._keyword_search_async(
+                clean_query, site_domains, page, per_page, exact_total, cache_key
+            ),
+            clean_query,
+            site_domains,
+            page,
+            per_page,
+        )
+
+    async def _coalesced(
+        self,
+        key: tuple,
+        search: Callable[[], Awaitable[dict[str, Any]]],
+        clean_query: str,
+        site_domains: list[str],
+        page: int,
+        per_page: int,
+    ) -> dict[str, Any]:
+        """Share one search() among concurrent callers with the same cache key.
+
+        A caller that waits longer than SEARCH_COALESCE_TIMEOUT is served by the fallbacks.
+        """
+        try:
+            with tracing.span("search.singleflight"):
+                return await self.inflight.do(key, search)
+        except asyncio.TimeoutError:
+            print(f"Search for {clean_query!r} timed out after {self.inflight.timeout}s; using fallback")
+            return await self._search_fallback_async(clean_query, site_domains, page, per_page)
+
+    async def _keyword_search_async(
+        self,
+        clean_query: str,
+        site_domains: list[str],
+        page: int,
+        per_page: int,
+        exact_total: bool,
+        cache_key: tuple,
+    ) -> dict[str, Any]:
+        if not self.async_elasticsearch or not self.es_breaker.allow_request():
+            return await self._search_fallback_async(clean_query, site_domains, page, per_page)
+
+        body = self._es_search_body(clean_query, site_domains, page, per_page, exact_total)
+        start = time.perf_counter()
+        try:
+            with tracing.span("elasticsearch.search", operation="keyword"):
+                raw = await self.async_elasticsearch.search(index=self._es_index, body=body)
+        except Exception as e:
+            print(f"Elasticsearch search error: {e}")
+            self._record_es_error(e)
+            return await self._search_fallback_async(clean_query, site_domains, page, per_page)
+        self.es_breaker.record_success()
+        metrics.observe_es("keyword", raw.get("took"), time.perf_counter() - start)
 
+        response = self._format_es_response(raw, page, per_page)
+        self.cache.put(cache_key, response)
+        return response
+
+    async def msearch_async(self, queries: list[tuple[str, int, int]]) -> list[dict[str, Any]]:
+        """Run many (query, page, per_page) keyword searches in one _msearch round trip.
+
+        Returns one entry per query, in order: a response shaped like
+        search_elasticsearch_async's, or {"error": message} for a query that could not run.
+        Cached and empty queries are answered locally and left out of the round trip.
+        """
+        results: list[dict[str, Any] | None] = [None] * len(queries)
+        searches: list[dict[str, Any]] = []
+        pending = []
+        for i, (query, page, per_page) in enumerate(queries):
+            if page < 1 or not 1 <= per_page <= self.MSEARCH_MAX_SIZE:
+                results[i] = {
+                    "error": f"page must be >= 1 and size between 1 and {self.MSEARCH_MAX_SIZE}"
+                }
+                continue
+            if page * per_page > self.ES_TOTAL_HITS_CAP:
+                results[i] = {
+                    "error": f"page * size may not exceed {self.ES_TOTAL_HITS_CAP}; use a cursor"
+                }
+                continue
+            clean_query, site_domains, _ = QueryParser.parse(query)
+            if not clean_query and not site_domains:
+                results[i] = self._empty_response(page, per_page)
+                continue
+            cache_key = SearchCache.key(clean_query, site_domains, page, per_page)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                results[i] = cached
+                continue
+            searches.append({"index": self._es_index})
+            searches.append(self._es_search_body(clean_query, site_domains, page, per_page))
+            pending.append((i, cache_key, clean_query, site_domains, page, per_page))
+
+        if not pending:
+            return results
+
+        raw = None
+        if self.async_elasticsearch and self.es_breaker.allow_request():
+            start = time.perf_counter()
+            try:
+                with tracing.span("elasticsearch.msearch", searches=len(pending)):
+                    raw = await self.async_elasticsearch.msearch(searches=searches)
+            except Exception as e:
+                print(f"Elasticsearch msearch error: {e}")
+                self._record_es_error(e)
+            else:
+                self.es_breaker.record_success()
+                metrics.observe_es("msearch", raw.get("took"), time.perf_counter() - start)
+
+        if raw is None:
+            fallbacks = await asyncio.gather(
+                *(self._search_fallback_async(q, sites, page, pp) for _, _, q, sites, page, pp in pending)
+            )
+            for (i, *_), response in zip(pending, fallbacks):
+                results[i] = response
+            return results
+
+        for (i, cache_key, _, _, page, per_page), item in zip(pending, raw["responses"]):
+            if "error" in item:
+                error = item["error"]
+                if isinstance(error, dict):
+                    error = error.get("reason") or error.get("type")
+                results[i] = {"error": str(error)}
+                continue
+            response = self._format_es_response(item, page, per_page)
+            self.cache.put(cache_key, response)
+            results[i] = response
+        return results
+
+    # -------------------------------------------------------------------------
+    # Circuit breaker and fallbacks
+    # -------------------------------------------------------------------------
+
+    def _acquire_elasticsearch(self) -> bool:
+        """Whether the sync client may be used now; connects lazily, at most once per probe.
+
+        Callers that get True must report the outcome to es_breaker.
+        """
+        if not self.es_breaker.allow_request():
+            return False
         if not self.elasticsearch:
             self._init_elasticsearch()
             if not self.elasticsearch:
-                return self._empty_response(page, per_page)
+                self.es_breaker.record_failure()
+                return False
+        return True
 
-        clean_query, site_domains, _ = QueryParser.parse(query)
+    def _record_es_error(self, error: BaseException) -> None:
+        """Count connection failures, timeouts and 5xx against the breaker.
 
-        if not clean_query and not site_domains:
-            return self._empty_response(page, per_page)
+        Any other error (a 400 for a malformed query, say) means ES answered, so it
+        counts as a success and releases a half-open probe.
+        """
+        if isinstance(error, TransportError) or (
+            isinstance(error, ApiError) and error.status_code >= 500
+        ):
+            self.es_breaker.record_failure()
+        else:
+            self.es_breaker.record_success()
 
+    def _search_fallback(
+        self, clean_query: str, site_domains: list[str], page: int, per_page: int
+    ) -> dict[str, Any]:
+        """Serve a search Elasticsearch could not, from the first configured fallback that can."""
+        for backend in self.search_fallbacks:
+            response = None
+            if backend == "sqlite":
+                response = self._search_replica(clean_query, site_domains, page, per_page)
+            elif backend == "postgres" and clean_query:
+                start = time.perf_counter()
+                try:
+                    rows = self.search(clean_query)
+                except Exception as e:
+                    print(f"PostgreSQL fallback search error: {e}")
+                else:
+                    response = self._format_pg_response(rows, site_domains, page, per_page, start)
+            if response is not None:
+                response["backend"] = backend
+                metrics.SEARCH_FALLBACKS.labels(backend).inc()
+                return response
+        metrics.SEARCH_FALLBACKS.labels("none").inc()
+        return self._empty_response(page, per_page)
+
+    async def _search_fallback_async(
+        self, clean_query: str, site_domains: list[str], page: int, per_page: int
+    ) -> dict[str, Any]:
+        for backend in self.search_fallbacks:
+            response = None
+            if backend == "sqlite" and self.replica and self.replica.available():
+                with tracing.span("search.fallback", backend=backend):
+                    response = await asyncio.to_thread(
+                        self._search_replica, clean_query, site_domains, page, per_page
+                    )
+            elif backend == "postgres" and clean_query:
+                start = time.perf_counter()
+                with tracing.span("search.fallback", backend=backend):
+                    try:
+                        rows = await self.search_async(clean_query)
+                    except Exception as e:
+                        print(f"PostgreSQL fallback search error: {e}")
+                    else:
+                        response = self._format_pg_response(rows, site_domains, page, per_page, start)
+            if response is not None:
+                response["backend"] = backend
+                metrics.SEARCH_FALLBACKS.labels(backend).inc()
+                return response
+        metrics.SEARCH_FALLBACKS.labels("none").inc()
+        return self._empty_response(page, per_page)
+
+    def _search_replica(
+        self, clean_query: str, site_domains: list[str], page: int, per_page: int
+    ) -> dict[str, Any] | None:
+        """Search the local SQLite replica; None if there is none or it failed."""
+        if not self.replica or not self.replica.available():
+            return None
+        try:
+            return self.replica.search(clean_query, site_domains, page, per_page)
+        except Exception as e:
+            print(f"SQLite replica search error: {e}")
+            return None
+
+    def _format_pg_response(
+        self, rows: list[SearchResult], site_domains: list[str], page: int, per_page: int, start: float
+    ) -> dict[str, Any]:
+        """Paginate PostgreSQL's top RESULTS_LIMIT rows like an ES response.
+
+        PG_SEARCH_SQL has no site filter, so site: is applied to those rows here.
+        """
+        sites = {normalize_site(d) for d in site_domains} - {""}
+        if sites:
+            rows = [r for r in rows if self._url_on_sites(r.url, sites)]
+        total = len(rows)
         offset = (page - 1) * per_page
+        return {
+            "results": rows[offset : offset + per_page],
+            "results_size": total,
+            "results_size_relation": "gte" if total >= self.RESULTS_LIMIT else "eq",
+            "search_time": round((time.perf_counter() - start) * 1000),
+            "page": page,
+            "per_page": per_page,
+            "total_pages": (total + per_page - 1) // per_page if total else 0,
+        }
+
+    @staticmethod
+    def _url_on_sites(url: str, sites: set[str]) -> bool:
+        """The same match as the site_domains terms filter in Elasticsearch."""
+        return not sites.isdisjoint(host_sites(url_host(url)))
+
+    def refresh_replica(self) -> int:
+        """Bring the SQLite replica up to date (full build the first time)."""
+        if not self.replica_exporter:
+            return 0
+        return self.replica_exporter.sync()
+
+    @staticmethod
+    def _b64encode(raw: bytes) -> str:
+        return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+    @staticmethod
+    def _b64decode(text: str) -> bytes:
+        return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+    def _cursor_signature(self, payload: str) -> str:
+        digest = hmac.new(self._cursor_key, payload.encode(), hashlib.sha256).digest()
+        return self._b64encode(digest[:16])
+
+    def _encode_cursor(self, state: dict[str, Any]) -> str:
+        payload = self._b64encode(json.dumps(state, separators=(",", ":")).encode())
+        return f"{payload}.{self._cursor_signature(payload)}"
+
+    def _decode_cursor(self, cursor: str) -> dict[str, Any]:
+        payload, _, signature = cursor.partition(".")
+        if not hmac.compare_digest(signature, self._cursor_signature(payload)):
+            raise InvalidCursor("cursor signature does not match")
+        try:
+            state = json.loads(self._b64decode(payload))
+            if not isinstance(state, dict) or not {"pit", "sa", "q", "pp"} <= state.keys():
+                raise ValueError("missing fields")
+        except ValueError as e:
+            raise InvalidCursor(f"malformed cursor: {e}") from None
+        pp, sa = state["pp"], state["sa"]
+        if type(pp) is not int or not 1 <= pp <= self.CURSOR_MAX_PER_PAGE:
+            raise InvalidCursor("malformed cursor: bad page size")
+        # search_after for the [_score, _shard_doc] sort
+        if sa is not None and not (
+            isinstance(sa, list)
+            and len(sa) == 2
+            and all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in sa)
+        ):
+            raise InvalidCursor("malformed cursor: bad sort position")
+        if not isinstance(state["pit"], str) or not isinstance(state["q"], str):
+            raise InvalidCursor("malformed cursor: bad fields")
+        return state
+
+    async def search_elasticsearch_cursor_async(
+        self,
+        query: str,
+        cursor: str = "*",
+        per_page: int | None = None,
+        exact_total: bool = False,
+    ) -> dict[str, Any]:
+        """Deep pagination with an opaque cursor backed by a point-in-time and search_after.
+
+        Pass cursor="*" to start; each response carries next_cursor until the hits run out.
+        Unlike from/size, every page costs the same regardless of how deep it is.
+        """
+        query = " ".join(query.split())
+        with tracing.span("search.parse"):
+            clean_query, site_domains, _ = QueryParser.parse(query)
+        if cursor == "*":
+            if not clean_query and not site_domains:
+                return {"results": [], "total": 0, "total_relation": "eq", "next_cursor": None}
+            per_page = min(per_page or self.DEFAULT_PER_PAGE, self.CURSOR_MAX_PER_PAGE)
+            state = {"pit": None, "sa": None, "q": query, "pp": per_page}
+        else:
+            state = self._decode_cursor(cursor)
+            if state["q"] != query:
+                raise InvalidCursor("cursor belongs to a different query")
+            per_page = state["pp"]
+
+        # A point-in-time lives on the ES cluster, so there is no fallback for cursors
+        if not self.async_elasticsearch or not self.es_breaker.allow_request():
+            raise SearchUnavailable("search is unavailable", self.es_breaker.retry_after())
+
+        start = time.perf_counter()
+        try:
+            if state["pit"] is None:
+                with tracing.span("elasticsearch.open_point_in_time"):
+                    pit = await self.async_elasticsearch.open_point_in_time(
+                        index=self._es_index, keep_alive=self.ES_CURSOR_KEEP_ALIVE
+                    )
+                state["pit"] = pit["id"]
+            body = self._es_cursor_body(clean_query, site_domains, state, exact_total)
+            with tracing.span("elasticsearch.search", operation="cursor"):
+                raw = await self.async_elasticsearch.search(body=body)
+        except NotFoundError:
+            self.es_breaker.record_success()
+            raise InvalidCursor("cursor has expired") from None
+        except Exception as e:
+            print(f"Elasticsearch cursor search error: {e}")
+            self._record_es_error(e)
+            raise SearchUnavailable("search is unavailable", self.es_breaker.retry_after()) from None
+        self.es_breaker.record_success()
+        metrics.observe_es("cursor", raw.get("took"), time.perf_counter() - start)
+
+        hits = raw.get("hits", {}).get("hits", [])
+        if state["sa"] is None:
+            state["t"] = self._es_total_hits(raw)
+            state["r"] = self._es_total_relation(raw)
+
+        next_cursor = None
+        pit_id = raw.get("pit_id", state["pit"])
+        if len(hits) == per_page:
+            state.update(pit=pit_id, sa=hits[-1]["sort"])
+            next_cursor = self._encode_cursor(state)
+        else:
+            try:
+                await self.async_elasticsearch.close_point_in_time(id=pit_id)
+            except Exception as e:
+                print(f"Error closing point in time: {e}")
+
+        return {
+            "results": [self._hit_to_row(h) for h in hits],
+            "total": state.get("t", 0),
+            "total_relation": state.get("r", "eq"),
+            "search_time": raw.get("took", 0),
+            "per_page": per_page,
+            "next_cursor": next_cursor,
+        }
+
+    async def export_async(self, query: str, max_rows: int):
+        """Yield every hit for a keyword query, in score order, as lists of result rows.
+
+        Walks the hits with a point-in-time and search_after EXPORT_BATCH_SIZE at a time,
+        so memory stays constant however deep the export goes. Stops after max_rows.
+        """
+        clean_query, site_domains, _ = QueryParser.parse(" ".join(query.split()))
+        if not clean_query and not site_domains:
+            return
+        if not self.async_elasticsearch or not self.es_breaker.allow_request():
+            raise SearchUnavailable("export is unavailable", self.es_breaker.retry_after())
+        try:
+            pit = await self.async_elasticsearch.open_point_in_time(
+                index=self._es_index, keep_alive=self.ES_CURSOR_KEEP_ALIVE
+            )
+        except Exception as e:
+            print(f"Elasticsearch export error: {e}")
+            self._record_es_error(e)
+            raise SearchUnavailable("export is unavailable", self.es_breaker.retry_after()) from None
+        self.es_breaker.record_success()
+
+        pit_id = pit["id"]
+        sent = 0
+        try:
+            body = self._es_keyword_body(clean_query, site_domains)
+            body["sort"] = [{"_score": "desc"}, {"_shard_doc": "asc"}]
+            body["track_total_hits"] = False
+            if self.ES_MIN_SCORE is not None:
+                body["min_score"] = self.ES_MIN_SCORE
+            while sent < max_rows:
+                body["size"] = min(self.EXPORT_BATCH_SIZE, max_rows - sent)
+                body["pit"] = {"id": pit_id, "keep_alive": self.ES_CURSOR_KEEP_ALIVE}
+                start = time.perf_counter()
+                with tracing.span("elasticsearch.search", operation="export"):
+                    raw = await self.async_elasticsearch.search(body=body)
+                metrics.observe_es("export", raw.get("took"), time.perf_counter() - start)
+                hits = raw.get("hits", {}).get("hits", [])
+                if not hits:
+                    return
+                pit_id = raw.get("pit_id", pit_id)
+                body["search_after"] = hits[-1]["sort"]
+                sent += len(hits)
+                yield [self._hit_to_row(h) for h in hits]
+                if len(hits) < body["size"]:
+                    return
+        finally:
+            try:
+                await self.async_elasticsearch.close_point_in_time(id=pit_id)
+            except Exception as e:
+                print(f"Error closing point in time: {e}")
+
+    def _es_cursor_body(
+        self, clean_query: str, site_domains: list[str], state: dict[str, Any], exact_total: bool
+    ) -> dict[str, Any]:
         body = self._es_keyword_body(clean_query, site_domains)
-        body["from"] = offset
-        body["size"] = per_page
-        body["track_total_hits"] = True
+        body["size"] = state["pp"]
+        body["sort"] = [{"_score": "desc"}, {"_shard_doc": "asc"}]
+        body["pit"] = {"id": state["pit"], "keep_alive": self.ES_CURSOR_KEEP_ALIVE}
         if self.ES_MIN_SCORE is not None:
             body["min_score"] = self.ES_MIN_SCORE
+        if state["sa"] is None:
+            # Only the first page counts hits; later pages reuse the total from the cursor
+            body["track_total_hits"] = True if exact_total else self.ES_TOTAL_HITS_CAP
+        else:
+            body["search_after"] = state["sa"]
+            body["track_total_hits"] = False
+        return body
+
+    def _hybrid_window(self, page: int, per_page: int) -> int:
+        return min(max(self.HYBRID_WINDOW, page * per_page), self.ES_TOTAL_HITS_CAP)
+
+    def _es_bm25_leg_body(self, clean_query: str, site_domains: list[str], window: int) -> dict[str, Any]:
+        body = self._es_keyword_body(clean_query, site_domains)
+        body["size"] = window
+        body["track_total_hits"] = self.ES_TOTAL_HITS_CAP
+        if self.ES_MIN_SCORE is not None:
+            body["min_score"] = self.ES_MIN_SCORE
+        return body
+
+    def _es_knn_leg_body(
+        self, clean_query: str, site_domains: list[str], vector: list[float], window: int
+    ) -> dict[str, Any]:
+        knn: dict[str, Any] = {
+            "field": "embedding",
+            "query_vector": vector,
+            "k": window,
+            "num_candidates": min(window * 4, self.ES_TOTAL_HITS_CAP),
+        }
+        if site_domains:
+            knn["filter"] = self._es_url_filters(site_domains)
+        highlight = self._es_snippet_highlight()
+        # kNN has no text query of its own; pick snippets by the keywords anyway
+        highlight["fields"]["text"]["highlight_query"] = {"match": {"text": clean_query}}
+        return {
+            "knn": knn,
+            "size": window,
+            "_source": self.ES_SOURCE_FIELDS,
+            "highlight": highlight,
+        }
 
+    @classmethod
+    def _rrf_fuse(cls, *rankings: list[dict[str, Any]]) -> list[dict[str, Any]]:
+        """Reciprocal rank fusion: score(doc) = sum over rankings of 1 / (RRF_K + rank)."""
+        scores: dict[str, float] = {}
+        hits: dict[str, dict[str, Any]] = {}
+        for ranking in rankings:
+            for rank, hit in enumerate(ranking, 1):
+                doc_id = hit["_id"]
+                scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (cls.RRF_K + rank)
+                # Keep the first leg's copy: BM25 highlights come from the real query
+                hits.setdefault(doc_id, hit)
+        return [hits[doc_id] for doc_id in sorted(scores, key=scores.__getitem__, reverse=True)]
+
+    def _record_leg(self, leg: str, ms: float) -> None:
+        stats = self.hybrid_latency.setdefault(leg, {"count": 0, "total_ms": 0.0, "max_ms": 0.0})
+        stats["count"] += 1
+        stats["total_ms"] += ms
+        stats["max_ms"] = max(stats["max_ms"], ms)
+
+    def _format_hybrid_response(
+        self,
+        bm25_raw: dict[str, Any] | None,
+        knn_raw: dict[str, Any] | None,
+        page: int,
+        per_page: int,
+        legs: dict[str, float],
+    ) -> dict[str, Any]:
+        start = time.perf_counter()
+        with tracing.span("search.format", kind="hybrid"):
+            bm25_hits = bm25_raw.get("hits", {}).get("hits", []) if bm25_raw else []
+            knn_hits = knn_raw.get("hits", {}).get("hits", []) if knn_raw else []
+            fused = self._rrf_fuse(bm25_hits, knn_hits)
+
+            total_hits = max(self._es_total_hits(bm25_raw) if bm25_raw else 0, len(fused))
+            total_pages = (total_hits + per_page - 1) // per_page if total_hits > 0 else 0
+            offset = (page - 1) * per_page
+            results = [self._hit_to_row(h) for h in fused[offset : offset + per_page]]
+        fusion_seconds = time.perf_counter() - start
+        legs["fusion_ms"] = round(fusion_seconds * 1000, 2)
+        for leg, ms in legs.items():
+            self._record_leg(leg, ms)
+        metrics.observe_format("hybrid", fusion_seconds)
+        if bm25_raw:
+            metrics.observe_es("hybrid_bm25", bm25_raw.get("took"), legs["bm25_ms"] / 1000)
+        if knn_raw:
+            metrics.observe_es("hybrid_knn", knn_raw.get("took"), legs["knn_ms"] / 1000)
+
+        return {
+            "results": results,
+            "results_size": total_hits,
+            "results_size_relation": self._es_total_relation(bm25_raw) if bm25_raw else "eq",
+            "search_time": max(
+                bm25_raw.get("took", 0) if bm25_raw else 0,
+                knn_raw.get("took", 0) if knn_raw else 0,
+            ),
+            "page": page,
+            "per_page": per_page,
+            "total_pages": total_pages,
+            "legs": legs,
+            "backend": "elasticsearch",
+        }
+
+    def search_elasticsearch_hybrid(
+        self, query: str, page: int = 1, per_page: int | None = None
+    ) -> dict[str, Any]:
+        """BM25 + kNN over page embeddings, fused with RRF (blocking variant for the CLI)."""
+        per_page = per_page or self.DEFAULT_PER_PAGE
+        self._check_depth(page, per_page)
+        clean_query, site_domains, _ = QueryParser.parse(query)
+        if not self.embedder or not clean_query:
+            return self.search_elasticsearch(query, page=page, per_page=per_page)
+
+        if not self._acquire_elasticsearch():
+            return self._search_fallback(clean_query, site_domains, page, per_page)
+
+        window = self._hybrid_window(page, per_page)
+        legs: dict[str, float] = {}
+        bm25_raw = knn_raw = None
+        error: Exception | None = None
         try:
-            raw = self.elasticsearch.search(index=self._es_index, body=body)
+            start = time.perf_counter()
+            bm25_raw = self.elasticsearch.search(
+                index=self._es_index, body=self._es_bm25_leg_body(clean_query, site_domains, window)
+            )
+            legs["bm25_ms"] = round((time.perf_counter() - start) * 1000, 2)
         except Exception as e:
-            print(f"Elasticsearch search error: {e}")
-            return self._empty_response(page, per_page)
+            print(f"Elasticsearch BM25 leg error: {e}")
+            error = e
+        try:
+            start = time.perf_counter()
+            vector = self.embedder.embed_one(clean_query)
+            legs["embed_ms"] = round((time.perf_counter() - start) * 1000, 2)
+            start = time.perf_counter()
+            knn_raw = self.elasticsearch.search(
+                index=self._es_index,
+                body=self._es_knn_leg_body(clean_query, site_domains, vector, window),
+            )
+            legs["knn_ms"] = round((time.perf_counter() - start) * 1000, 2)
+        except Exception as e:
+            print(f"Elasticsearch kNN leg error: {e}")
+            error = error or e
 
-        return self._format_es_response(raw, page, per_page)
+        if bm25_raw is None and knn_raw is None:
+            self._record_es_error(error)
+            return self._search_fallback(clean_query, site_domains, page, per_page)
+        self.es_breaker.record_success()
+        return self._format_hybrid_response(bm25_raw, knn_raw, page, per_page, legs)
 
-    def search_elasticsearch_hybrid(
+    async def search_elasticsearch_hybrid_async(
         self, query: str, page: int = 1, per_page: int | None = None
     ) -> dict[str, Any]:
-        # TODO(elasticsearch): real hybrid = BM25 + sparse/dense vectors (ELSER, text_embedding
-        # inference, kNN) with RRF or linear combination; index must expose vector fields.
-        return self.search_elasticsearch(query, page=page, per_page=per_page)
+        """BM25 + kNN over page embeddings, run concurrently and fused with RRF.
+
+        Falls back to keyword search when no embedding provider is configured or the
+        query is site:-only, and to whichever leg succeeded if the other one fails.
+        """
+        per_page = per_page or self.DEFAULT_PER_PAGE
+        self._check_depth(page, per_page)
+        with tracing.span("search.parse"):
+            clean_query, site_domains, _ = QueryParser.parse(query)
+        if not self.embedder or not clean_query:
+            return await self.search_elasticsearch_async(query, page=page, per_page=per_page)
+
+        cache_key = SearchCache.key(clean_query, site_domains, page, per_page, "hybrid")
+        cached = self.cache.get(cache_key)
+        tracing.annotate(**{"search.cache_hit": cached is not None})
+        if cached is not None:
+            return cached
+
+        return await self._coalesced(
+            cache_key,
+            lambda: self._hybrid_search_async(clean_query, site_domains, page, per_page, cache_key),
+            clean_query,
+            site_domains,
+            page,
+            per_page,
+        )
+
+    async def _hybrid_search_async(
+        self, clean_query: str, site_domains: list[str], page: int, per_page: int, cache_key: tuple
+    ) -> dict[str, Any]:
+        if not self.async_elasticsearch or not self.es_breaker.allow_request():
+            return await self._search_fallback_async(clean_query, site_domains, page, per_page)
+
+        window = self._hybrid_window(page, per_page)
+        legs: dict[str, float] = {}
+
+        async def bm25_leg():
+            start = time.perf_counter()
+            with tracing.span("elasticsearch.search", operation="hybrid_bm25"):
+                raw = await self.async_elasticsearch.search(
+                    index=self._es_index,
+                    body=self._es_bm25_leg_body(clean_query, site_domains, window),
+                )
+            legs["bm25_ms"] = round((time.perf_counter() - start) * 1000, 2)
+            return raw
+
+        async def knn_leg():
+            start = time.perf_counter()
+            with tracing.span("embed"):
+                vector = await asyncio.to_thread(self.embedder.embed_one, clean_query)
+            legs["embed_ms"] = round((time.perf_counter() - start) * 1000, 2)
+            start = time.perf_counter()
+            with tracing.span("elasticsearch.search", operation="hybrid_knn"):
+                raw = await self.async_elasticsearch.search(
+                    index=self._es_index,
+                    body=self._es_knn_leg_body(clean_query, site_domains, vector, window),
+                )
+            legs["knn_ms"] = round((time.perf_counter() - start) * 1000, 2)
+            return raw
+
+        bm25_raw, knn_raw = await asyncio.gather(bm25_leg(), knn_leg(), return_exceptions=True)
+        error = bm25_raw if isinstance(bm25_raw, Exception) else knn_raw
+        if isinstance(bm25_raw, Exception):
+            print(f"Elasticsearch BM25 leg error: {bm25_raw}")
+            bm25_raw = None
+        if isinstance(knn_raw, Exception):
+            print(f"Elasticsearch kNN leg error: {knn_raw}")
+            knn_raw = None
+        if bm25_raw is None and knn_raw is None:
+            self._record_es_error(error)
+            return await self._search_fallback_async(clean_query, site_domains, page, per_page)
+        self.es_breaker.record_success()
+
+        response = self._format_hybrid_response(bm25_raw, knn_raw, page, per_page, legs)
+        if bm25_raw is not None and knn_raw is not None:
+            self.cache.put(cache_key, response)
+        return response
 
     def _empty_response(self, page: int, per_page: int) -> dict[str, Any]:
         """Return empty response with pagination metadata."""
         return {
             "results": [],
             "results_size": 0,
+            "results_size_relation": "eq",
             "search_time": 0,
             "page": page,
             "per_page": per_page,
             "total_pages": 0,
+            "backend": "none",
         }
 
     def _es_total_hits(self, raw: dict[str, Any]) -> int:
@@ -265,46 +1479,57 @@ class SearchEngine:
             return int(total.get("value", 0))
         return int(total or 0)
 
-    def _source_to_row(self, src: dict[str, Any]) -> dict[str, Any]:
-        return {
-            "title": src.get("title", ""),
-            "url": (src.get("url") or "").rstrip("/"),
-            "date": src.get("date"),
-            "text": self._truncate_text(src.get("text", ""), 300),
-        }
+    def _es_total_relation(self, raw: dict[str, Any]) -> str:
+        """'eq' for an exact total, 'gte' when counting stopped at ES_TOTAL_HITS_CAP."""
+        total = raw.get("hits", {}).get("total", 0)
+        if isinstance(total, dict):
+            return total.get("relation", "eq")
+        return "eq"
+
+    def _hit_to_row(self, hit: dict[str, Any]) -> SearchResult:
+        src = hit.get("_source", {})
+        fragments = hit.get("highlight", {}).get("text")
+        if fragments:
+            text = " ... ".join(f.strip() for f in fragments)
+        else:
+            # Only reached if text was fetched in _source (e.g. an older body shape)
+            text = truncate_text(src.get("text", ""))
+        return SearchResult(
+            src.get("title", ""), (src.get("url") or "").rstrip("/"), src.get("date"), text
+        )
 
     def _format_es_response(
         self, raw: dict[str, Any], page: int, per_page: int
     ) -> dict[str, Any]:
         """Format Elasticsearch response for keyword search with pagination."""
-        hits = raw.get("hits", {}).get("hits", [])
-        total_hits = self._es_total_hits(raw)
-        total_pages = (total_hits + per_page - 1) // per_page if total_hits > 0 else 0
+        start = time.perf_counter()
+        with tracing.span("search.format", kind="keyword"):
+            hits = raw.get("hits", {}).get("hits", [])
+            total_hits = self._es_total_hits(raw)
+            total_pages = (total_hits + per_page - 1) // per_page if total_hits > 0 else 0
+            results = [self._hit_to_row(h) for h in hits]
+        metrics.observe_format("keyword", time.perf_counter() - start)
 
         return {
-            "results": [self._source_to_row(h.get("_source", {})) for h in hits],
+            "results": results,
             "results_size": total_hits,
+            "results_size_relation": self._es_total_relation(raw),
             "search_time": raw.get("took", 0),
             "page": page,
             "per_page": per_page,
             "total_pages": total_pages,
+            "backend": "elasticsearch",
         }
 
-    @staticmethod
-    def _truncate_text(text: str, max_words: int) -> str:
-        """Truncate text to max_words while preserving word boundaries."""
-        if not text:
-            return ""
-        words = text.split()
-        if len(words) <= max_words:
-            return text
-        return " ".join(words[:max_words]) + "..."
-
     # -------------------------------------------------------------------------
     # PostgreSQL Full-Text Search (fallback)
     # -------------------------------------------------------------------------
 
-    def search(self, query: str) -> list[dict]:
+    def _row_to_result(self, row) -> SearchResult:
+        """Format a (title, url, date, text) row from PostgreSQL."""
+        return SearchResult(row[0], row[1].rstrip("/"), row[2], truncate_text(row[3]))
+
+    def search(self, query: str) -> list[SearchResult]:
         """Full-text search using PostgreSQL tsquery."""
         conn = self.db.get_connection()
         try:
@@ -313,136 +1538,234 @@ class SearchEngine:
             if not query_text:
                 return []
 
-            with conn.cursor() as cursor:
-                sql = """
-                    WITH search_query AS (
-                        SELECT websearch_to_tsquery('english', %s) AS q
-                    ),
-                    ranked AS (
-                        SELECT 
-                            pages.id,
-                            ts_rank_cd(pages.page_tsv, search_query.q) AS score
-                        FROM pages, search_query
-                        WHERE pages.page_tsv @@ search_query.q
-                        ORDER BY score DESC
-                        LIMIT 200
-                    )
-                    SELECT 
-                        pages.title,
-                        pages.url,
-                        pages.date,
-                        LEFT(pages.text, 1500) AS text,
-                        ranked.score
-                    FROM ranked
-                    JOIN pages ON pages.id = ranked.id
-                    ORDER BY ranked.score DESC
-                    LIMIT %s;
-                """
-                cursor.execute(sql, (query_text, self.RESULTS_LIMIT))
-                results = cursor.fetchall()
-
-                return [
-                    {
-                        "title": row[0],
-                        "url": row[1].rstrip("/"),
-                        "date": row[2],
-                        "text": self._truncate_text(row[3], 300),
-                    }
-                    for row in results
-                ]
+            with tracing.span("db.query", db="psycopg2"), conn.cursor() as cursor:
+                cursor.execute(self.PG_SEARCH_SQL, (query_text, self.RESULTS_LIMIT))
+                return [self._row_to_result(row) for row in cursor.fetchall()]
         finally:
             self.db.release(conn)
 
+    async def search_async(self, query: str) -> list[SearchResult]:
+        """PostgreSQL full-text search for async callers."""
+        if not self.async_db:
+            return await asyncio.to_thread(self.search, query)
+        query_text = " ".join(query.split()).strip()
+        if not query_text:
+            return []
+        rows = await self.async_db.fetch(self.PG_SEARCH_SQL, query_text, self.RESULTS_LIMIT)
+        return [self._row_to_result(row) for row in rows]
+
     # -------------------------------------------------------------------------
     # Browse Methods
     # -------------------------------------------------------------------------
 
+    def _latest_page(self, page: int) -> tuple[int, int, int]:
+        """Clamp page and return (page, limit, offset) for the latest feed."""
+        page = min(page, self.LATEST_TOTAL_PAGES)
+        per_page = self.DEFAULT_PER_PAGE
+        return page, per_page, (page - 1) * per_page
+
+    def _latest_from_snapshot(self, page: int) -> dict[str, Any] | None:
+        snapshot = self._latest_snapshot
+        if snapshot is None:
+            return None
+        page, per_page, offset = self._latest_page(page)
+        return {
+            "results": snapshot[offset : offset + per_page],
+            "page": page,
+            "total_pages": self.LATEST_TOTAL_PAGES,
+        }
+
+    def refresh_latest_snapshot(self) -> None:
+        """Load every post /latest can show, already formatted, in one query."""
+        conn = self.db.get_connection()
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(self.PG_LATEST_SQL, (self._latest_snapshot_size(), 0))
+                self._latest_snapshot = [self._row_to_result(row) for row in cursor.fetchall()]
+        finally:
+            self.db.release(conn)
+
+    async def refresh_latest_snapshot_async(self) -> None:
+        if not self.async_db:
+            return await asyncio.to_thread(self.refresh_latest_snapshot)
+        rows = await self.async_db.fetch(self.PG_LATEST_SQL, self._latest_snapshot_size(), 0)
+        self._latest_snapshot = [self._row_to_result(row) for row in rows]
+
+    def _latest_snapshot_size(self) -> int:
+        return self.LATEST_TOTAL_PAGES * self.DEFAULT_PER_PAGE
+
+    async def listen_pages_changed(self, callback: Callable[[], None]):
+        """Call callback on every scraper NOTIFY; returns the listening connection or None."""
+        if not self.async_db:
+            return None
+        try:
+            return await self.async_db.listen(self.PAGES_CHANGED_CHANNEL, callback)
+        except Exception as e:
+            print(f"Warning: could not LISTEN on {self.PAGES_CHANGED_CHANNEL}: {e}")
+            return None
+
     def get_latest_posts(self, page: int = 1) -> dict[str, Any]:
         """Get most recently published posts with pagination."""
-        total_pages = 5
-        page = min(page, total_pages)
-        per_page = self.DEFAULT_PER_PAGE
-        offset = (page - 1) * per_page
-        
+        cached = self._latest_from_snapshot(page)
+        if cached is not None:
+            return cached
+
+        page, per_page, offset = self._latest_page(page)
+
         conn = self.db.get_connection()
         try:
             with conn.cursor() as cursor:
-                cursor.execute("""
-                    SELECT p.title, p.url, p.date, LEFT(p.text, 1500)
-                    FROM (
-                        SELECT id FROM pages 
-                        WHERE date IS NOT NULL 
-                        ORDER BY date DESC 
-                        LIMIT %s OFFSET %s
-                    ) AS ids
-                    JOIN pages p ON p.id = ids.id
-                    ORDER BY p.date DESC
-                """, (per_page, offset))
-                
+                cursor.execute(self.PG_LATEST_SQL, (per_page, offset))
                 return {
-                    "results": [
-                        {
-                            "title": row[0],
-                            "url": row[1].rstrip("/"),
-                            "date": row[2],
-                            "text": self._truncate_text(row[3], 300),
-                        }
-                        for row in cursor.fetchall()
-                    ],
+                    "results": [self._row_to_result(row) for row in cursor.fetchall()],
                     "page": page,
-                    "total_pages": total_pages,
+                    "total_pages": self.LATEST_TOTAL_PAGES,
                 }
         finally:
             self.db.release(conn)
 
-    def get_random_post(self) -> dict:
+    async def get_latest_posts_async(self, page: int = 1) -> dict[str, Any]:
+        """Latest posts for async callers; served from the snapshot once it is loaded."""
+        cached = self._latest_from_snapshot(page)
+        if cached is not None:
+            return cached
+        if not self.async_db:
+            return await asyncio.to_thread(self.get_latest_posts, page)
+        page, per_page, offset = self._latest_page(page)
+        rows = await self.async_db.fetch(self.PG_LATEST_SQL, per_page, offset)
+        return {
+            "results": [self._row_to_result(row) for row in rows],
+            "page": page,
+            "total_pages": self.LATEST_TOTAL_PAGES,
+        }
+
+    def _fetch(self, sql: str, args: tuple = ()) -> list:
+        conn = self.db.get_connection()
+        try:
+            with tracing.span("db.query", db="psycopg2"), conn.cursor() as cursor:
+                cursor.execute(sql, args)
+                return cursor.fetchall()
+        finally:
+            self.db.release(conn)
+
+    async def _fetch_async(self, sql: str, *args) -> list:
+        if self.async_db:
+            return await self.async_db.fetch(sql, *args)
+        return await asyncio.to_thread(self._fetch, sql, args)
+
+    async def refresh_random_ids_async(self) -> None:
+        """Load all page ids once, then merge ids scraped since the last refresh."""
+        sampler = self.random_sampler
+        if not sampler.loaded:
+            now = (await self._fetch_async(self.PG_NOW_SQL))[0][0]
+            rows = await self._fetch_async(self.PG_PAGE_IDS_SQL)
+            sampler.load((row[0] for row in rows), now - WATERMARK_OVERLAP)
+            return
+        since = sampler.watermark - WATERMARK_OVERLAP
+        rows = await self._fetch_async(self.PG_PAGE_IDS_SINCE_SQL, since)
+        sampler.merge((row[0], row[1]) for row in rows)
+
+    async def prefetch_random_posts_async(self) -> None:
+        """Top up the sampler's pool of formatted random posts in one query."""
+        wanted = self.random_sampler.prefetch_wanted()
+        if not wanted:
+            return
+        ids = self.random_sampler.pick_many(wanted)
+        rows = await self._fetch_async(self.PG_POSTS_BY_IDS_SQL, ids)
+        # ANY() returns rows in physical order; shuffle so the pool order stays random
+        posts = [self._row_to_result(row) for row in rows]
+        random.shuffle(posts)
+        self.random_sampler.add_prefetched(posts)
+
+    def get_random_post(self) -> SearchResult | None:
         """Get a random post from the database."""
+        post = self.random_sampler.take_prefetched()
+        if post:
+            return post
+        for _ in range(3):
+            page_id = self.random_sampler.pick()
+            if page_id is None:
+                break
+            rows = self._fetch(self.PG_POST_BY_ID_SQL, (page_id,))
+            if rows:
+                return self._row_to_result(rows[0])
+            self.random_sampler.discard(page_id)
+
+        if self.random_sampler.loaded:
+            return None
+        return self._get_random_post_by_probe()
+
+    def _get_random_post_by_probe(self) -> SearchResult | None:
+        """Random post via id >= random probes; used until the sampler has loaded ids."""
         conn = self.db.get_connection()
         try:
             with conn.cursor() as cursor:
-                cursor.execute("SELECT MAX(id) FROM pages")
+                cursor.execute(self.PG_MAX_ID_SQL)
                 max_id = cursor.fetchone()[0]
 
                 if not max_id:
-                    return {}
+                    return None
 
                 # Try up to 10 times to find a valid random ID
                 for _ in range(10):
                     random_id = random.randint(1, max_id)
-                    cursor.execute(
-                        "SELECT title, url, date, LEFT(text, 1500) FROM pages WHERE id >= %s LIMIT 1",
-                        (random_id,),
-                    )
+                    cursor.execute(self.PG_RANDOM_SQL, (random_id,))
                     row = cursor.fetchone()
                     if row:
-                        return {
-                            "title": row[0],
-                            "url": row[1].rstrip("/"),
-                            "date": row[2],
-                            "text": self._truncate_text(row[3], 300),
-                        }
-                return {}
+                        return self._row_to_result(row)
+                return None
         finally:
             self.db.release(conn)
 
+    async def get_random_post_async(self) -> SearchResult | None:
+        """Random post for async callers: prefetched pool, else one primary-key lookup."""
+        post = self.random_sampler.take_prefetched()
+        if post:
+            return post
+        if not self.random_sampler.loaded:
+            return await asyncio.to_thread(self._get_random_post_by_probe)
+        for _ in range(3):
+            page_id = self.random_sampler.pick()
+            if page_id is None:
+                break
+            rows = await self._fetch_async(self.PG_POST_BY_ID_SQL, page_id)
+            if rows:
+                return self._row_to_result(rows[0])
+            self.random_sampler.discard(page_id)
+        return None
+
+    # -------------------------------------------------------------------------
+    # Autocomplete
+    # -------------------------------------------------------------------------
+
+    def refresh_suggestions(self) -> int:
+        """Rebuild the autocomplete trie from popular queries and page titles, then swap it in."""
+        queries = self._fetch(
+            self.PG_SUGGEST_QUERIES_SQL,
+            (
+                self.SUGGEST_QUERY_WINDOW,
+                self.SUGGEST_MIN_QUERY_COUNT,
+                int(os.getenv("SUGGEST_QUERY_LIMIT", 50000)),
+            ),
+        )
+        titles = self._fetch(self.PG_SUGGEST_TITLES_SQL, (int(os.getenv("SUGGEST_TITLE_LIMIT", 100000)),))
+        entries = [(query, float(count)) for query, count in queries]
+        entries.extend((title, 1.0) for (title,) in titles)
+        self.suggestions = SuggestionIndex.build(entries, limit=self.SUGGEST_LIMIT)
+        return self.suggestions.terms
+
+    def suggest(self, prefix: str, limit: int | None = None) -> list[str]:
+        """Completions for a typed prefix from the in-memory trie (no I/O)."""
+        return self.suggestions.lookup(prefix, limit)
+
     # -------------------------------------------------------------------------
     # Analytics
     # -------------------------------------------------------------------------
 
     def log_query(self, query: str, ip_address: str, user_agent: str) -> None:
-        """Log search query for analytics."""
-        conn = self.db.get_connection()
-        try:
-            with conn.cursor() as cursor:
-                cursor.execute(
-                    "INSERT INTO query_logs (query, ip_address, user_agent) VALUES (%s, %s, %s)",
-                    (query, ip_address, user_agent),
-                )
-                conn.commit()
-        except Exception as e:
-            print(f"Error logging query: {e}")
-        finally:
-            self.db.release(conn)
+        """Queue a search query for the bulk analytics writer."""
+        queued = self.query_log.submit(query, ip_address, user_agent)
+        tracing.annotate(**{"query_log.queued": queued})
 
 
 # -----------------------------------------------------------------------------
@@ -451,6 +1774,9 @@ class SearchEngine:
 
 if __name__ == "__main__":
     engine = SearchEngine()
+    engine._init_schema()
+    engine.refresh_index_state()
+    engine.embedder = engine._init_embedder()
 
     try:
         while True:
@@ -462,13 +1788,14 @@ if __name__ == "__main__":
             response = engine.search_elasticsearch(query)
             print(f"Found {response['results_size']} results in {response['search_time']}ms")
             for r in response["results"][:5]:
-                print(f"  {r['title'][:60]}... - {r['url']}")
+                print(f"  {r.title[:60]}... - {r.url}")
 
             print("\n--- Hybrid Search ---")
             response = engine.search_elasticsearch_hybrid(query)
             print(f"Found {response['results_size']} results in {response['search_time']}ms")
             for r in response["results"][:5]:
-                print(f"  {r['title'][:60]}... - {r['url']}")
+                print(f"  {r.title[:60]}... - {r.url}")
             print()
     finally:
+        engine.query_log.close()
         engine.db.close()
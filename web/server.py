@@ -1,4 +1,10 @@
+import asyncio
+import math
+import secrets
+import sys
+import tempfile
 import time
+from contextlib import asynccontextmanager, suppress
 from fastapi import FastAPI, Request, Form, Query, HTTPException, BackgroundTasks
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
@@ -7,11 +13,189 @@ from fastapi.responses import (
     HTMLResponse,
     PlainTextResponse,
     JSONResponse,
+    Response,
+    StreamingResponse,
 )
-from search_engine import SearchEngine
+import metrics
+from admission import AdmissionMiddleware, ConcurrencyLimiter
+import fast_json
+from fast_json import FastJSONResponse
+from http_cache import HTTPCacheMiddleware, StaticPages
+from pydantic import BaseModel
+from rate_limit import TokenBucketLimiter
+from results import SearchResponse
+from search_engine import InvalidCursor, PageTooDeep, SearchEngine, SearchUnavailable
+import tracing
 import os
 
-app = FastAPI()
+
+INDEX_STATE_POLL_SECONDS = float(os.getenv("INDEX_STATE_POLL_SECONDS", 5))
+
+
+async def poll_index_state():
+    """Keep the search cache and corpus size in step with what the scraper has written."""
+    while True:
+        await asyncio.sleep(INDEX_STATE_POLL_SECONDS)
+        await asyncio.to_thread(search_engine.refresh_index_state)
+
+
+LATEST_REFRESH_SECONDS = float(os.getenv("LATEST_REFRESH_SECONDS", 300))
+LATEST_MIN_REFRESH_GAP = float(os.getenv("LATEST_MIN_REFRESH_GAP", 5))
+
+
+async def refresh_latest_feed():
+    """Rebuild the in-memory /latest snapshot on scraper NOTIFY or every LATEST_REFRESH_SECONDS."""
+    changed = asyncio.Event()
+    listener = await search_engine.listen_pages_changed(changed.set)
+    try:
+        while True:
+            try:
+                await search_engine.refresh_latest_snapshot_async()
+            except Exception as e:
+                print(f"Error refreshing latest posts: {e}")
+            with suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(changed.wait(), LATEST_REFRESH_SECONDS)
+            # Let a burst of saves from the scraper settle into one refresh
+            await asyncio.sleep(LATEST_MIN_REFRESH_GAP)
+            changed.clear()
+    finally:
+        if listener:
+            await listener.close()
+
+
+RANDOM_IDS_REFRESH_SECONDS = float(os.getenv("RANDOM_IDS_REFRESH_SECONDS", 60))
+
+
+async def refresh_random_sampler():
+    """Keep the /random id array current and its prefetched post pool topped up."""
+    next_ids_refresh = 0.0
+    while True:
+        try:
+            if time.monotonic() >= next_ids_refresh:
+                await search_engine.refresh_random_ids_async()
+                next_ids_refresh = time.monotonic() + RANDOM_IDS_REFRESH_SECONDS
+            await search_engine.prefetch_random_posts_async()
+        except Exception as e:
+            print(f"Error refreshing random posts: {e}")
+        await asyncio.sleep(1)
+
+
+SQLITE_REPLICA_REFRESH_SECONDS = float(os.getenv("SQLITE_REPLICA_REFRESH_SECONDS", 300))
+
+
+async def refresh_sqlite_replica():
+    """Keep the local SQLite search replica current with pages scraped since the last run."""
+    while True:
+        try:
+            started = time.monotonic()
+            written = await asyncio.to_thread(search_engine.refresh_replica)
+            if written:
+                print(f"SQLite replica: {written} pages in {time.monotonic() - started:.1f}s")
+        except Exception as e:
+            print(f"Error refreshing SQLite replica: {e}")
+        await asyncio.sleep(SQLITE_REPLICA_REFRESH_SECONDS)
+
+
+METRICS_PUBLISH_SECONDS = float(os.getenv("METRICS_PUBLISH_SECONDS", 5))
+
+
+async def publish_engine_metrics():
+    """With several workers, copy this worker's SearchEngine state into the shared metrics."""
+    while True:
+        try:
+            metrics.publish_engine(search_engine)
+        except Exception as e:
+            print(f"Error publishing engine metrics: {e}")
+        await asyncio.sleep(METRICS_PUBLISH_SECONDS)
+
+
+SUGGEST_REFRESH_SECONDS = float(os.getenv("SUGGEST_REFRESH_SECONDS", 600))
+
+
+async def refresh_suggestions():
+    """Rebuild the autocomplete trie from query_logs and page titles."""
+    while True:
+        try:
+            await asyncio.to_thread(search_engine.refresh_suggestions)
+        except Exception as e:
+            print(f"Error refreshing suggestions: {e}")
+        await asyncio.sleep(SUGGEST_REFRESH_SECONDS)
+
+
+def process_age() -> float | None:
+    """Seconds since this process started (Linux), so cold start includes interpreter start and imports."""
+    try:
+        with open("/proc/self/stat") as f:
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return max(0.0, uptime - start_ticks / os.sysconf("SC_CLK_TCK"))
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+STARTUP_RETRY_SECONDS = float(os.getenv("STARTUP_RETRY_SECONDS", 5))
+STARTUP = {"ready": False, "startup_seconds": None, "cold_start_seconds": None, "backends": {}}
+
+
+async def start_backends(tasks: list[asyncio.Task]):
+    """Connect the search backends, then start the loops that depend on them."""
+    started = time.perf_counter()
+    STARTUP["backends"] = await search_engine.startup()
+    STARTUP["startup_seconds"] = round(time.perf_counter() - started, 4)
+    metrics.STARTUP_SECONDS.labels("startup").set(STARTUP["startup_seconds"])
+    for name, report in STARTUP["backends"].items():
+        metrics.STARTUP_SECONDS.labels(name).set(report["seconds"])
+    print(
+        f"Backends started in {STARTUP['startup_seconds']:.3f}s: "
+        + ", ".join(
+            f"{name} {report['seconds']:.3f}s{'' if report['ok'] else ' (unavailable)'}"
+            for name, report in STARTUP["backends"].items()
+        )
+    )
+    while not search_engine.ready:
+        await asyncio.sleep(STARTUP_RETRY_SECONDS)
+        await search_engine.retry_startup()
+
+    age = process_age()
+    if age is not None:
+        STARTUP["cold_start_seconds"] = round(age, 3)
+        metrics.STARTUP_SECONDS.labels("cold_start").set(age)
+    STARTUP["ready"] = True
+    print(f"Ready; cold start {STARTUP['cold_start_seconds']}s after process start")
+
+    tasks.extend(
+        [
+            asyncio.create_task(poll_index_state()),
+            asyncio.create_task(refresh_latest_feed()),
+            asyncio.create_task(refresh_random_sampler()),
+            asyncio.create_task(refresh_suggestions()),
+        ]
+    )
+    if search_engine.replica_exporter and SQLITE_REPLICA_REFRESH_SECONDS > 0:
+        tasks.append(asyncio.create_task(refresh_sqlite_replica()))
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Serve (and answer /healthz) immediately; /readyz reports when the backends are up
+    tasks: list[asyncio.Task] = []
+    tasks.append(asyncio.create_task(start_backends(tasks)))
+    if metrics.MULTIPROCESS:
+        tasks.append(asyncio.create_task(publish_engine_metrics()))
+    yield
+    for task in tasks:
+        task.cancel()
+    for task in tasks:
+        with suppress(asyncio.CancelledError):
+            await task
+    await search_engine.close_async()
+    tracing.shutdown()
+    metrics.process_exited()
+
+
+tracing.configure_from_env()
+app = FastAPI(lifespan=lifespan)
 templates_path = os.path.join(os.path.dirname(__file__), "templates")
 templates = Jinja2Templates(directory=templates_path)
 static_path = os.path.join(os.path.dirname(__file__), "static")
@@ -19,44 +203,91 @@ app.mount("/static", StaticFiles(directory=static_path), name="static")
 search_engine = SearchEngine()
 
 
-@app.get("/", response_class=HTMLResponse)
-async def home(request: Request):
-    return templates.TemplateResponse(
-        "index.html", {"request": request, "posts_size": search_engine.size}
-    )
+def client_ip(request: Request) -> str:
+    """Who is asking, for rate limits and the query log.
 
+    The last X-Forwarded-For entry is the one our proxy appended; earlier entries come
+    from the client and can be anything.
+    """
+    forwarded = request.headers.get("X-Forwarded-For", "").split(",")[-1].strip()
+    if forwarded:
+        return forwarded
+    return request.client.host if request.client else ""
 
-@app.get("/about", response_class=HTMLResponse)
-async def api(request: Request):
-    return templates.TemplateResponse(
-        "about.html",
-        {
-            "request": request,
-            "posts_size": search_engine.size,
-        },
-    )
 
+# Searches admitted per route at once, and how many more may wait (briefly) for a slot
+SEARCH_CONCURRENCY = int(os.getenv("SEARCH_CONCURRENCY", 16))
+SEARCH_QUEUE_SIZE = int(os.getenv("SEARCH_QUEUE_SIZE", 32))
+SEARCH_QUEUE_TIMEOUT = float(os.getenv("SEARCH_QUEUE_TIMEOUT", 0.5))
+search_limiters = {
+    path: ConcurrencyLimiter(path, SEARCH_CONCURRENCY, SEARCH_QUEUE_SIZE, SEARCH_QUEUE_TIMEOUT)
+    for path in ("/search", "/api/search", "/api/msearch")
+}
+search_client_limiter = TokenBucketLimiter(
+    rate=float(os.getenv("SEARCH_RATE_PER_SECOND", 5)),
+    burst=float(os.getenv("SEARCH_BURST", 20)),
+)
+# Innermost of the three: conditional GETs answered from the cache are never shed
+app.add_middleware(
+    AdmissionMiddleware,
+    limiters=search_limiters,
+    client_limiter=search_client_limiter,
+    client_key=client_ip,
+)
 
-@app.get("/api", response_class=HTMLResponse)
-async def about(request: Request):
-    return templates.TemplateResponse(
-        "api.html",
-        {
-            "request": request,
-            "posts_size": search_engine.size,
-        },
-    )
+# Pages whose only dynamic content is the corpus size; HTTPCacheMiddleware serves them
+STATIC_PAGES = {
+    "/": "index.html",
+    "/about": "about.html",
+    "/api": "api.html",
+    "/bot": "bot.html",
+}
+app.add_middleware(
+    HTTPCacheMiddleware,
+    pages=StaticPages(templates.env, STATIC_PAGES),
+    posts_size=lambda: search_engine.size,
+    generation=lambda: search_engine.cache.generation,
+    page_max_age=int(os.getenv("HTTP_PAGE_MAX_AGE", 300)),
+    search_max_age=int(os.getenv("HTTP_SEARCH_MAX_AGE", 30)),
+)
+# Times what HTTPCacheMiddleware answers itself
+app.add_middleware(
+    metrics.MetricsMiddleware,
+    known_paths=[*STATIC_PAGES, *search_limiters],
+    known_prefixes=("/static",),
+)
+# Outermost, so a trace's root span covers the whole request including shedding
+app.add_middleware(tracing.TracingMiddleware)
+metrics.register_engine(search_engine)
 
 
-@app.get("/bot", response_class=HTMLResponse)
-async def bot(request: Request):
-    return templates.TemplateResponse(
-        "bot.html",
+def render_template(name: str, context: dict) -> HTMLResponse:
+    start = time.perf_counter()
+    with tracing.span("render", template=name):
+        response = templates.TemplateResponse(context["request"], name, context)
+    metrics.observe_template(name, time.perf_counter() - start)
+    return response
+
+
+# Seconds a client is asked to wait when a page only PostgreSQL can serve is unavailable
+DATABASE_RETRY_AFTER = 5
+
+
+def database_unavailable(request: Request, query: str = "") -> HTMLResponse:
+    """An empty results page with a 503, for /latest, /random and use_postgres searches."""
+    response = render_template(
+        "search.html",
         {
             "request": request,
+            "results": [],
+            "query": query,
+            "unavailable": True,
             "posts_size": search_engine.size,
         },
     )
+    response.status_code = 503
+    response.headers["Retry-After"] = str(DATABASE_RETRY_AFTER)
+    return response
 
 
 @app.get("/search", response_class=HTMLResponse)
@@ -71,14 +302,14 @@ async def search_page(
     search_time = 0
 
     if not query:
-        return templates.TemplateResponse(
+        return render_template(
             "index.html", {"request": request, "posts_size": search_engine.size}
         )
 
     background_tasks.add_task(
-        search_engine.log_query,
+        tracing.bind(search_engine.log_query),
         query=query,
-        ip_address=request.headers.get("X-Forwarded-For", request.client.host),
+        ip_address=client_ip(request),
         user_agent=request.headers.get("user-agent", ""),
     )
 
@@ -86,7 +317,11 @@ async def search_page(
     search_mode = request.query_params.get("search_mode", "keyword").lower()
     if use_postgres:
         start_time = time.time()
-        results = search_engine.search(query)
+        try:
+            results = await search_engine.search_async(query)
+        except Exception as e:
+            print(f"PostgreSQL search error: {e}")
+            return database_unavailable(request, query)
         end_time = time.time()
         search_time = round(end_time - start_time, 2)
         response = {
@@ -94,16 +329,20 @@ async def search_page(
             "page": 1,
             "per_page": len(results),
             "total_pages": 1,
+            "backend": "postgres",
         }
     else:
-        if search_mode == "keyword":
-            response = search_engine.search_elasticsearch(query, page=page)
-        else:
-            response = search_engine.search_elasticsearch_hybrid(query, page=page)
+        try:
+            if search_mode == "keyword":
+                response = await search_engine.search_elasticsearch_async(query, page=page)
+            else:
+                response = await search_engine.search_elasticsearch_hybrid_async(query, page=page)
+        except PageTooDeep as e:
+            raise HTTPException(status_code=400, detail=str(e))
         search_time = round(response.get("search_time", 0) / 1000, 2)
         results = response.get("results", [])
 
-    return templates.TemplateResponse(
+    return render_template(
         "search.html",
         {
             "request": request,
@@ -111,8 +350,10 @@ async def search_page(
             "query": query,
             "time": search_time,
             "results_size": response.get("results_size", len(results)),
+            "results_size_relation": response.get("results_size_relation", "eq"),
             "page": response.get("page", 1),
             "total_pages": response.get("total_pages", 1),
+            "backend": response.get("backend"),
             "posts_size": search_engine.size,
         },
     )
@@ -121,9 +362,13 @@ async def search_page(
 @app.get("/latest", response_class=HTMLResponse)
 async def latest(request: Request, page: int = Query(1, ge=1)):
     start_time = time.time()
-    response = search_engine.get_latest_posts(page=page)
+    try:
+        response = await search_engine.get_latest_posts_async(page=page)
+    except Exception as e:
+        print(f"Error loading latest posts: {e}")
+        return database_unavailable(request)
     search_time = round(time.time() - start_time, 2)
-    return templates.TemplateResponse(
+    return render_template(
         "search.html",
         {
             "request": request,
@@ -141,9 +386,13 @@ async def latest(request: Request, page: int = Query(1, ge=1)):
 @app.get("/random", response_class=HTMLResponse)
 async def random(request: Request):
     start_time = time.time()
-    result = search_engine.get_random_post()
+    try:
+        result = await search_engine.get_random_post_async()
+    except Exception as e:
+        print(f"Error loading a random post: {e}")
+        return database_unavailable(request)
     search_time = round(time.time() - start_time, 2)
-    return templates.TemplateResponse(
+    return render_template(
         "search.html",
         {
             "request": request,
@@ -159,31 +408,222 @@ async def random(request: Request):
 
 
 @app.get("/api/search", response_class=JSONResponse)
-async def api_search(q: str = Query(...), page: int = Query(1, ge=1)):
+async def api_search(
+    q: str = Query(...),
+    page: int = Query(1, ge=1),
+    cursor: str | None = Query(None),
+    exact_total: bool = Query(False),
+):
     query = q.strip() if q else None
     if not query:
         return JSONResponse({"results": [], "total": 0, "page": 1, "total_pages": 0})
 
-    try:
-        response = search_engine.search_elasticsearch(query, page=page)
-        return JSONResponse({
-            "results": response.get("results", []),
-            "total": response.get("results_size", 0),
-            "page": response.get("page", 1),
-            "total_pages": response.get("total_pages", 0),
+    if cursor:
+        try:
+            response = await search_engine.search_elasticsearch_cursor_async(
+                query, cursor=cursor, exact_total=exact_total
+            )
+        except InvalidCursor as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except SearchUnavailable as e:
+            raise HTTPException(
+                status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after or 1)}
+            )
+        except Exception as e:
+            print(f"An error occurred: {str(e)}")
+            raise HTTPException(status_code=500, detail="Internal server error: " + str(e))
+        return FastJSONResponse({
+            "results": response["results"],
+            "total": response["total"],
+            "total_relation": response["total_relation"],
+            "next_cursor": response["next_cursor"],
+            "backend": "elasticsearch",
         })
+
+    try:
+        response = await search_engine.search_elasticsearch_async(
+            query, page=page, exact_total=exact_total
+        )
+        headers = None
+        if response.get("backend") != "elasticsearch":
+            # Fallback results must not be revalidated against the ES index generation
+            headers = {"Cache-Control": "no-store"}
+        return FastJSONResponse(api_search_payload(response), headers=headers)
+    except PageTooDeep as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         print(f"An error occurred: {str(e)}")
         raise HTTPException(status_code=500, detail="Internal server error: " + str(e))
 
 
+def api_search_payload(response: dict) -> SearchResponse | dict:
+    if "error" in response:
+        return {"error": response["error"]}
+    return SearchResponse(
+        results=response.get("results", []),
+        total=response.get("results_size", 0),
+        total_relation=response.get("results_size_relation", "eq"),
+        page=response.get("page", 1),
+        total_pages=response.get("total_pages", 0),
+        backend=response.get("backend"),
+    )
+
+
+MSEARCH_MAX_QUERIES = int(os.getenv("MSEARCH_MAX_QUERIES", 20))
+
+
+class MSearchQuery(BaseModel):
+    q: str
+    page: int = 1
+    size: int = SearchEngine.DEFAULT_PER_PAGE
+
+
+class MSearchRequest(BaseModel):
+    queries: list[MSearchQuery]
+
+
+@app.post("/api/msearch", response_class=JSONResponse)
+async def api_msearch(request: Request, body: MSearchRequest):
+    if len(body.queries) > MSEARCH_MAX_QUERIES:
+        raise HTTPException(
+            status_code=413, detail=f"At most {MSEARCH_MAX_QUERIES} queries per request"
+        )
+    # A batch costs one search token per query; AdmissionMiddleware already took the first
+    extra = min(len(body.queries), search_client_limiter.burst) - 1
+    wait = search_client_limiter.acquire(client_ip(request), cost=extra) if extra > 0 else 0
+    if wait:
+        metrics.SHED_REQUESTS.labels("/api/msearch", "rate_limited").inc()
+        raise HTTPException(
+            status_code=429,
+            detail="Too many searches; slow down",
+            headers={"Retry-After": str(math.ceil(wait))},
+        )
+    try:
+        responses = await search_engine.msearch_async(
+            [(item.q.strip(), item.page, item.size) for item in body.queries]
+        )
+    except Exception as e:
+        print(f"An error occurred: {str(e)}")
+        raise HTTPException(status_code=500, detail="Internal server error: " + str(e))
+    return FastJSONResponse({"responses": [api_search_payload(r) for r in responses]})
+
+
+EXPORT_MAX_ROWS = int(os.getenv("EXPORT_MAX_ROWS", 10000))
+export_limiter = TokenBucketLimiter(
+    rate=float(os.getenv("EXPORT_RATE_PER_MINUTE", 6)) / 60,
+    burst=float(os.getenv("EXPORT_BURST", 2)),
+)
+
+
+@app.get("/api/export")
+async def api_export(
+    request: Request,
+    q: str = Query(...),
+    limit: int = Query(EXPORT_MAX_ROWS, ge=1),
+):
+    query = q.strip()
+    if not query:
+        raise HTTPException(status_code=400, detail="q is required")
+    wait = export_limiter.acquire(client_ip(request))
+    if wait:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many exports; try again later",
+            headers={"Retry-After": str(math.ceil(wait))},
+        )
+
+    batches = search_engine.export_async(query, max_rows=min(limit, EXPORT_MAX_ROWS))
+    try:
+        # Fetch the first batch before answering so an outage is a 503, not a truncated 200
+        first = await anext(batches, None)
+    except SearchUnavailable as e:
+        raise HTTPException(
+            status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after or 1)}
+        )
+
+    async def ndjson():
+        batch = first
+        try:
+            while batch is not None:
+                yield b"".join(fast_json.dumps(row) + b"\n" for row in batch)
+                batch = await anext(batches, None)
+        except Exception as e:
+            print(f"Export error: {e}")
+            yield fast_json.dumps({"error": "export interrupted"}) + b"\n"
+        finally:
+            await batches.aclose()
+
+    return StreamingResponse(
+        ndjson(),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="export.ndjson"'},
+    )
+
+
+@app.get("/api/suggest", response_class=JSONResponse)
+async def api_suggest(
+    q: str = Query(""),
+    limit: int = Query(SearchEngine.SUGGEST_LIMIT, ge=1, le=SearchEngine.SUGGEST_LIMIT),
+):
+    return JSONResponse(
+        {"q": q, "suggestions": search_engine.suggest(q, limit)},
+        headers={"Cache-Control": "public, max-age=60"},
+    )
+
+
+@app.get("/api/stats", response_class=JSONResponse)
+async def api_stats():
+    return JSONResponse(
+        {
+            "cache": search_engine.cache.stats(),
+            "coalescing": search_engine.inflight.stats(),
+            "query_log": search_engine.query_log.stats(),
+            "random": search_engine.random_sampler.stats(),
+            "hybrid_latency": search_engine.hybrid_latency,
+            "suggestions": search_engine.suggestions.stats(),
+            "export_limiter": export_limiter.stats(),
+            "admission": {
+                "clients": search_client_limiter.stats(),
+                "routes": {path: limiter.stats() for path, limiter in search_limiters.items()},
+            },
+            "elasticsearch_breaker": search_engine.es_breaker.stats(),
+            "search_fallbacks": list(search_engine.search_fallbacks),
+            "startup": STARTUP,
+        }
+    )
+
+
+@app.get("/healthz")
+async def healthz():
+    """Liveness: the process is up and serving; says nothing about the backends."""
+    return JSONResponse({"status": "ok"})
+
+
+@app.get("/readyz")
+async def readyz():
+    """Readiness: startup finished and PostgreSQL is reachable."""
+    return JSONResponse(STARTUP, status_code=200 if STARTUP["ready"] else 503)
+
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    body, content_type = metrics.exposition()
+    return Response(body, media_type=content_type)
+
+
 @app.get("/robots.txt", response_class=PlainTextResponse)
 async def robots():
     return """User-agent: *
 Disallow: /search
 Disallow: /api/search
+Disallow: /api/msearch
+Disallow: /api/export
+Disallow: /api/suggest
 Disallow: /latest
 Disallow: /random
+Disallow: /metrics
+Disallow: /healthz
+Disallow: /readyz
 """
 
 
@@ -195,4 +635,21 @@ async def favicon():
 if __name__ == "__main__":
     import uvicorn  # type: ignore
 
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    workers = int(os.getenv("WEB_CONCURRENCY", 1))
+    if workers > 1:
+        # This process only supervises; each worker imports server:app and starts its own backends
+        # Workers must agree on the cursor signing key, so share one if none is configured
+        os.environ.setdefault("CURSOR_SECRET", secrets.token_hex(32))
+        # Each worker has its own metrics registry; /metrics aggregates them through files
+        if not os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+            os.environ["PROMETHEUS_MULTIPROC_DIR"] = tempfile.mkdtemp(prefix="blogsearch-metrics-")
+        metrics.clear_multiprocess_dir(os.environ["PROMETHEUS_MULTIPROC_DIR"])
+        # Hand over to the uvicorn CLI: spawned workers re-run the main module, and this
+        # one would build a second SearchEngine in each of them
+        os.execv(
+            sys.executable,
+            [sys.executable, "-m", "uvicorn", "server:app", "--host", "0.0.0.0", "--port", "8000",
+             "--workers", str(workers)],
+        )
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,66 @@
+"""
+Request coalescing for identical in-flight searches.
+Concurrent callers with the same key share one backend call instead of each making
+their own, which matters most when a trending query arrives many times at once.
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Hashable
+
+import tracing
+
+
+class SingleFlight:
+    """At most one call per key in flight; everyone asking meanwhile awaits that call.
+
+    The call runs as its own task, so a caller that disconnects does not cancel it for
+    the rest. Each caller waits at most `timeout` seconds; a call still running then is
+    forgotten, so the next caller starts a fresh one instead of queueing behind it.
+    Results and errors go only to the callers that were waiting: a finished call is
+    removed at once and nothing about it is remembered (caching is SearchCache's job).
+    """
+
+    def __init__(self, timeout: float = 5.0):
+        self.timeout = timeout
+        self._calls: dict[Hashable, asyncio.Task] = {}
+        self.calls = 0
+        self.coalesced = 0
+        self.timeouts = 0
+        self.errors = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Await fn() for key, joining a call already in flight; raises asyncio.TimeoutError."""
+        call = self._calls.get(key)
+        joined = call is not None
+        if call is None:
+            call = asyncio.ensure_future(fn())
+            self._calls[key] = call
+            call.add_done_callback(lambda done: self._finished(key, done))
+            self.calls += 1
+        else:
+            self.coalesced += 1
+        # A joined caller's trace has no backend spans; they are in the first caller's trace
+        tracing.annotate(**{"singleflight.joined": joined})
+        try:
+            return await asyncio.wait_for(asyncio.shield(call), self.timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            if self._calls.get(key) is call:
+                del self._calls[key]
+            raise
+
+    def _finished(self, key: Hashable, call: asyncio.Task) -> None:
+        if self._calls.get(key) is call:
+            del self._calls[key]
+        # Mark the outcome retrieved even if every caller already gave up on it
+        if not call.cancelled() and call.exception() is not None:
+            self.errors += 1
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "in_flight": len(self._calls),
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "timeouts": self.timeouts,
+            "errors": self.errors,
+        }
@@ -0,0 +1,317 @@
+"""
+Local SQLite FTS5 replica of the pages table.
+The exporter copies title, url, date and a snippet from PostgreSQL, incrementally by
+scraped_on_date; the backend serves paginated search from the file read-only and
+memory-mapped, so a web node can keep answering queries while Elasticsearch is down.
+
+Usage: python sqlite_replica.py [--full] [path]
+"""
+
+import fcntl
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any
+
+from blog_search.sites import host_sites, normalize_site, url_host
+
+from pages import WATERMARK_OVERLAP, truncate_text
+from results import SearchResult
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS docs (
+    id INTEGER PRIMARY KEY,
+    title TEXT,
+    url TEXT,
+    domain TEXT,
+    site TEXT,
+    date TEXT,
+    snippet TEXT
+);
+CREATE INDEX IF NOT EXISTS docs_domain_idx ON docs (domain);
+CREATE INDEX IF NOT EXISTS docs_site_idx ON docs (site);
+CREATE INDEX IF NOT EXISTS docs_date_idx ON docs (date);
+CREATE VIRTUAL TABLE IF NOT EXISTS docs_fts USING fts5(
+    title, snippet, content='docs', content_rowid='id', tokenize='porter unicode61'
+);
+CREATE TRIGGER IF NOT EXISTS docs_ai AFTER INSERT ON docs BEGIN
+    INSERT INTO docs_fts (rowid, title, snippet) VALUES (new.id, new.title, new.snippet);
+END;
+CREATE TRIGGER IF NOT EXISTS docs_ad AFTER DELETE ON docs BEGIN
+    INSERT INTO docs_fts (docs_fts, rowid, title, snippet) VALUES ('delete', old.id, old.title, old.snippet);
+END;
+CREATE TRIGGER IF NOT EXISTS docs_au AFTER UPDATE ON docs BEGIN
+    INSERT INTO docs_fts (docs_fts, rowid, title, snippet) VALUES ('delete', old.id, old.title, old.snippet);
+    INSERT INTO docs_fts (rowid, title, snippet) VALUES (new.id, new.title, new.snippet);
+END;
+"""
+
+UPSERT_SQL = """
+INSERT INTO docs (id, title, url, domain, site, date, snippet) VALUES (?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (id) DO UPDATE SET
+    title = excluded.title, url = excluded.url, domain = excluded.domain,
+    site = excluded.site, date = excluded.date, snippet = excluded.snippet
+"""
+
+PG_EXPORT_SQL = """
+    SELECT id, title, url, date, LEFT(text, 1500), scraped_on_date
+    FROM pages
+    WHERE scraped_on_date > %s
+"""
+
+EPOCH = datetime.fromisoformat("1970-01-01T00:00:00+00:00")
+
+# PRAGMA user_version of the file layout above; a file from another version is rebuilt
+SCHEMA_VERSION = 2
+
+
+class SQLiteReplicaExporter:
+    """Builds and incrementally refreshes the replica file from PostgreSQL."""
+
+    def __init__(self, db, path: str, batch_size: int = 1000):
+        self.db = db
+        self.path = path
+        self.batch_size = batch_size
+
+    def _open(self, path: str) -> sqlite3.Connection:
+        conn = sqlite3.connect(path)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(SCHEMA)
+        return conn
+
+    def _current(self) -> bool:
+        if not os.path.exists(self.path):
+            return False
+        conn = sqlite3.connect(self.path)
+        try:
+            return conn.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION
+        finally:
+            conn.close()
+
+    @contextmanager
+    def _exclusive(self):
+        """Hold the replica's lock file; yields False if another process already holds it.
+
+        Every web worker on a host shares the same replica file, so only one of them
+        exports at a time; the others skip that round and keep serving the file.
+        """
+        fd = os.open(f"{self.path}.lock", os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                yield False
+                return
+            yield True
+        finally:
+            os.close(fd)  # releases the lock
+
+    def sync(self, full: bool = False) -> int:
+        """Full build the first time (or when asked, or after a layout change), incremental
+        after; returns rows written.
+
+        Returns 0 without touching the file while another process is exporting.
+        """
+        with self._exclusive() as owner:
+            if not owner:
+                return 0
+            if full or not self._current():
+                return self.rebuild()
+            return self.refresh()
+
+    def refresh(self) -> int:
+        """Copy pages scraped since the stored watermark; returns rows written."""
+        conn = self._open(self.path)
+        try:
+            row = conn.execute("SELECT value FROM meta WHERE key = 'watermark'").fetchone()
+            watermark = datetime.fromisoformat(row[0]) if row else EPOCH
+            return self._copy(conn, watermark)
+        finally:
+            conn.close()
+
+    def rebuild(self) -> int:
+        """Write a fresh file beside the current one and swap it in atomically."""
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        self._remove(tmp_path)
+        try:
+            conn = self._open(tmp_path)
+            try:
+                written = self._copy(conn, EPOCH)
+                conn.execute("INSERT INTO docs_fts (docs_fts) VALUES ('optimize')")
+                conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+                conn.commit()
+                conn.execute("PRAGMA journal_mode=DELETE")
+            finally:
+                conn.close()
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            self._remove(tmp_path)
+            raise
+        return written
+
+    @staticmethod
+    def _remove(path: str) -> None:
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+
+    def _copy(self, conn: sqlite3.Connection, watermark: datetime) -> int:
+        since = watermark - WATERMARK_OVERLAP if watermark > EPOCH else watermark
+        newest = watermark
+        written = 0
+        pg = self.db.get_connection()
+        try:
+            with pg.cursor(name="sqlite_replica_export") as cursor:
+                cursor.itersize = self.batch_size
+                cursor.execute(PG_EXPORT_SQL, (since,))
+                while True:
+                    rows = cursor.fetchmany(self.batch_size)
+                    if not rows:
+                        break
+                    docs = []
+                    for page_id, title, url, date, text, _ in rows:
+                        sites = host_sites(url_host(url)) or ("",)
+                        docs.append(
+                            (
+                                page_id,
+                                title or "",
+                                (url or "").rstrip("/"),
+                                sites[0],
+                                sites[-1],
+                                date.isoformat() if date else None,
+                                truncate_text(text),
+                            )
+                        )
+                    conn.executemany(UPSERT_SQL, docs)
+                    newest = max([newest] + [r[5] for r in rows if r[5]])
+                    written += len(rows)
+                    conn.commit()
+            pg.commit()
+        finally:
+            self.db.release(pg)
+        conn.execute(
+            "INSERT INTO meta (key, value) VALUES ('watermark', ?) "
+            "ON CONFLICT (key) DO UPDATE SET value = excluded.value",
+            (newest.isoformat(),),
+        )
+        conn.commit()
+        return written
+
+
+class SQLiteSearchBackend:
+    """Read-only, memory-mapped FTS5 search over the replica file.
+
+    Each thread keeps its own connection; connections are reopened when the file is
+    swapped by a rebuild. Responses have the same shape as SearchEngine's ES responses.
+    """
+
+    TOTAL_HITS_CAP = 10000
+    TOKEN_PATTERN = re.compile(r"\w+")
+
+    def __init__(self, path: str, mmap_size: int = 256 * 1024 * 1024):
+        self.path = path
+        self.mmap_size = mmap_size
+        self._local = threading.local()
+
+    def available(self) -> bool:
+        return os.path.exists(self.path)
+
+    def _connection(self) -> sqlite3.Connection:
+        inode = os.stat(self.path).st_ino
+        local = self._local
+        if getattr(local, "inode", None) != inode:
+            if getattr(local, "conn", None):
+                local.conn.close()
+            conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+            conn.execute(f"PRAGMA mmap_size={int(self.mmap_size)}")
+            local.conn, local.inode = conn, inode
+        return local.conn
+
+    @classmethod
+    def _match_expression(cls, clean_query: str) -> str:
+        """Quoted phrases stay phrases; every other word becomes a quoted FTS5 term (AND)."""
+        terms = []
+        for phrase in re.findall(r'"([^"]+)"', clean_query):
+            words = cls.TOKEN_PATTERN.findall(phrase)
+            if words:
+                terms.append('"' + " ".join(words) + '"')
+        rest = re.sub(r'"[^"]*"', " ", clean_query)
+        terms.extend(f'"{word}"' for word in cls.TOKEN_PATTERN.findall(rest))
+        return " ".join(terms)
+
+    @staticmethod
+    def _site_clause(site_domains: list[str]) -> tuple[str, list[str]]:
+        """The same match as the site_domains terms filter in Elasticsearch: host or site."""
+        sites = sorted({normalize_site(d) for d in site_domains} - {""})
+        if not sites:
+            return "", []
+        marks = ", ".join("?" * len(sites))
+        return f" AND (d.domain IN ({marks}) OR d.site IN ({marks}))", sites + sites
+
+    def search(self, clean_query: str, site_domains: list[str], page: int, per_page: int) -> dict[str, Any]:
+        start = time.perf_counter()
+        conn = self._connection()
+        site_sql, site_params = self._site_clause(site_domains)
+        match = self._match_expression(clean_query)
+        offset = (page - 1) * per_page
+
+        if match:
+            base = f"FROM docs_fts JOIN docs d ON d.id = docs_fts.rowid WHERE docs_fts MATCH ?{site_sql}"
+            params = [match, *site_params]
+            order = "ORDER BY bm25(docs_fts, 2.0, 1.0)"
+        elif site_sql:
+            base = f"FROM docs d WHERE 1{site_sql}"
+            params = site_params
+            order = "ORDER BY d.date DESC"
+        else:
+            return self._response([], 0, page, per_page, start)
+
+        rows = conn.execute(
+            f"SELECT d.title, d.url, d.date, d.snippet {base} {order} LIMIT ? OFFSET ?",
+            [*params, per_page, offset],
+        ).fetchall()
+        total = conn.execute(
+            f"SELECT count(*) FROM (SELECT 1 {base} LIMIT ?)", [*params, self.TOTAL_HITS_CAP + 1]
+        ).fetchone()[0]
+        results = [SearchResult(*r) for r in rows]
+        return self._response(results, total, page, per_page, start)
+
+    def _response(self, results, total, page, per_page, start) -> dict[str, Any]:
+        capped = total > self.TOTAL_HITS_CAP
+        total = min(total, self.TOTAL_HITS_CAP)
+        return {
+            "results": results,
+            "results_size": total,
+            "results_size_relation": "gte" if capped else "eq",
+            "search_time": round((time.perf_counter() - start) * 1000),
+            "page": page,
+            "per_page": per_page,
+            "total_pages": (total + per_page - 1) // per_page if total else 0,
+        }
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+
+    from search_engine import DatabasePool
+
+    load_dotenv()
+    args = sys.argv[1:]
+    full = "--full" in args
+    args = [a for a in args if a != "--full"]
+    path = args[0] if args else os.getenv("SQLITE_REPLICA_PATH", "replica.sqlite3")
+
+    db = DatabasePool()
+    try:
+        exporter = SQLiteReplicaExporter(db, path)
+        started = time.perf_counter()
+        written = exporter.sync(full=full)
+        print(f"Exported {written} pages to {path} in {time.perf_counter() - started:.1f}s")
+    finally:
+        db.close()
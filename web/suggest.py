@@ -0,0 +1,122 @@
+"""
+Query autocomplete for /api/suggest.
+An immutable compressed (radix) trie over popular queries and page titles; every node
+stores its best completions, so a lookup is one walk down the prefix and no search.
+"""
+
+import os
+import time
+from typing import Any, Iterable
+
+
+class _Node:
+    __slots__ = ("edges", "entry", "top")
+
+    def __init__(self):
+        # first character of the edge label -> (label, child)
+        self.edges: dict[str, tuple[str, "_Node"]] = {}
+        self.entry: tuple[float, str] | None = None
+        self.top: tuple[tuple[float, str], ...] = ()
+
+
+class SuggestionIndex:
+    """Prefix -> top-N completions by weight, built once and swapped in whole.
+
+    Keys are lowercased with whitespace collapsed; the first spelling seen for a key is
+    what gets suggested. Duplicate keys add their weights together.
+    """
+
+    MAX_KEY_LENGTH = 80
+
+    def __init__(self, limit: int = 10):
+        self.limit = limit
+        self.root = _Node()
+        self.terms = 0
+        self.nodes = 1
+        self.built_at: float | None = None
+        self.build_ms = 0.0
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        return " ".join(text.lower().split())
+
+    @classmethod
+    def build(cls, entries: Iterable[tuple[str, float]], limit: int = 10) -> "SuggestionIndex":
+        start = time.perf_counter()
+        merged: dict[str, tuple[float, str]] = {}
+        for text, weight in entries:
+            display = " ".join((text or "").split())[: cls.MAX_KEY_LENGTH]
+            key = display.lower()
+            if not key:
+                continue
+            previous = merged.get(key)
+            merged[key] = (previous[0] + weight, previous[1]) if previous else (weight, display)
+
+        index = cls(limit)
+        for key, entry in merged.items():
+            index._insert(key, entry)
+        index._finalize(index.root)
+        index.terms = len(merged)
+        index.built_at = time.time()
+        index.build_ms = round((time.perf_counter() - start) * 1000, 1)
+        return index
+
+    def _insert(self, key: str, entry: tuple[float, str]) -> None:
+        node, i = self.root, 0
+        while i < len(key):
+            edge = node.edges.get(key[i])
+            if edge is None:
+                leaf = _Node()
+                leaf.entry = entry
+                node.edges[key[i]] = (key[i:], leaf)
+                self.nodes += 1
+                return
+            label, child = edge
+            common = len(os.path.commonprefix([label, key[i:]]))
+            if common < len(label):
+                # Split the edge at the first differing character
+                middle = _Node()
+                middle.edges[label[common]] = (label[common:], child)
+                node.edges[key[i]] = (label[:common], middle)
+                self.nodes += 1
+                child = middle
+            node, i = child, i + common
+        node.entry = entry
+
+    def _finalize(self, node: _Node) -> tuple[tuple[float, str], ...]:
+        candidates = [node.entry] if node.entry else []
+        for _, child in node.edges.values():
+            candidates.extend(self._finalize(child))
+        candidates.sort(key=lambda e: (-e[0], e[1]))
+        node.top = tuple(candidates[: self.limit])
+        return node.top
+
+    def lookup(self, prefix: str, limit: int | None = None) -> list[str]:
+        key = self.normalize(prefix)
+        if not key:
+            return []
+        if prefix[-1].isspace():
+            # A finished word: "rust " completes to "rust async", not "rusty"
+            key += " "
+        node, i = self.root, 0
+        while i < len(key):
+            edge = node.edges.get(key[i])
+            if edge is None:
+                return []
+            label, child = edge
+            if key.startswith(label, i):
+                i += len(label)
+            elif not label.startswith(key[i:]):
+                return []
+            else:
+                i = len(key)
+            node = child
+        return [display for _, display in node.top[: limit or self.limit]]
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "terms": self.terms,
+            "nodes": self.nodes,
+            "build_ms": self.build_ms,
+            "built_at": self.built_at,
+        }
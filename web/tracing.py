@@ -0,0 +1,322 @@
+"""
+Span-based request tracing for the web tier.
+A sampled request records a tree of timed spans (route, parse, backend calls, pool
+waits, formatting, rendering) and hands each finished span to an exporter. The current
+span lives in a contextvar, so it follows awaits, tasks and asyncio.to_thread; an
+unsampled request pays one contextvar lookup per instrumented call.
+
+Configuration:
+  TRACE_EXPORTER     none (default), stdout, file, or module:factory for a custom exporter
+  TRACE_FILE         JSON-lines output for the file exporter (default traces.jsonl)
+  TRACE_SAMPLE_RATE  fraction of requests to trace (default 1.0 once an exporter is set)
+  TRACE_TRUST_PARENT true to follow an incoming W3C traceparent header's sampled flag instead
+                     of TRACE_SAMPLE_RATE; only for deployments behind a trusted proxy, as any
+                     client can send the header (default false: it is only used to join the trace)
+"""
+
+import asyncio
+import importlib
+import os
+import random
+import sys
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, Callable, Protocol
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+import fast_json
+from forking import run_in_child
+
+
+class Span:
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "start_ns", "end_ns", "attributes", "error")
+
+    def __init__(self, name: str, trace_id: str, parent_id: str | None, attributes: dict[str, Any]):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = random.getrandbits(64).to_bytes(8, "big").hex()
+        self.parent_id = parent_id
+        self.start_ns = time.time_ns()
+        self.end_ns: int | None = None
+        self.attributes = attributes
+        self.error: str | None = None
+
+    def set(self, **attributes: Any) -> None:
+        self.attributes.update(attributes)
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_unix_nano": self.start_ns,
+            "duration_ms": round(((self.end_ns or self.start_ns) - self.start_ns) / 1e6, 3),
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+class SpanExporter(Protocol):
+    def export(self, span: dict[str, Any]) -> None: ...
+
+    def shutdown(self) -> None: ...
+
+
+class JsonLinesExporter:
+    """Writes one JSON object per span. Lines are written whole with a single write()
+    per flush, so several worker processes can append to the same file. A background
+    thread flushes every FLUSH_SECONDS, so spans reach the file at any traffic level."""
+
+    FLUSH_SECONDS = 1.0
+
+    def __init__(self, fd: int, close_fd: bool = False):
+        self.fd = fd
+        self.close_fd = close_fd
+        self._lines: list[bytes] = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        run_in_child(self._after_fork)
+
+    def _after_fork(self):
+        # Unflushed lines are the parent's to write; the child starts its own flusher.
+        self._lines = []
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @classmethod
+    def to_file(cls, path: str) -> "JsonLinesExporter":
+        return cls(os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644), close_fd=True)
+
+    def export(self, span: dict[str, Any]) -> None:
+        line = fast_json.dumps(span) + b"\n"
+        with self._lock:
+            self._lines.append(line)
+            if self._thread is None and not self._stop.is_set():
+                self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.FLUSH_SECONDS):
+            self.flush()
+
+    def flush(self) -> None:
+        with self._lock:
+            self._flush()
+
+    def _flush(self) -> None:
+        if self._lines and not self._stop.is_set():
+            os.write(self.fd, b"".join(self._lines))
+        self._lines.clear()
+
+    def shutdown(self) -> None:
+        with self._lock:
+            self._flush()
+            self._stop.set()
+            if self.close_fd:
+                os.close(self.fd)
+                self.close_fd = False
+
+
+_current: ContextVar[Span | None] = ContextVar("current_span", default=None)
+_exporter: SpanExporter | None = None
+_sample_rate = 0.0
+_trust_parent = False
+
+
+def configure(exporter: SpanExporter | None, sample_rate: float = 1.0, trust_parent: bool = False) -> None:
+    global _exporter, _sample_rate, _trust_parent
+    _exporter = exporter
+    _sample_rate = sample_rate if exporter else 0.0
+    _trust_parent = trust_parent
+
+
+def configure_from_env() -> None:
+    name = os.getenv("TRACE_EXPORTER", "none").strip()
+    if name in ("", "none"):
+        exporter = None
+    elif name == "stdout":
+        exporter = JsonLinesExporter(sys.stdout.fileno())
+    elif name == "file":
+        exporter = JsonLinesExporter.to_file(os.getenv("TRACE_FILE", "traces.jsonl"))
+    elif ":" in name:
+        module, factory = name.split(":", 1)
+        exporter = getattr(importlib.import_module(module), factory)()
+    else:
+        raise ValueError(f"Unknown TRACE_EXPORTER: {name}")
+    configure(
+        exporter,
+        float(os.getenv("TRACE_SAMPLE_RATE", 1.0)),
+        os.getenv("TRACE_TRUST_PARENT", "false").lower() == "true",
+    )
+
+
+def shutdown() -> None:
+    if _exporter:
+        _exporter.shutdown()
+
+
+def current() -> Span | None:
+    return _current.get()
+
+
+def annotate(**attributes: Any) -> None:
+    """Add attributes to the current span, if the request is being traced."""
+    span = _current.get()
+    if span is not None:
+        span.attributes.update(attributes)
+
+
+def _finish(span: Span, error: BaseException | None = None) -> None:
+    if span.end_ns is not None:
+        return
+    span.end_ns = time.time_ns()
+    if error is not None:
+        span.error = f"{type(error).__name__}: {error}"
+    if _exporter:
+        try:
+            _exporter.export(span.to_dict())
+        except Exception as e:
+            print(f"Error exporting span: {e}")
+
+
+class _SpanScope:
+    __slots__ = ("span", "parent", "attributes", "name", "_token")
+
+    def __init__(self, name: str, parent: Span, attributes: dict[str, Any]):
+        self.name = name
+        self.parent = parent
+        self.attributes = attributes
+
+    def __enter__(self) -> Span:
+        self.span = Span(self.name, self.parent.trace_id, self.parent.span_id, self.attributes)
+        self._token = _current.set(self.span)
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        _current.reset(self._token)
+        _finish(self.span, exc)
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self) -> None:
+        return None
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        return None
+
+
+_NO_SPAN = _NoSpan()
+
+
+def span(name: str, **attributes: Any) -> "_SpanScope | _NoSpan":
+    """`with tracing.span("elasticsearch.search", operation="keyword") as s:`; s is None
+    when the request is not traced."""
+    parent = _current.get()
+    if parent is None:
+        return _NO_SPAN
+    return _SpanScope(name, parent, attributes)
+
+
+def bind(fn: Callable[..., Any], name: str | None = None) -> Callable[..., Any]:
+    """Wrap fn to run in a child span of the current span, wherever and whenever it runs.
+
+    For work that outlives the current context, e.g. a BackgroundTask that runs after the
+    response (and its span) has finished.
+    """
+    parent = _current.get()
+    if parent is None:
+        return fn
+    span_name = name or getattr(fn, "__name__", "task")
+
+    def traced(*args, **kwargs):
+        token = _current.set(parent)
+        try:
+            with span(span_name):
+                return fn(*args, **kwargs)
+        finally:
+            _current.reset(token)
+
+    return traced
+
+
+def _parse_traceparent(value: str | None) -> tuple[str, str, bool] | None:
+    parts = (value or "").strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        sampled = bool(int(parts[3], 16) & 1)
+    except ValueError:
+        return None
+    return parts[1], parts[2], sampled
+
+
+class TracingMiddleware:
+    """Opens the root span of each sampled HTTP request and returns its traceparent.
+
+    The route span ends with the last response byte; BackgroundTasks run after that and
+    attach to it through bind(). It also records event loop lag: how long a callback
+    scheduled at request start waited for the loop.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or _exporter is None:
+            await self.app(scope, receive, send)
+            return
+
+        incoming = _parse_traceparent(Headers(scope=scope).get("traceparent"))
+        if incoming and _trust_parent:
+            sampled = incoming[2]
+        else:
+            sampled = random.random() < _sample_rate
+        if not sampled:
+            await self.app(scope, receive, send)
+            return
+
+        trace_id = incoming[0] if incoming else random.getrandbits(128).to_bytes(16, "big").hex()
+        root = Span(
+            "http.request",
+            trace_id,
+            incoming[1] if incoming else None,
+            {"http.method": scope["method"], "http.path": scope["path"]},
+        )
+        token = _current.set(root)
+        scheduled = time.perf_counter()
+
+        def record_loop_lag() -> None:
+            root.attributes["event_loop.lag_ms"] = round((time.perf_counter() - scheduled) * 1000, 3)
+
+        asyncio.get_running_loop().call_soon(record_loop_lag)
+
+        async def send_traced(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                root.attributes["http.status_code"] = message["status"]
+                MutableHeaders(scope=message)["traceparent"] = root.traceparent
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                route = scope.get("route")
+                if route is not None:
+                    root.attributes["http.route"] = route.path
+                _finish(root)
+
+        try:
+            await self.app(scope, receive, send_traced)
+        except BaseException as e:
+            _finish(root, e)
+            raise
+        finally:
+            _finish(root)
+            _current.reset(token)